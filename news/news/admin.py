@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.urls import reverse
 from django.utils.html import format_html
-from .models import News_post, Like, PendingNews
+from .models import News_post, Like, PendingNews, NewsLoadJob
+from .moderation import approve_pending_news, reject_pending_news
 
 # Register your models here.
 
@@ -32,6 +33,7 @@ class PendingNewsAdmin(admin.ModelAdmin):
 	list_filter = ('created_at', 'is_processed', 'created_by')
 	search_fields = ('title', 'short_description')
 	readonly_fields = ('created_at', 'created_by')
+	actions = ('approve_selected', 'reject_selected')
 	
 	def approve_link(self, obj):
 		if not obj.is_processed:
@@ -43,6 +45,16 @@ class PendingNewsAdmin(admin.ModelAdmin):
 	def get_queryset(self, request):
 		return super().get_queryset(request).select_related('created_by')
 
+	@admin.action(description='Опубликовать выбранные новости')
+	def approve_selected(self, request, queryset):
+		posts = approve_pending_news(list(queryset.values_list('id', flat=True)), request.user)
+		self.message_user(request, f'Опубликовано новостей: {len(posts)}')
+
+	@admin.action(description='Отклонить выбранные новости')
+	def reject_selected(self, request, queryset):
+		rejected = reject_pending_news(list(queryset.values_list('id', flat=True)))
+		self.message_user(request, f'Отклонено новостей: {rejected}')
+
 @admin.register(Like)
 class LikeAdmin(admin.ModelAdmin):
 	list_display = ('user', 'news_post', 'created_at')
@@ -50,6 +62,13 @@ class LikeAdmin(admin.ModelAdmin):
 	search_fields = ('user__username', 'news_post__title')
 
 
+@admin.register(NewsLoadJob)
+class NewsLoadJobAdmin(admin.ModelAdmin):
+	list_display = ('id', 'created_by', 'count', 'status', 'loaded', 'created_at', 'finished_at')
+	list_filter = ('status',)
+	readonly_fields = ('created_by', 'count', 'urls', 'status', 'loaded', 'error', 'created_at', 'finished_at')
+
+
 # Добавляем кастомные админ-действия
 class CustomAdminSite(admin.AdminSite):
 	site_header = 'Админ-панель новостного сайта'
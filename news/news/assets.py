@@ -0,0 +1,256 @@
+"""
+Сборка статики: бандлы CSS/JS из своих файлов и локальной копии Bootstrap.
+
+Bootstrap и Bootstrap Icons скачиваются один раз с закреплёнными версиями в static/vendor/
+(fetch_vendor), после чего сайт не обращается к CDN. build_bundles() склеивает и минифицирует
+файлы из BUNDLES в static/dist/. Отпечатки в именах, .gz и .br делает collectstatic
+через CompressedManifestStaticFilesStorage, а WhiteNoise отдаёт файлы с отпечатком
+с Cache-Control: immutable на 10 лет.
+
+Пока бандл не собран, тег {% asset_bundle %} подключает исходные файлы по отдельности,
+а отсутствующие вендорные в DEBUG — с CDN, так что сборка в разработке не обязательна.
+Без DEBUG такие файлы считаются ошибкой сборки: проверка news.E001 (check --deploy)
+и запись в лог.
+"""
+import functools
+import gzip
+import json
+import logging
+import posixpath
+import re
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+logger = logging.getLogger(__name__)
+
+BOOTSTRAP_CDN = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist'
+BOOTSTRAP_ICONS_CDN = 'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font'
+
+# Путь внутри static/ -> закреплённый URL на CDN
+VENDOR_FILES = {
+	'vendor/bootstrap/bootstrap.min.css': f'{BOOTSTRAP_CDN}/css/bootstrap.min.css',
+	'vendor/bootstrap/bootstrap.bundle.min.js': f'{BOOTSTRAP_CDN}/js/bootstrap.bundle.min.js',
+	'vendor/bootstrap-icons/bootstrap-icons.css': f'{BOOTSTRAP_ICONS_CDN}/bootstrap-icons.css',
+	'vendor/bootstrap-icons/fonts/bootstrap-icons.woff2': f'{BOOTSTRAP_ICONS_CDN}/fonts/bootstrap-icons.woff2',
+	'vendor/bootstrap-icons/fonts/bootstrap-icons.woff': f'{BOOTSTRAP_ICONS_CDN}/fonts/bootstrap-icons.woff',
+}
+
+# Бандл -> исходные файлы в порядке подключения
+BUNDLES = {
+	'dist/site.css': (
+		'vendor/bootstrap/bootstrap.min.css',
+		'vendor/bootstrap-icons/bootstrap-icons.css',
+		'css/style.css',
+	),
+	'dist/site.js': (
+		'vendor/bootstrap/bootstrap.bundle.min.js',
+	),
+}
+
+# Размеры предыдущей сборки; collectstatic пропускает файлы с точкой в начале имени
+SIZES_FILE = 'dist/.sizes.json'
+FETCH_TIMEOUT = 30
+
+_CSS_TOKEN_RE = re.compile(r'(/\*.*?\*/)|("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|([^"\'/]+|/)', re.DOTALL)
+_CSS_SPACE_AROUND_RE = re.compile(r'\s*([{};,>])\s*')
+_CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+_CHARSET_RE = re.compile(r'@charset\s+"[^"]*";\s*', re.IGNORECASE)
+_SOURCE_MAP_RE = re.compile(r'^\s*(?://|/\*)[#@] sourceMappingURL=.*$', re.MULTILINE)
+
+
+class AssetError(Exception):
+	pass
+
+
+@dataclass
+class BundleReport:
+	name: str
+	sources: int
+	source_bytes: int
+	bytes: int
+	gzip_bytes: int
+	brotli_bytes: int | None
+
+
+def source_dir():
+	"""Каталог исходной статики проекта (первый из STATICFILES_DIRS)"""
+	return Path(settings.STATICFILES_DIRS[0])
+
+
+# --- Вендорные файлы ---------------------------------------------------------------
+
+def fetch_vendor(refresh=False):
+	"""Скачивает недостающие (с refresh — все) файлы из VENDOR_FILES. Возвращает список скачанных."""
+	fetched = []
+	root = source_dir()
+	with requests.Session() as session:
+		for name, url in VENDOR_FILES.items():
+			path = root / name
+			if path.exists() and not refresh:
+				continue
+			try:
+				resp = session.get(url, timeout=FETCH_TIMEOUT)
+				resp.raise_for_status()
+			except requests.RequestException as e:
+				raise AssetError(f'Не удалось скачать {url}: {e}')
+			content = resp.content
+			if name.endswith(('.css', '.js')):
+				# Файлов .map мы не храним, а collectstatic падает на ссылках на отсутствующие файлы
+				content = _SOURCE_MAP_RE.sub('', content.decode('utf-8')).encode('utf-8')
+			path.parent.mkdir(parents=True, exist_ok=True)
+			path.write_bytes(content)
+			fetched.append(name)
+	return fetched
+
+
+# --- Минификация ---------------------------------------------------------------------
+
+def minify_css(css):
+	"""
+	Убирает комментарии (кроме /*! лицензий */) и лишние пробелы. Строки не трогаются;
+	пробелы вокруг + и - сохраняются ради calc(), перед : — ради селекторов вида «a :hover».
+	"""
+	parts = []
+	for comment, string, code in _CSS_TOKEN_RE.findall(css):
+		if comment:
+			if comment.startswith('/*!'):
+				parts.append(comment)
+		elif string:
+			parts.append(string)
+		else:
+			code = re.sub(r'\s+', ' ', code)
+			code = _CSS_SPACE_AROUND_RE.sub(r'\1', code)
+			parts.append(code.replace(': ', ':').replace(';}', '}'))
+	return ''.join(parts).strip()
+
+
+def minify_js(js):
+	"""
+	Без парсера JS надёжно можно только убрать ссылки на source map и пустые строки;
+	вендорные файлы подключаются уже минифицированными (*.min.js).
+	"""
+	js = _SOURCE_MAP_RE.sub('', js)
+	return '\n'.join(line.rstrip() for line in js.splitlines() if line.strip())
+
+
+def _rebase_css_urls(css, source, bundle):
+	"""Переписывает относительные url() исходника относительно каталога бандла"""
+	def replace(match):
+		quote, url = match.groups()
+		if url.startswith(('/', '#', 'data:', 'http:', 'https:')):
+			return match.group(0)
+		path, _, fragment = url.partition('#')
+		# Кэш сбрасывает отпечаток в имени файла, параметр ?v=... больше не нужен
+		path = path.split('?', 1)[0]
+		target = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+		rebased = posixpath.relpath(target, posixpath.dirname(bundle))
+		return f'url({quote}{rebased}{"#" + fragment if fragment else ""}{quote})'
+	return _CSS_URL_RE.sub(replace, css)
+
+
+# --- Сборка --------------------------------------------------------------------
+
+def _compressed_sizes(data):
+	buffer = gzip.compress(data, compresslevel=9, mtime=0)
+	return len(buffer), len(brotli.compress(data)) if brotli is not None else None
+
+
+def build_bundle(name, sources):
+	root = source_dir()
+	missing = [source for source in sources if not (root / source).exists()]
+	if missing:
+		raise AssetError(f"Для {name} нет файлов: {', '.join(missing)} (запустите build_static без --offline)")
+
+	texts = [(source, (root / source).read_text(encoding='utf-8')) for source in sources]
+	source_bytes = sum(len(text.encode()) for _, text in texts)
+	if name.endswith('.css'):
+		has_charset = any(_CHARSET_RE.search(text) for _, text in texts)
+		# @charset допустим только в начале файла, поэтому из исходников он убирается
+		body = '\n'.join(
+			minify_css(_rebase_css_urls(_CHARSET_RE.sub('', text), source, name))
+			for source, text in texts
+		)
+		content = ('@charset "UTF-8";' if has_charset else '') + body
+	else:
+		# ; между файлами — на случай, если исходник не заканчивается точкой с запятой
+		content = ';\n'.join(minify_js(text) for _, text in texts)
+
+	data = content.encode()
+	path = root / name
+	path.parent.mkdir(parents=True, exist_ok=True)
+	# Без изменений файл не перезаписывается — у collectstatic не меняется mtime
+	if not path.exists() or path.read_bytes() != data:
+		path.write_bytes(data)
+	gzip_bytes, brotli_bytes = _compressed_sizes(data)
+	return BundleReport(name, len(sources), source_bytes, len(data), gzip_bytes, brotli_bytes)
+
+
+def build_bundles():
+	"""Собирает все BUNDLES в static/dist/. Возвращает (отчёты, размеры прошлой сборки)."""
+	sizes_path = source_dir() / SIZES_FILE
+	try:
+		previous = json.loads(sizes_path.read_text(encoding='utf-8'))
+	except (OSError, ValueError):
+		previous = {}
+	reports = [build_bundle(name, sources) for name, sources in BUNDLES.items()]
+	sizes_path.write_text(json.dumps({r.name: asdict(r) for r in reports}, indent=2), encoding='utf-8')
+	return reports, previous
+
+
+def format_sizes(reports, previous):
+	"""Таблица размеров; изменение gzip-размера относительно прошлой сборки — в скобках"""
+	def kb(value):
+		return '—' if value is None else f'{value / 1024:.1f}'
+
+	header = f"{'bundle':<16}{'files':>6}{'source KB':>11}{'min KB':>9}{'gzip KB':>20}{'br KB':>9}"
+	lines = [header, '-' * len(header)]
+	for r in reports:
+		old = previous.get(r.name, {}).get('gzip_bytes')
+		change = f' ({(r.gzip_bytes - old) / 1024:+.1f})' if old is not None and old != r.gzip_bytes else ''
+		lines.append(
+			f'{r.name:<16}{r.sources:>6}{kb(r.source_bytes):>11}{kb(r.bytes):>9}'
+			f'{kb(r.gzip_bytes) + change:>20}{kb(r.brotli_bytes):>9}'
+		)
+	return '\n'.join(lines)
+
+
+# --- Подключение в шаблонах -----------------------------------------------------------
+
+def missing_sources(name):
+	"""Исходники бандла, которых нет в статике (имеет смысл, пока бандл не собран)"""
+	return [source for source in BUNDLES[name] if not finders.find(source)]
+
+
+@functools.lru_cache(maxsize=None)
+def bundle_urls(name):
+	"""
+	URL собранного бандла, а без сборки — его исходников (отсутствующие вендорные в DEBUG —
+	с CDN). Файлы ищутся один раз на процесс: после build_static сервер перезапускается.
+	"""
+	if finders.find(name):
+		return [static(name)]
+	missing = missing_sources(name)
+	if missing and not settings.DEBUG:
+		logger.error('Бандл %s не собран, нет файлов: %s (запустите build_static)', name, ', '.join(missing))
+	return [
+		VENDOR_FILES[source] if source in missing else static(source)
+		for source in BUNDLES[name]
+	]
+
+
+def bundle_tags(name):
+	urls = [(url,) for url in bundle_urls(name)]
+	if name.endswith('.css'):
+		return format_html_join('\n', '<link href="{}" rel="stylesheet">', urls)
+	return format_html_join('\n', '<script src="{}"></script>', urls)
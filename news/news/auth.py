@@ -0,0 +1,33 @@
+"""
+Бэкенд аутентификации с кэшем пользователя.
+
+AuthenticationMiddleware на каждом запросе загружает пользователя по id из сессии.
+CachedModelBackend берёт его из кэша на USER_CACHE_TIMEOUT секунд. Запись сбрасывается
+сигналами User (смена пароля, блокировка, вход), см. signals.py.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+USER_KEY = 'news:user:{}'
+
+
+class CachedModelBackend(ModelBackend):
+	def get_user(self, user_id):
+		if not settings.USER_CACHE_TIMEOUT:
+			return super().get_user(user_id)
+		key = USER_KEY.format(user_id)
+		user = cache.get(key)
+		if user is None:
+			user = super().get_user(user_id)
+			if user is not None:
+				cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+		return user if user is not None and self.user_can_authenticate(user) else None
+
+
+def forget_user(user_id):
+	"""Сбрасывает кэш пользователя сейчас и после коммита — чтобы параллельный запрос не закэшировал старую версию"""
+	key = USER_KEY.format(user_id)
+	cache.delete(key)
+	transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,45 @@
+"""
+SQLite для нагрузки с параллельными запросами.
+
+Поддерживает опции Django 5.1 в OPTIONS, которых нет в Django 5.0:
+- init_command — SQL (через ;), выполняется на каждом новом соединении; так задаются
+  PRAGMA journal_mode=WAL, synchronous=NORMAL и прочее;
+- transaction_mode — режим BEGIN для atomic(). С IMMEDIATE транзакция берёт блокировку
+  записи сразу. С DEFERRED (по умолчанию в SQLite) транзакция, которая сначала читала,
+  а потом пишет, при занятой записи получает «database is locked» без ожидания timeout.
+
+После перехода на Django 5.1+ достаточно вернуть ENGINE django.db.backends.sqlite3.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'EXCLUSIVE', 'IMMEDIATE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+	init_command = None
+	transaction_mode = None
+
+	def get_connection_params(self):
+		params = super().get_connection_params()
+		self.init_command = params.pop('init_command', None)
+		self.transaction_mode = params.pop('transaction_mode', None)
+		if self.transaction_mode is not None and self.transaction_mode.upper() not in TRANSACTION_MODES:
+			raise ImproperlyConfigured(
+				f"transaction_mode должен быть одним из {', '.join(TRANSACTION_MODES)} или None"
+			)
+		return params
+
+	def get_new_connection(self, conn_params):
+		conn = super().get_new_connection(conn_params)
+		if self.init_command:
+			for statement in self.init_command.split(';'):
+				if statement.strip():
+					conn.execute(statement)
+		return conn
+
+	def _start_transaction_under_autocommit(self):
+		if self.transaction_mode is None:
+			super()._start_transaction_under_autocommit()
+		else:
+			self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,297 @@
+"""
+Бенчмарк горячих страниц новостного сайта.
+
+Запросы идут через тестовый клиент Django в том же процессе: в замер входит весь стек
+middleware, view и шаблонов, но не сеть и не сервер приложений. Для image_proxy
+поднимается локальный HTTP-сервер с заглушкой изображения, внешние хосты не нужны.
+
+Отчёт — задержки p50/p95/p99, число SQL-запросов на запрос и RSS процесса. JSON-отчёт
+содержит коммит, СУБД и объём данных, поэтому прогоны на разных коммитах можно сравнивать
+(см. management-команду benchmark_news).
+"""
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import News_post, NewsImage, Like, Favorite
+
+try:
+	import resource
+except ImportError:  # Windows
+	resource = None
+
+try:
+	from PIL import Image
+except ImportError:
+	Image = None
+
+SCENARIOS = (
+	'news_home_anon', 'news_home', 'news_detail', 'news_trending', 'toggle_like',
+	'favorites_list', 'image_proxy', 'image_proxy_miss',
+)
+
+# Прозрачный PNG 1x1 — заглушка, если Pillow не установлен
+_PIXEL_PNG = (
+	b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89'
+	b'\x00\x00\x00\rIDATx\x9cc\xf8\x0f\x00\x00\x01\x01\x00\x05\x18\xd8N\x00\x00\x00\x00IEND\xaeB`\x82'
+)
+
+
+@dataclass
+class ScenarioResult:
+	name: str
+	requests: int
+	errors: int
+	p50_ms: float
+	p95_ms: float
+	p99_ms: float
+	mean_ms: float
+	queries_per_request: float
+	rss_mb: float
+
+
+def percentile(sorted_values, pct):
+	"""Перцентиль с линейной интерполяцией; sorted_values должен быть отсортирован"""
+	if not sorted_values:
+		return 0.0
+	position = (len(sorted_values) - 1) * pct / 100
+	lower = int(position)
+	upper = min(lower + 1, len(sorted_values) - 1)
+	return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def rss_bytes():
+	"""Текущий RSS процесса; там, где /proc нет, — пиковый из getrusage"""
+	try:
+		with open('/proc/self/statm') as f:
+			return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+	except (OSError, ValueError, IndexError):
+		pass
+	if resource is None:
+		return 0
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# Linux отдаёт килобайты, macOS — байты
+	return peak if platform.system() == 'Darwin' else peak * 1024
+
+
+class QueryCounter:
+	"""Считает SQL-запросы через execute_wrapper, не включая debug-курсор"""
+
+	def __init__(self):
+		self.count = 0
+
+	def __call__(self, execute, sql, params, many, context):
+		self.count += 1
+		return execute(sql, params, many, context)
+
+
+def _stub_image():
+	if Image is None:
+		return _PIXEL_PNG, 'image/png'
+	buffer = io.BytesIO()
+	Image.new('RGB', (800, 450), (70, 110, 160)).save(buffer, 'JPEG', quality=85)
+	return buffer.getvalue(), 'image/jpeg'
+
+
+class StubImageServer:
+	"""Локальный источник изображений для image_proxy: любой путь отдаёт одну и ту же картинку"""
+
+	def __init__(self):
+		body, content_type = _stub_image()
+
+		class Handler(BaseHTTPRequestHandler):
+			def do_GET(self):
+				self.send_response(200)
+				self.send_header('Content-Type', content_type)
+				self.send_header('Content-Length', str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def log_message(self, *args):
+				pass
+
+		self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+		self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+	def __enter__(self):
+		self.thread.start()
+		return self
+
+	def __exit__(self, *exc):
+		self.server.shutdown()
+		self.server.server_close()
+
+	def url(self, name):
+		host, port = self.server.server_address
+		return f'http://{host}:{port}/{name}'
+
+
+def run_scenario(name, make_request, iterations, warmup):
+	"""Выполняет make_request(i) warmup + iterations раз и собирает статистику по замерам"""
+	for i in range(warmup):
+		make_request(i)
+
+	timings = []
+	queries = 0
+	errors = 0
+	for i in range(warmup, warmup + iterations):
+		counter = QueryCounter()
+		with connection.execute_wrapper(counter):
+			started = time.perf_counter()
+			response = make_request(i)
+			if response.streaming:
+				b''.join(response.streaming_content)
+			elapsed = time.perf_counter() - started
+		timings.append(elapsed * 1000)
+		queries += counter.count
+		if response.status_code >= 400:
+			errors += 1
+
+	timings.sort()
+	return ScenarioResult(
+		name=name,
+		requests=iterations,
+		errors=errors,
+		p50_ms=round(percentile(timings, 50), 2),
+		p95_ms=round(percentile(timings, 95), 2),
+		p99_ms=round(percentile(timings, 99), 2),
+		mean_ms=round(sum(timings) / len(timings), 2) if timings else 0.0,
+		queries_per_request=round(queries / iterations, 2) if iterations else 0.0,
+		rss_mb=round(rss_bytes() / 2 ** 20, 1),
+	)
+
+
+def _git_revision():
+	try:
+		revision = subprocess.run(
+			['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+			capture_output=True, text=True, timeout=5,
+		).stdout.strip()
+		dirty = subprocess.run(
+			['git', 'status', '--porcelain', '--untracked-files=no'], cwd=settings.BASE_DIR,
+			capture_output=True, text=True, timeout=5,
+		).stdout.strip()
+	except (OSError, subprocess.SubprocessError):
+		return ''
+	return f'{revision}-dirty' if revision and dirty else revision
+
+
+def _meta(iterations, warmup):
+	return {
+		'revision': _git_revision(),
+		'started_at': timezone.now().isoformat(),
+		'python': platform.python_version(),
+		'django': django.get_version(),
+		'database': connection.vendor,
+		'debug': settings.DEBUG,
+		'iterations': iterations,
+		'warmup': warmup,
+		'data': {
+			'posts': News_post.objects.count(),
+			'images': NewsImage.objects.count(),
+			'users': User.objects.count(),
+			'likes': Like.objects.count(),
+			'favorites': Favorite.objects.count(),
+		},
+	}
+
+
+def run_benchmarks(user, iterations=200, warmup=10, scenarios=SCENARIOS):
+	"""
+	Прогоняет сценарии от имени user и возвращает отчёт (dict, сериализуемый в JSON).
+	toggle_like ставит и снимает лайк парами, поэтому данные после прогона не меняются.
+	"""
+	post_ids = list(
+		News_post.objects.filter(is_approved=True).order_by('-pub_date', '-id').values_list('id', flat=True)[:100]
+	)
+	if not post_ids:
+		raise ValueError('В базе нет одобренных новостей — заполните её через add_sample_news --posts N')
+
+	anonymous = Client()
+	client = Client()
+	client.force_login(user)
+	results = []
+
+	with tempfile.TemporaryDirectory() as cache_dir, StubImageServer() as images, override_settings(
+		IMAGE_PROXY_CACHE_DIR=cache_dir,
+		ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+	):
+		proxy_url = reverse('image_proxy')
+		requests_by_name = {
+			'news_home_anon': lambda i: anonymous.get(reverse('news_home'), secure=True),
+			'news_home': lambda i: client.get(reverse('news_home'), secure=True),
+			'news_detail': lambda i: client.get(reverse('news_detail', args=[post_ids[i % len(post_ids)]]), secure=True),
+			'news_trending': lambda i: client.get(reverse('news_trending'), secure=True),
+			'toggle_like': lambda i: client.post(reverse('toggle_like', args=[post_ids[i // 2 % len(post_ids)]]), secure=True),
+			'favorites_list': lambda i: client.get(reverse('favorites_list'), secure=True),
+			'image_proxy': lambda i: anonymous.get(f"{proxy_url}?{urlencode({'url': images.url('hot.jpg')})}", secure=True),
+			'image_proxy_miss': lambda i: anonymous.get(f"{proxy_url}?{urlencode({'url': images.url(f'{i}.jpg')})}", secure=True),
+		}
+		for name in scenarios:
+			# Каждый сценарий начинается с пустого кэша, как после деплоя
+			cache.clear()
+			# Чётное число замеров, чтобы лайки toggle_like вернулись в исходное состояние
+			count = iterations + iterations % 2 if name == 'toggle_like' else iterations
+			results.append(run_scenario(name, requests_by_name[name], count, warmup + warmup % 2))
+
+	report = _meta(iterations, warmup)
+	report['peak_rss_mb'] = max((r.rss_mb for r in results), default=0.0)
+	report['scenarios'] = [asdict(r) for r in results]
+	return report
+
+
+def save_report(report, path):
+	with open(path, 'w', encoding='utf-8') as f:
+		json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def load_report(path):
+	with open(path, encoding='utf-8') as f:
+		return json.load(f)
+
+
+def format_report(report, baseline=None):
+	"""Текстовая таблица; с baseline добавляет изменение p50/p95 и запросов в процентах и штуках"""
+	base = {s['name']: s for s in (baseline or {}).get('scenarios', [])}
+
+	def delta(value, old, percent=True):
+		if old is None:
+			return ''
+		if percent:
+			return f' ({(value - old) / old * 100:+.0f}%)' if old else ''
+		return f' ({value - old:+g})' if value != old else ''
+
+	header = f"{'scenario':<18}{'p50 ms':>16}{'p95 ms':>16}{'p99 ms':>10}{'queries':>14}{'errors':>8}{'rss MB':>9}"
+	lines = [
+		f"revision {report['revision'] or '?'} · {report['database']} · debug={report['debug']} · "
+		f"posts={report['data']['posts']} · {report['iterations']} req/scenario",
+	]
+	if baseline:
+		lines.append(f"baseline {baseline.get('revision') or '?'}")
+	lines += [header, '-' * len(header)]
+	for s in report['scenarios']:
+		old = base.get(s['name'], {})
+		p50 = f"{s['p50_ms']:.2f}{delta(s['p50_ms'], old.get('p50_ms'))}"
+		p95 = f"{s['p95_ms']:.2f}{delta(s['p95_ms'], old.get('p95_ms'))}"
+		queries = f"{s['queries_per_request']:g}{delta(s['queries_per_request'], old.get('queries_per_request'), percent=False)}"
+		lines.append(
+			f"{s['name']:<18}{p50:>16}{p95:>16}{s['p99_ms']:>10.2f}{queries:>14}{s['errors']:>8}{s['rss_mb']:>9.1f}"
+		)
+	return '\n'.join(lines)
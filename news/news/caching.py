@@ -0,0 +1,156 @@
+"""
+Кэширование страниц и фрагментов новостного сайта.
+
+Ключи строятся из штампов версий, которые хранятся в самом кэше:
+- версия ленты (news:v:feed) меняется при изменении любой новости;
+- версия новости (news:v:post:<id>) меняется при изменении новости, её изображений и лайков.
+Штамп — time.time_ns(), поэтому вытеснение штампа из кэша даёт новый ключ,
+а не возврат к старому содержимому. Старые записи просто доживают свой TTL.
+
+Лайки и избранное пользователя хранятся как множества id новостей (user_post_ids),
+по ним карточки проверяются без запросов к БД.
+"""
+import hashlib
+import time
+from functools import wraps
+from typing import NamedTuple
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Value
+from django.http import HttpResponse
+
+from .models import Like, Favorite
+
+FEED_VERSION_KEY = 'news:v:feed'
+POST_VERSION_KEY = 'news:v:post:{}'
+USER_POSTS_KEY = 'news:user:{}:posts'
+
+
+class UserPostIds(NamedTuple):
+	liked: frozenset
+	favorited: frozenset
+
+
+NO_POST_IDS = UserPostIds(frozenset(), frozenset())
+
+
+def _new_stamp():
+	return time.time_ns()
+
+
+def feed_version():
+	return cache.get_or_set(FEED_VERSION_KEY, _new_stamp, None)
+
+
+def post_versions(post_ids):
+	"""Версии нескольких новостей одним обращением к кэшу"""
+	keys = {POST_VERSION_KEY.format(pk): pk for pk in post_ids}
+	found = cache.get_many(keys)
+	missing = {key: _new_stamp() for key in keys if key not in found}
+	if missing:
+		cache.set_many(missing, None)
+		found.update(missing)
+	return {keys[key]: version for key, version in found.items()}
+
+
+def post_version(post_id):
+	return post_versions([post_id])[post_id]
+
+
+def attach_cache_versions(posts):
+	"""Проставляет cache_version у новостей — по нему ключуются фрагменты карточек"""
+	versions = post_versions([post.id for post in posts])
+	for post in posts:
+		post.cache_version = versions[post.id]
+	return posts
+
+
+def bump_feed_version():
+	cache.set(FEED_VERSION_KEY, _new_stamp(), None)
+
+
+def bump_post_version(post_id):
+	cache.set(POST_VERSION_KEY.format(post_id), _new_stamp(), None)
+
+
+def bump_post_versions(post_ids):
+	"""bump_post_version для многих новостей одним обращением к кэшу (после bulk-операций)"""
+	stamp = _new_stamp()
+	cache.set_many({POST_VERSION_KEY.format(pk): stamp for pk in post_ids}, None)
+
+
+def _load_user_post_ids(user_id):
+	rows = (
+		Like.objects.filter(user_id=user_id).values_list('news_post_id', Value(True))
+		.union(Favorite.objects.filter(user_id=user_id).values_list('news_post_id', Value(False)), all=True)
+	)
+	liked, favorited = set(), set()
+	for post_id, is_like in rows:
+		(liked if is_like else favorited).add(post_id)
+	return UserPostIds(frozenset(liked), frozenset(favorited))
+
+
+def user_post_ids(user):
+	"""
+	id новостей, которые пользователь лайкнул и добавил в избранное. Один запрос (или
+	обращение к кэшу) на запрос: результат запоминается на объекте пользователя.
+	"""
+	if not getattr(user, 'is_authenticated', False):
+		return NO_POST_IDS
+	ids = getattr(user, '_news_post_ids', None)
+	if ids is None:
+		key = USER_POSTS_KEY.format(user.pk)
+		ids = cache.get(key) if settings.USER_CACHE_TIMEOUT else None
+		if ids is None:
+			ids = _load_user_post_ids(user.pk)
+			if settings.USER_CACHE_TIMEOUT:
+				cache.set(key, ids, settings.USER_CACHE_TIMEOUT)
+		user._news_post_ids = ids
+	return ids
+
+
+def forget_user_post_ids(*user_ids):
+	"""Сбрасывает закэшированные лайки и избранное пользователей, в том числе после коммита"""
+	keys = [USER_POSTS_KEY.format(user_id) for user_id in user_ids]
+	cache.delete_many(keys)
+	transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def cache_anonymous_page(timeout, version=None):
+	"""
+	Кэширует HTML страницы для анонимных GET-запросов.
+
+	version(request, **kwargs) возвращает штамп, входящий в ключ; при его смене
+	кэш страницы перестаёт использоваться. Запросы с непрочитанными сообщениями
+	и авторизованные пользователи всегда получают свежую страницу.
+	"""
+	def decorator(view):
+		@wraps(view)
+		def wrapper(request, *args, **kwargs):
+			if (
+				request.method != 'GET'
+				or request.user.is_authenticated
+				or request.COOKIES.get(CookieStorage.cookie_name)
+			):
+				return view(request, *args, **kwargs)
+
+			stamp = version(request, **kwargs) if version else ''
+			path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+			key = f'news:page:{view.__name__}:{stamp}:{path_hash}'
+			cached = cache.get(key)
+			if cached is not None:
+				content, content_type = cached
+				response = HttpResponse(content, content_type=content_type)
+				response['X-Page-Cache'] = 'hit'
+				return response
+
+			response = view(request, *args, **kwargs)
+			if response.status_code == 200 and not response.streaming and not response.cookies:
+				cache.set(key, (response.content, response['Content-Type']), timeout)
+			response['X-Page-Cache'] = 'miss'
+			return response
+		return wrapper
+	return decorator
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from . import assets
+
+
+@register(Tags.staticfiles, deploy=True)
+def check_bundles(app_configs, **kwargs):
+	"""Без DEBUG страницы не должны зависеть от CDN: бандлы собираются build_static"""
+	if settings.DEBUG:
+		return []
+	errors = []
+	for name in assets.BUNDLES:
+		if assets.finders.find(name):
+			continue
+		missing = assets.missing_sources(name)
+		errors.append(Error(
+			f'Бандл {name} не собран' + (f", нет файлов: {', '.join(missing)}" if missing else ''),
+			hint='Выполните manage.py build_static (или build_static --offline с закоммиченным static/vendor/).',
+			id='news.E001',
+		))
+	return errors
@@ -1,6 +1,8 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
 from .models import News_post, PendingNews
 
 
@@ -79,12 +81,34 @@ class LoadNewsForm(forms.Form):
     """Форма для загрузки новостей из интернета"""
     count = forms.IntegerField(
         label='Количество новостей',
-        min_value=1,
-        max_value=10,
+        min_value=0,
+        max_value=500,
         initial=5,
         widget=forms.NumberInput(attrs={'class': 'form-control'})
     )
+    urls = forms.CharField(
+        label='Ссылки на статьи',
+        required=False,
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 5, 'placeholder': 'https://...'})
+    )
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['count'].help_text = 'Укажите количество новостей для загрузки (от 1 до 10)'
+        self.fields['count'].help_text = 'Укажите количество новостей для загрузки (от 0 до 500)'
+        self.fields['urls'].help_text = 'По одной ссылке на строку; страницы загружаются параллельно, дубликаты пропускаются'
+
+    def clean_urls(self):
+        validator = URLValidator()
+        urls = [line.strip() for line in self.cleaned_data['urls'].splitlines() if line.strip()]
+        for url in urls:
+            try:
+                validator(url)
+            except ValidationError:
+                raise ValidationError(f'Некорректная ссылка: {url}')
+        return '\n'.join(urls)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('count') and not cleaned_data.get('urls'):
+            raise ValidationError('Укажите количество новостей или ссылки на статьи')
+        return cleaned_data
@@ -0,0 +1,396 @@
+"""
+Дисковый кэш внешних изображений для image_proxy.
+
+Файлы адресуются по sha256 от URL: <cache_dir>/<ab>/<sha256> — тело изображения,
+рядом <sha256>.json — метаданные (URL, Content-Type, ETag, время загрузки).
+Время последнего обращения хранится в mtime файла и используется для LRU-вытеснения.
+
+get_image() — синхронная загрузка через requests (фоновые задачи, превью, image_proxy
+под WSGI); aget_image() — асинхронная через httpx для image_proxy под ASGI. Работа с диском
+в aget_image() идёт в пуле потоков, а не в event loop.
+
+Размер кэша ведётся в памяти процесса; каталог обходится (evict), только когда оценка
+превысила бюджет или с прошлого обхода прошло EVICT_RESCAN_INTERVAL — в тот же кэш
+пишут и другие процессы.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .metrics import track_http
+
+try:
+	import httpx
+except ImportError:  # aget_image загружает через requests в пуле потоков
+	httpx = None
+
+UPSTREAM_HEADERS = {
+	'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0 Safari/537.36',
+	'Accept': 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8',
+	'Referer': 'https://example.com/'
+}
+CHUNK_SIZE = 64 * 1024
+EVICT_RESCAN_INTERVAL = 300  # секунды
+
+# Общая сессия: переиспользует TCP/TLS-соединения к одним и тем же хостам
+_session = requests.Session()
+
+# Каталог кэша -> [оценка размера в байтах, время последнего обхода]
+_sizes = {}
+_sizes_lock = threading.Lock()
+
+
+class ImageFetchError(Exception):
+	"""Не удалось получить изображение у источника"""
+
+
+@dataclass
+class CachedImage:
+	path: Path
+	url: str
+	content_type: str
+	etag: str
+	size: int
+	fetched_at: float
+	upstream_etag: str = ''
+	upstream_last_modified: str = ''
+
+	@property
+	def is_fresh(self):
+		return time.time() - self.fetched_at < settings.IMAGE_PROXY_TTL
+
+
+def _cache_dir():
+	return Path(settings.IMAGE_PROXY_CACHE_DIR)
+
+
+def _paths(url):
+	key = hashlib.sha256(url.encode()).hexdigest()
+	folder = _cache_dir() / key[:2]
+	return folder / key, folder / f'{key}.json'
+
+
+def _load(url):
+	data_path, meta_path = _paths(url)
+	try:
+		with open(meta_path, encoding='utf-8') as f:
+			meta = json.load(f)
+		if not data_path.exists():
+			return None
+	except (OSError, ValueError):
+		return None
+	meta.pop('path', None)
+	return CachedImage(path=data_path, **meta)
+
+
+def _lookup(url):
+	"""(запись кэша или None, свежая ли она); свежую отмечает как использованную"""
+	cached = _load(url)
+	if cached is not None and cached.is_fresh:
+		_touch(cached.path)
+		return cached, True
+	return cached, False
+
+
+def _store_meta(image):
+	_, meta_path = _paths(image.url)
+	meta = asdict(image)
+	meta.pop('path')
+	tmp = meta_path.with_suffix('.json.tmp')
+	with open(tmp, 'w', encoding='utf-8') as f:
+		json.dump(meta, f)
+	os.replace(tmp, meta_path)
+
+
+def _touch(path):
+	try:
+		os.utime(path)
+	except OSError:
+		pass
+
+
+def _request_headers(cached):
+	headers = dict(UPSTREAM_HEADERS)
+	if cached is not None:
+		# Условный запрос к источнику: при 304 просто продлеваем срок жизни записи
+		if cached.upstream_etag:
+			headers['If-None-Match'] = cached.upstream_etag
+		if cached.upstream_last_modified:
+			headers['If-Modified-Since'] = cached.upstream_last_modified
+	return headers
+
+
+def _revalidated(cached):
+	cached.fetched_at = time.time()
+	_store_meta(cached)
+	_touch(cached.path)
+	return cached
+
+
+def _content_type(status_code, headers):
+	"""Проверяет ответ источника до чтения тела; возвращает Content-Type"""
+	if status_code != 200:
+		raise ImageFetchError(f'bad status {status_code}')
+	content_type = headers.get('Content-Type', 'image/jpeg').split(';')[0].strip()
+	if not content_type.startswith('image/'):
+		raise ImageFetchError(f'not an image: {content_type}')
+	declared = headers.get('Content-Length')
+	if declared and declared.isdigit() and int(declared) > settings.IMAGE_PROXY_MAX_BYTES:
+		raise ImageFetchError('image too large')
+	return content_type
+
+
+class _PartFile:
+	"""Временный файл рядом с записью кэша: пишет тело с ограничением размера и считает sha256"""
+
+	def __init__(self, url, replaced_size=0):
+		self.url = url
+		self.data_path, _ = _paths(url)
+		self.digest = hashlib.sha256()
+		self.size = 0
+		# Размер прежней версии записи, которую заменит commit()
+		self.replaced_size = replaced_size
+
+	def open(self):
+		self.data_path.parent.mkdir(parents=True, exist_ok=True)
+		fd, self.tmp_name = tempfile.mkstemp(dir=self.data_path.parent, suffix='.part')
+		self.file = os.fdopen(fd, 'wb')
+
+	def close(self):
+		self.file.close()
+		if os.path.exists(self.tmp_name):
+			os.remove(self.tmp_name)
+
+	def __enter__(self):
+		self.open()
+		return self
+
+	def write(self, chunk):
+		self.size += len(chunk)
+		if self.size > settings.IMAGE_PROXY_MAX_BYTES:
+			raise ImageFetchError('image too large')
+		self.digest.update(chunk)
+		self.file.write(chunk)
+
+	def commit(self, content_type, headers):
+		"""Переносит файл на место записи кэша, сохраняет метаданные и учитывает размер кэша"""
+		self.file.close()
+		if not self.size:
+			raise ImageFetchError('empty body')
+		os.replace(self.tmp_name, self.data_path)
+		image = CachedImage(
+			path=self.data_path,
+			url=self.url,
+			content_type=content_type,
+			etag=f'"{self.digest.hexdigest()[:32]}"',
+			size=self.size,
+			fetched_at=time.time(),
+			upstream_etag=headers.get('ETag', ''),
+			upstream_last_modified=headers.get('Last-Modified', ''),
+		)
+		_store_meta(image)
+		_account(self.size - self.replaced_size)
+		return image
+
+	def __exit__(self, *exc):
+		self.close()
+		return False
+
+
+def _download(url, cached=None):
+	"""Потоково скачивает изображение во временный файл с ограничением размера"""
+	try:
+		with track_http(), _session.get(url, headers=_request_headers(cached), timeout=settings.IMAGE_PROXY_TIMEOUT, stream=True) as resp:
+			if resp.status_code == 304 and cached is not None:
+				return _revalidated(cached)
+			content_type = _content_type(resp.status_code, resp.headers)
+			with _PartFile(url, cached.size if cached else 0) as part:
+				for chunk in resp.iter_content(CHUNK_SIZE):
+					part.write(chunk)
+				return part.commit(content_type, resp.headers)
+	except requests.RequestException as e:
+		raise ImageFetchError(str(e)) from e
+
+
+def get_image(url):
+	"""
+	Возвращает CachedImage для URL, при необходимости скачивая его.
+	Просроченная запись перепроверяется у источника; если источник недоступен,
+	отдаём устаревшую копию, чтобы не ломать ленту.
+	"""
+	cached, fresh = _lookup(url)
+	if fresh:
+		return cached
+	try:
+		return _download(url, cached)
+	except ImageFetchError:
+		if cached is not None:
+			return cached
+		raise
+
+
+# --- Асинхронная загрузка (ASGI) ------------------------------------------------
+
+def _off_loop(func):
+	return sync_to_async(func, thread_sensitive=False)
+
+
+class _AsyncState:
+	"""
+	Общий пул соединений, слоты по хостам и загрузки в процессе — свои у каждого event loop.
+	Клиент не закрывается и рассчитан на долгоживущий loop сервера ASGI; под WSGI у каждого
+	вызова асинхронного представления свой loop, поэтому там нужен get_image().
+	"""
+
+	def __init__(self):
+		self.client = _new_async_client()
+		self.host_slots = {}
+		self.inflight = {}
+
+	def host_slot(self, url):
+		host = urlsplit(url).netloc
+		slot = self.host_slots.get(host)
+		if slot is None:
+			slot = self.host_slots[host] = asyncio.Semaphore(settings.IMAGE_PROXY_HOST_CONCURRENCY)
+		return slot
+
+
+_async_states = weakref.WeakKeyDictionary()
+
+
+def _new_async_client():
+	return httpx.AsyncClient(
+		headers=UPSTREAM_HEADERS,
+		follow_redirects=True,
+		limits=httpx.Limits(max_connections=settings.IMAGE_PROXY_MAX_CONNECTIONS, max_keepalive_connections=20),
+	)
+
+
+def _async_state():
+	loop = asyncio.get_running_loop()
+	state = _async_states.get(loop)
+	if state is None:
+		state = _async_states[loop] = _AsyncState()
+	return state
+
+
+async def _adownload(state, url, cached):
+	slot = state.host_slot(url)
+	# Медленный хост занимает только свои слоты; остальные ждут не дольше таймаута
+	try:
+		await asyncio.wait_for(slot.acquire(), settings.IMAGE_PROXY_TIMEOUT)
+	except asyncio.TimeoutError:
+		raise ImageFetchError('upstream host is busy')
+	try:
+		with track_http():
+			async with state.client.stream(
+				'GET', url, headers=_request_headers(cached), timeout=settings.IMAGE_PROXY_TIMEOUT,
+			) as resp:
+				if resp.status_code == 304 and cached is not None:
+					return await _off_loop(_revalidated)(cached)
+				content_type = _content_type(resp.status_code, resp.headers)
+				part = _PartFile(url, cached.size if cached else 0)
+				await _off_loop(part.open)()
+				try:
+					async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+						await _off_loop(part.write)(chunk)
+					return await _off_loop(part.commit)(content_type, resp.headers)
+				finally:
+					await _off_loop(part.close)()
+	except httpx.HTTPError as e:
+		raise ImageFetchError(str(e)) from e
+	finally:
+		slot.release()
+
+
+async def aget_image(url):
+	"""
+	Асинхронный get_image: не занимает поток на время загрузки. Одновременные
+	запросы одного URL ждут одну загрузку. Без httpx загрузка идёт в пуле потоков.
+	"""
+	if httpx is None:
+		return await _off_loop(get_image)(url)
+
+	cached, fresh = await _off_loop(_lookup)(url)
+	if fresh:
+		return cached
+
+	state = _async_state()
+	task = state.inflight.get(url)
+	if task is None:
+		task = state.inflight[url] = asyncio.ensure_future(_adownload(state, url, cached))
+		task.add_done_callback(lambda _: state.inflight.pop(url, None))
+	try:
+		# shield: отключившийся клиент не отменяет загрузку для остальных
+		return await asyncio.shield(task)
+	except ImageFetchError:
+		if cached is not None:
+			return cached
+		raise
+
+
+def _account(added):
+	"""Учитывает записанные байты; обходит каталог (evict), только если это нужно"""
+	root = str(_cache_dir())
+	with _sizes_lock:
+		entry = _sizes.get(root)
+		if entry is not None:
+			entry[0] += added
+		needs_scan = (
+			entry is None
+			or entry[0] > settings.IMAGE_PROXY_CACHE_MAX_BYTES
+			or time.monotonic() - entry[1] > EVICT_RESCAN_INTERVAL
+		)
+	if needs_scan:
+		evict()
+
+
+def evict():
+	"""Удаляет давно не использованные файлы, пока кэш не уложится в IMAGE_PROXY_CACHE_MAX_BYTES"""
+	root = _cache_dir()
+	if not root.exists():
+		return 0
+	entries = []
+	total = 0
+	for folder in root.iterdir():
+		if not folder.is_dir():
+			continue
+		for path in folder.iterdir():
+			if path.suffix:
+				continue
+			try:
+				stat = path.stat()
+			except OSError:
+				continue
+			entries.append((stat.st_mtime, stat.st_size, path))
+			total += stat.st_size
+
+	limit = settings.IMAGE_PROXY_CACHE_MAX_BYTES
+	removed = 0
+	if total > limit:
+		entries.sort()
+		for _, size, path in entries:
+			if total <= limit:
+				break
+			for victim in (path, path.with_suffix('.json')):
+				try:
+					victim.unlink()
+				except OSError:
+					pass
+			total -= size
+			removed += 1
+	with _sizes_lock:
+		_sizes[str(root)] = [total, time.monotonic()]
+	return removed
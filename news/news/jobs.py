@@ -0,0 +1,81 @@
+"""
+Фоновые задачи новостного сайта.
+
+Загрузка новостей выполняется в отдельном потоке процесса, а не внутри
+POST-запроса админки: запрос только создаёт NewsLoadJob и сразу возвращается.
+Пул из одного потока — загрузки идут по очереди и не конкурируют за базу.
+
+Очередь живёт в памяти процесса: задачи, не завершённые до перезапуска сервера, никто
+не выполнит. При старте (wsgi.py, asgi.py) они помечаются ошибкой — их нужно запустить
+заново. Если другой воркер в это время ещё выполняет свою задачу, по завершении он
+перезапишет статус.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import NewsLoadJob
+from .services import NewsScrapingService
+
+logger = logging.getLogger(__name__)
+
+INTERRUPTED_ERROR = 'Прервано перезапуском сервера, запустите загрузку заново'
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='news-jobs')
+
+
+def run_load_news_job(job_id):
+	close_old_connections()
+	try:
+		job = NewsLoadJob.objects.select_related('created_by').get(pk=job_id)
+		NewsLoadJob.objects.filter(pk=job_id).update(status=NewsLoadJob.STATUS_RUNNING)
+		try:
+			loaded = NewsScrapingService().load_news_batch(job.created_by, job.count, job.url_list())
+		except Exception as e:
+			logger.exception('Загрузка новостей #%s завершилась ошибкой', job_id)
+			NewsLoadJob.objects.filter(pk=job_id).update(
+				status=NewsLoadJob.STATUS_FAILED, error=str(e), finished_at=timezone.now()
+			)
+			return
+		NewsLoadJob.objects.filter(pk=job_id).update(
+			status=NewsLoadJob.STATUS_DONE, loaded=len(loaded), finished_at=timezone.now()
+		)
+	finally:
+		close_old_connections()
+
+
+def fail_interrupted_jobs(started_at):
+	"""Помечает ошибкой задачи в очереди и выполняемые, созданные до старта процесса"""
+	try:
+		count = NewsLoadJob.objects.filter(
+			status__in=[NewsLoadJob.STATUS_PENDING, NewsLoadJob.STATUS_RUNNING], created_at__lt=started_at,
+		).update(status=NewsLoadJob.STATUS_FAILED, error=INTERRUPTED_ERROR, finished_at=timezone.now())
+	except DatabaseError as e:
+		# Например, миграции ещё не применены
+		logger.warning('Не удалось проверить прерванные загрузки новостей: %s', e)
+		return 0
+	finally:
+		close_old_connections()
+	if count:
+		logger.warning('Загрузок новостей, прерванных перезапуском: %s', count)
+	return count
+
+
+def on_server_start():
+	"""
+	Вызывается из wsgi.py и asgi.py. Проверка идёт в потоке задач: под ASGI приложение
+	импортируется внутри event loop, где синхронный ORM запрещён.
+	"""
+	submit(fail_interrupted_jobs, timezone.now())
+
+
+def submit(fn, *args):
+	"""Ставит произвольную функцию в очередь фоновых задач"""
+	return _executor.submit(fn, *args)
+
+
+def enqueue_load_news(job):
+	"""Запускает задачу после коммита транзакции, в которой она создана"""
+	transaction.on_commit(lambda: _executor.submit(run_load_news_job, job.id))
@@ -1,10 +1,37 @@
+import random
+from datetime import datetime, timedelta
+
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from news.models import News_post
-from datetime import datetime
+from django.utils import timezone
+from news.caching import bump_feed_version
+from news.models import News_post, NewsImage, Like, Favorite
+
+BENCH_USER_PREFIX = 'bench_user_'
+BENCH_PASSWORD = 'bench12345'
+WORDS = (
+    'нейросеть', 'модель', 'данные', 'обучение', 'исследование', 'технология', 'компания',
+    'алгоритм', 'система', 'разработка', 'запуск', 'рынок', 'город', 'проект', 'эксперт',
+)
+
 
 class Command(BaseCommand):
-    help = 'Добавляет тестовые новости и создает суперпользователя'
+    help = (
+        'Добавляет тестовые новости и создает суперпользователя. '
+        'С --posts наполняет базу синтетическими данными заданного объёма для бенчмарков'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=0, help='Сколько синтетических новостей создать')
+        parser.add_argument('--images_per_post', type=int, default=2, help='Изображений на новость')
+        parser.add_argument('--users', type=int, default=50, help='Сколько пользователей bench_user_N создать')
+        parser.add_argument('--likes_per_user', type=int, default=20, help='Лайков на пользователя')
+        parser.add_argument('--favorites_per_user', type=int, default=10, help='Избранных новостей на пользователя')
+        parser.add_argument('--batch_size', type=int, default=1000, help='Размер пачки bulk_create')
+        parser.add_argument('--seed', type=int, default=42, help='Seed генератора, чтобы данные были воспроизводимыми')
+        parser.add_argument('--skip_search_index', action='store_true', help='Не перестраивать поисковый индекс')
 
     def handle(self, *args, **options):
         # Создаем суперпользователя, если его нет
@@ -23,6 +50,10 @@ class Command(BaseCommand):
                 self.style.SUCCESS(f'✅ Создан суперпользователь: admin / admin123')
             )
 
+        if options['posts']:
+            self.seed(author, options)
+            return
+
         # Проверяем, есть ли уже новости
         if News_post.objects.exists():
             self.stdout.write('📰 Новости уже существуют')
@@ -85,3 +116,64 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS(f'📰 Новости: http://127.0.0.1:8000/news/')
         )
+
+    def seed(self, author, options):
+        """Массовое наполнение базы: bulk_create пачками, без сигналов, с пересчётом счётчиков в конце"""
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        now = timezone.now()
+
+        def sentence(count):
+            return ' '.join(rng.choice(WORDS) for _ in range(count)).capitalize()
+
+        password = make_password(BENCH_PASSWORD)
+        existing = set(User.objects.filter(username__startswith=BENCH_USER_PREFIX).values_list('username', flat=True))
+        User.objects.bulk_create([
+            User(username=f'{BENCH_USER_PREFIX}{i}', password=password)
+            for i in range(options['users'])
+            if f'{BENCH_USER_PREFIX}{i}' not in existing
+        ], batch_size=batch_size)
+        user_ids = list(User.objects.filter(username__startswith=BENCH_USER_PREFIX).values_list('id', flat=True))
+
+        posts = News_post.objects.bulk_create([
+            News_post(
+                title=sentence(6),
+                short_description=sentence(20),
+                text='\n\n'.join(sentence(60) for _ in range(4)),
+                # Новости разнесены по времени, чтобы пагинация работала как на живой ленте
+                pub_date=now - timedelta(minutes=i, seconds=rng.randint(0, 59)),
+                author=author,
+                is_approved=rng.random() > 0.05,
+            )
+            for i in range(options['posts'])
+        ], batch_size=batch_size)
+        post_ids = [post.id for post in posts]
+
+        NewsImage.objects.bulk_create([
+            NewsImage(news_post_id=post_id, image_url=f'https://picsum.photos/seed/{post_id}-{n}/800/450')
+            for post_id in post_ids
+            for n in range(options['images_per_post'])
+        ], batch_size=batch_size)
+
+        def pairs(model, per_user):
+            per_user = min(per_user, len(post_ids))
+            return [
+                model(user_id=user_id, news_post_id=post_id)
+                for user_id in user_ids
+                for post_id in rng.sample(post_ids, per_user)
+            ]
+
+        Like.objects.bulk_create(pairs(Like, options['likes_per_user']), batch_size=batch_size, ignore_conflicts=True)
+        Favorite.objects.bulk_create(pairs(Favorite, options['favorites_per_user']), batch_size=batch_size, ignore_conflicts=True)
+
+        # bulk_create обходит сигналы: пересчитываем like_count и поисковый индекс явно
+        call_command('rebuild_like_counts', stdout=self.stdout)
+        call_command('refresh_trending', rebuild=True, stdout=self.stdout)
+        if not options['skip_search_index']:
+            call_command('rebuild_search_index', stdout=self.stdout)
+        bump_feed_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Создано: новостей {len(post_ids)}, пользователей {len(user_ids)} '
+            f'(пароль {BENCH_PASSWORD}), изображений {len(post_ids) * options["images_per_post"]}'
+        ))
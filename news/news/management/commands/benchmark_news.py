@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from news.benchmark import SCENARIOS, run_benchmarks, save_report, load_report, format_report
+
+
+class Command(BaseCommand):
+	help = (
+		'Замеряет задержки (p50/p95/p99), число SQL-запросов и RSS на горячих страницах. '
+		'Данные для замера: add_sample_news --posts N. Для результатов, близких к продакшену, '
+		'запускайте с DJANGO_DEBUG=False после build_static'
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument('--iterations', type=int, default=200, help='Замеров на сценарий')
+		parser.add_argument('--warmup', type=int, default=10, help='Прогревочных запросов на сценарий (не учитываются)')
+		parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"Сценарии через запятую: {', '.join(SCENARIOS)}")
+		parser.add_argument('--user', help='Пользователь для авторизованных сценариев (по умолчанию — первый с избранным)')
+		parser.add_argument('--json', dest='json_path', help='Сохранить отчёт в JSON')
+		parser.add_argument('--compare', help='JSON-отчёт предыдущего прогона для сравнения')
+
+	def handle(self, *args, **options):
+		scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+		unknown = set(scenarios) - set(SCENARIOS)
+		if unknown:
+			raise CommandError(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+
+		if options['user']:
+			user = User.objects.filter(username=options['user']).first()
+		else:
+			user = User.objects.filter(favorites__isnull=False).order_by('id').first() or User.objects.order_by('id').first()
+		if user is None:
+			raise CommandError('Пользователь не найден — заполните базу через add_sample_news --posts N')
+
+		baseline = load_report(options['compare']) if options['compare'] else None
+		try:
+			report = run_benchmarks(user, options['iterations'], options['warmup'], scenarios)
+		except ValueError as e:
+			raise CommandError(str(e))
+
+		self.stdout.write(format_report(report, baseline))
+		if report['debug']:
+			self.stdout.write(self.style.WARNING('DEBUG=True: замеры не отражают продакшен-конфигурацию'))
+		if options['json_path']:
+			save_report(report, options['json_path'])
+			self.stdout.write(self.style.SUCCESS(f"Отчёт сохранён: {options['json_path']}"))
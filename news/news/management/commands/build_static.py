@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from news import assets
+
+
+class Command(BaseCommand):
+	help = (
+		'Скачивает Bootstrap в static/vendor/, собирает и минифицирует бандлы CSS/JS в static/dist/ '
+		'и выполняет collectstatic (отпечатки в именах, .gz и .br). Печатает размеры бандлов'
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument('--offline', action='store_true', help='Не скачивать вендорные файлы, использовать уже скачанные')
+		parser.add_argument('--refresh_vendor', action='store_true', help='Скачать вендорные файлы заново')
+		parser.add_argument('--skip_collectstatic', action='store_true', help='Только собрать бандлы')
+
+	def handle(self, *args, **options):
+		try:
+			if not options['offline']:
+				for name in assets.fetch_vendor(refresh=options['refresh_vendor']):
+					self.stdout.write(f'Скачан {name}')
+			reports, previous = assets.build_bundles()
+		except assets.AssetError as e:
+			raise CommandError(str(e))
+
+		if not options['skip_collectstatic']:
+			call_command('collectstatic', interactive=False, verbosity=0)
+			self.stdout.write(f'collectstatic: {settings.STATIC_ROOT}')
+		self.stdout.write(assets.format_sizes(reports, previous))
+		if assets.brotli is None:
+			self.stdout.write(self.style.WARNING('Пакет brotli не установлен: .br не создаются (pip install brotli)'))
@@ -0,0 +1,34 @@
+import time
+from itertools import chain
+
+from django.core.management.base import BaseCommand, CommandError
+from news import transfer
+
+
+class Command(BaseCommand):
+	help = (
+		'Выгружает новости с изображениями и лайками в JSON Lines или CSV (по расширению файла, '
+		'.gz — со сжатием). Данные читаются потоком, память не зависит от объёма базы'
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument('path', help='Файл выгрузки: news.jsonl, news.jsonl.gz, news.csv ...')
+		parser.add_argument('--format', choices=transfer.FORMATS, help='Формат, если его не видно по расширению')
+		parser.add_argument('--approved', action='store_true', help='Только одобренные новости')
+
+	def handle(self, *args, **options):
+		path = options['path']
+		fmt = options['format'] or transfer.detect_format(path)
+		started = time.monotonic()
+		try:
+			with transfer.open_file(path, 'w') as f:
+				records = transfer.post_records(approved_only=options['approved'])
+				if fmt == 'jsonl':
+					records = chain(transfer.user_records(), records)
+				count = transfer.write_records(f, fmt, records)
+		except OSError as e:
+			raise CommandError(f'Не удалось записать {path}: {e}')
+		self.stdout.write(self.style.SUCCESS(
+			f'Выгружено новостей: {count} в {path} ({fmt}) за {time.monotonic() - started:.1f} с'
+		))
+
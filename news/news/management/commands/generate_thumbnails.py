@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from news.models import NewsImage
+from news.thumbnails import generate_many, Image
+
+
+class Command(BaseCommand):
+	help = 'Генерирует превью (WebP/JPEG) для изображений новостей, у которых их ещё нет'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--force', action='store_true', help='Перегенерировать и уже готовые превью')
+		parser.add_argument('--workers', type=int, default=None, help='Размер пула потоков')
+		parser.add_argument('--batch_size', type=int, default=500, help='Сколько изображений брать за раз')
+
+	def handle(self, *args, **options):
+		if Image is None:
+			self.stderr.write(self.style.ERROR('Pillow не установлен: pip install Pillow'))
+			return
+		images = NewsImage.objects.order_by('id')
+		if not options['force']:
+			images = images.filter(thumbnails_ready=False)
+
+		done = 0
+		processed = 0
+		last_id = 0
+		while True:
+			batch = list(images.filter(id__gt=last_id)[:options['batch_size']])
+			if not batch:
+				break
+			last_id = batch[-1].id
+			done += generate_many(batch, workers=options['workers'], force=options['force'])
+			processed += len(batch)
+			self.stdout.write(f'Обработано {processed}, готово {done}')
+		self.stdout.write(self.style.SUCCESS(f'Сгенерировано превью для изображений: {done}'))
@@ -0,0 +1,98 @@
+import csv
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from news import transfer
+from news.caching import bump_feed_version
+
+
+class Command(BaseCommand):
+	help = (
+		'Загружает новости с изображениями и лайками из выгрузки export_news (JSON Lines или CSV). '
+		'Пишет пачками bulk_create, по транзакции на пачку; прерванный запуск продолжается '
+		'с последней загруженной пачки'
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument('path', help='Файл выгрузки export_news')
+		parser.add_argument('--format', choices=transfer.FORMATS, help='Формат, если его не видно по расширению')
+		parser.add_argument('--batch_size', type=int, default=1000, help='Записей в одной транзакции')
+		parser.add_argument('--checkpoint', default=str(settings.BASE_DIR / 'import_news.checkpoint'),
+			help='Файл с позицией для продолжения прерванного запуска')
+		parser.add_argument('--restart', action='store_true', help='Начать сначала, игнорируя сохранённую позицию')
+		parser.add_argument('--skip_search_index', action='store_true', help='Не индексировать для поиска (можно позже: rebuild_search_index)')
+
+	def handle(self, *args, **options):
+		path = options['path']
+		fmt = options['format'] or transfer.detect_format(path)
+		checkpoint = options['checkpoint']
+		try:
+			source = {'path': os.path.abspath(path), 'size': os.path.getsize(path)}
+		except OSError as e:
+			raise CommandError(f'Не удалось открыть {path}: {e}')
+
+		done = 0 if options['restart'] else self.load_checkpoint(checkpoint, source)
+		if done:
+			self.stdout.write(f'Продолжаем после записи {done}')
+
+		importer = transfer.Importer(index_search=not options['skip_search_index'])
+		started = time.monotonic()
+		try:
+			with transfer.open_file(path, 'r') as f:
+				records = transfer.read_records(f, fmt)
+				# Уже загруженные записи только читаются: это быстрее, чем искать их в БД
+				for _ in range(done):
+					if next(records, None) is None:
+						break
+				for batch in transfer.batches(records, options['batch_size']):
+					importer.import_batch(batch)
+					done += len(batch)
+					self.save_checkpoint(checkpoint, source, done)
+					elapsed = time.monotonic() - started
+					self.stdout.write(
+						f'{done} записей, новостей: {importer.posts}, изображений: {importer.images}, '
+						f'лайков: {importer.likes} ({importer.posts / elapsed if elapsed else 0:.0f} новостей/с)'
+					)
+		except (transfer.TransferError, csv.Error, ValueError, KeyError) as e:
+			raise CommandError(f'Ошибка в {path} после записи {done}: {e!r}')
+
+		# Пачки писались в обход сигналов: рейтинг и кэш ленты обновляем явно
+		if importer.likes:
+			call_command('refresh_trending', rebuild=True, stdout=self.stdout)
+		if importer.posts:
+			bump_feed_version()
+		self.clear_checkpoint(checkpoint)
+		self.stdout.write(self.style.SUCCESS(
+			f'Загружено новостей: {importer.posts}, изображений: {importer.images}, лайков: {importer.likes}, '
+			f'новых пользователей: {importer.users}'
+		))
+		if importer.images:
+			self.stdout.write('Превью изображений: python manage.py generate_thumbnails')
+
+	@staticmethod
+	def load_checkpoint(path, source):
+		try:
+			with open(path, encoding='utf-8') as f:
+				state = json.load(f)
+		except (OSError, ValueError):
+			return 0
+		# Позиция от другого файла (или изменённого с тех пор) не подходит
+		return state.get('records', 0) if state.get('source') == source else 0
+
+	@staticmethod
+	def save_checkpoint(path, source, records):
+		# Через временный файл: прерывание во время записи не должно оставить битую позицию
+		with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+			json.dump({'source': source, 'records': records}, f)
+		os.replace(f'{path}.tmp', path)
+
+	@staticmethod
+	def clear_checkpoint(path):
+		try:
+			os.remove(path)
+		except OSError:
+			pass
@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from news.services import NewsScrapingService
+
+
+class Command(BaseCommand):
+	help = 'Загружает новости на модерацию (демо-генератор и/или страницы по ссылкам) без участия веб-запроса'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--count', type=int, default=0, help='Сколько демо-новостей сгенерировать')
+		parser.add_argument('--urls_file', help='Файл со ссылками на статьи, по одной на строку')
+		parser.add_argument('--user', default='admin', help='Пользователь, от имени которого загружаются новости')
+		parser.add_argument('--workers', type=int, default=8, help='Сколько страниц загружать параллельно')
+
+	def handle(self, *args, **options):
+		try:
+			user = User.objects.get(username=options['user'])
+		except User.DoesNotExist:
+			raise CommandError(f"Пользователь {options['user']} не найден")
+
+		urls = []
+		if options['urls_file']:
+			with open(options['urls_file'], encoding='utf-8') as f:
+				urls = [line.strip() for line in f if line.strip()]
+
+		service = NewsScrapingService(max_workers=options['workers'])
+		loaded = service.load_news_batch(user, options['count'], urls)
+		self.stdout.write(self.style.SUCCESS(f'Загружено новостей для модерации: {len(loaded)}'))
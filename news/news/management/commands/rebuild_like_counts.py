@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from news.models import News_post, Like
+
+
+class Command(BaseCommand):
+	help = 'Пересчитывает денормализованный счётчик лайков News_post.like_count'
+
+	def handle(self, *args, **options):
+		# Нужен после массовых операций в обход сигналов (bulk_create, raw SQL, импорт)
+		counts = Like.objects.filter(news_post=OuterRef('pk')).values('news_post').annotate(c=Count('id')).values('c')
+		updated = News_post.objects.update(like_count=Coalesce(Subquery(counts), 0))
+		self.stdout.write(self.style.SUCCESS(f'Пересчитано счётчиков лайков: {updated}'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from news.models import News_post
+from news.search import rebuild_index
+
+
+class Command(BaseCommand):
+	help = 'Полностью перестраивает полнотекстовый индекс одобренных новостей'
+
+	def handle(self, *args, **options):
+		posts = News_post.objects.filter(is_approved=True).values_list('id', 'title', 'short_description', 'text')
+		count = rebuild_index(posts.iterator(chunk_size=1000))
+		self.stdout.write(self.style.SUCCESS(f'Проиндексировано новостей: {count}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from news import trending
+
+
+class Command(BaseCommand):
+	help = 'Переносит новые лайки в рейтинг «в тренде» (для cron); с --rebuild пересчитывает его по всем лайкам'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--rebuild', action='store_true', help='Полный пересчёт по таблице лайков')
+
+	def handle(self, *args, **options):
+		if options['rebuild']:
+			count = trending.rebuild()
+			self.stdout.write(self.style.SUCCESS(f'Рейтинг пересчитан, новостей в рейтинге: {count}'))
+		else:
+			count = trending.refresh()
+			self.stdout.write(self.style.SUCCESS(f'Учтено изменений лайков: {count}'))
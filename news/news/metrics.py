@@ -0,0 +1,310 @@
+"""
+Метрики запросов: длительность, SQL (число и время), рендер шаблонов и исходящий HTTP.
+
+RequestMetricsMiddleware собирает их для каждого запроса (WSGI и ASGI) и:
+- отдаёт заголовок Server-Timing (в DEBUG и для staff);
+- копит агрегаты по маршрутам в памяти процесса для эндпоинта /metrics/ в формате Prometheus;
+- пишет в лог news.slow_requests медленные запросы с самыми дорогими SQL.
+
+Время шаблонов считается через бэкенд InstrumentedDjangoTemplates (см. TEMPLATES
+в settings) без SQL, выполненного ленивыми queryset внутри шаблона. Исходящий HTTP
+учитывается там, где код явно оборачивает его в track_http().
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('news.slow_requests')
+
+# Границы корзин гистограммы длительности запросов, секунды
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_PREVIEW_CHARS = 300
+# Список колонок SELECT без вложенных подзапросов — в логе он только мешает
+_SELECT_COLUMNS_RE = re.compile(r'^SELECT (?:(?!SELECT).)*? FROM ', re.DOTALL)
+
+_current = ContextVar('news_request_metrics', default=None)
+
+
+class RequestMetrics:
+	"""Счётчики одного запроса"""
+
+	def __init__(self):
+		self.started = time.perf_counter()
+		self.sql_count = 0
+		self.sql_time = 0.0
+		self.template_time = 0.0
+		self.http_count = 0
+		self.http_time = 0.0
+		# SQL-текст -> [число выполнений, суммарное время]; одинаковый текст с разными
+		# параметрами складывается, поэтому N+1 виден как одна дорогая строка
+		self.queries = {}
+		self._template_depth = 0
+
+	@property
+	def duration(self):
+		return time.perf_counter() - self.started
+
+	def __call__(self, execute, sql, params, many, context):
+		started = time.perf_counter()
+		try:
+			return execute(sql, params, many, context)
+		finally:
+			elapsed = time.perf_counter() - started
+			self.sql_count += 1
+			self.sql_time += elapsed
+			stats = self.queries.setdefault(sql, [0, 0.0])
+			stats[0] += 1
+			stats[1] += elapsed
+
+	def top_queries(self, limit):
+		return sorted(self.queries.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+
+
+def _record_sql(execute, sql, params, many, context):
+	metrics = _current.get()
+	if metrics is None:
+		return execute(sql, params, many, context)
+	return metrics(execute, sql, params, many, context)
+
+
+def install_sql_recorder(connection, **kwargs):
+	"""
+	Подключает учёт SQL к соединению. Метрики берутся из contextvar, поэтому учитываются
+	и запросы асинхронных view, которые ORM выполняет в другом потоке через sync_to_async.
+	"""
+	if _record_sql not in connection.execute_wrappers:
+		# В начало списка: connection.execute_wrapper() снимает свою обёртку через pop()
+		connection.execute_wrappers.insert(0, _record_sql)
+
+
+def current():
+	"""Метрики текущего запроса или None вне RequestMetricsMiddleware"""
+	return _current.get()
+
+
+@contextmanager
+def track_http():
+	"""Учитывает время исходящего HTTP-запроса в метриках текущего запроса"""
+	metrics = _current.get()
+	started = time.perf_counter()
+	try:
+		yield
+	finally:
+		if metrics is not None:
+			metrics.http_count += 1
+			metrics.http_time += time.perf_counter() - started
+
+
+# --- Шаблоны -------------------------------------------------------------------
+
+class TimedTemplate(Template):
+	def render(self, context=None, request=None):
+		metrics = _current.get()
+		if metrics is None or metrics._template_depth:
+			return super().render(context, request)
+		metrics._template_depth += 1
+		started = time.perf_counter()
+		sql_before = metrics.sql_time
+		try:
+			return super().render(context, request)
+		finally:
+			metrics._template_depth -= 1
+			metrics.template_time += time.perf_counter() - started - (metrics.sql_time - sql_before)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+	"""Стандартный бэкенд Django, замеряющий время рендера шаблонов"""
+
+	def from_string(self, template_code):
+		return TimedTemplate(self.engine.from_string(template_code), self)
+
+	def get_template(self, template_name):
+		return TimedTemplate(super().get_template(template_name).template, self)
+
+
+# --- Агрегаты по маршрутам -------------------------------------------------------
+
+class RouteStats:
+	def __init__(self):
+		self.count = 0
+		self.duration = 0.0
+		self.buckets = [0] * len(DURATION_BUCKETS)
+		self.statuses = {}
+		self.sql_count = 0
+		self.sql_time = 0.0
+		self.template_time = 0.0
+		self.http_count = 0
+		self.http_time = 0.0
+
+
+class Registry:
+	"""Агрегаты в памяти процесса; при нескольких воркерах у каждого свои"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._routes = {}
+
+	def record(self, route, status, metrics, duration):
+		status_class = f'{status // 100}xx'
+		with self._lock:
+			stats = self._routes.get(route)
+			if stats is None:
+				stats = self._routes[route] = RouteStats()
+			stats.count += 1
+			stats.duration += duration
+			index = bisect.bisect_left(DURATION_BUCKETS, duration)
+			if index < len(stats.buckets):
+				stats.buckets[index] += 1
+			stats.statuses[status_class] = stats.statuses.get(status_class, 0) + 1
+			stats.sql_count += metrics.sql_count
+			stats.sql_time += metrics.sql_time
+			stats.template_time += metrics.template_time
+			stats.http_count += metrics.http_count
+			stats.http_time += metrics.http_time
+
+	def reset(self):
+		with self._lock:
+			self._routes.clear()
+
+	def render_prometheus(self):
+		"""Текстовый формат экспозиции Prometheus"""
+		with self._lock:
+			routes = sorted(self._routes.items())
+			lines = [
+				'# HELP news_http_request_duration_seconds Длительность обработки запроса.',
+				'# TYPE news_http_request_duration_seconds histogram',
+			]
+			for route, stats in routes:
+				cumulative = 0
+				for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+					cumulative += count
+					lines.append(f'news_http_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+				lines.append(f'news_http_request_duration_seconds_bucket{{route="{route}",le="+Inf"}} {stats.count}')
+				lines.append(f'news_http_request_duration_seconds_sum{{route="{route}"}} {stats.duration:.6f}')
+				lines.append(f'news_http_request_duration_seconds_count{{route="{route}"}} {stats.count}')
+
+			counters = (
+				('news_http_requests_total', 'Запросы по классу статуса ответа.', None),
+				('news_db_queries_total', 'SQL-запросы.', 'sql_count'),
+				('news_db_query_seconds_total', 'Время SQL-запросов.', 'sql_time'),
+				('news_template_render_seconds_total', 'Время рендера шаблонов без SQL.', 'template_time'),
+				('news_outbound_http_requests_total', 'Исходящие HTTP-запросы.', 'http_count'),
+				('news_outbound_http_seconds_total', 'Время исходящих HTTP-запросов.', 'http_time'),
+			)
+			for name, help_text, attr in counters:
+				lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+				for route, stats in routes:
+					if attr is None:
+						for status_class, count in sorted(stats.statuses.items()):
+							lines.append(f'{name}{{route="{route}",status="{status_class}"}} {count}')
+					else:
+						value = getattr(stats, attr)
+						lines.append(f'{name}{{route="{route}"}} {value:.6f}' if isinstance(value, float) else f'{name}{{route="{route}"}} {value}')
+		return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+# --- Middleware ---------------------------------------------------------------------
+
+def _route(request):
+	match = getattr(request, 'resolver_match', None)
+	if match is None:
+		return 'unmatched'
+	return (match.view_name or match.route).replace('"', '')
+
+
+def _sql_preview(sql):
+	return _SELECT_COLUMNS_RE.sub('SELECT … FROM ', sql, count=1)[:SQL_PREVIEW_CHARS]
+
+
+def _server_timing(metrics, duration):
+	return ', '.join([
+		f'total;dur={duration * 1000:.1f}',
+		f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.sql_count} queries"',
+		f'tpl;dur={metrics.template_time * 1000:.1f}',
+		f'http;dur={metrics.http_time * 1000:.1f};desc="{metrics.http_count} requests"',
+	])
+
+
+def _loaded_user_is_staff(request):
+	"""
+	is_staff пользователя, если его уже загрузил view. Сам пользователь не загружается:
+	иначе маршруты, которым он не нужен, читали бы сессию уже после замера.
+	"""
+	user = request.__dict__.get('_cached_user') or request.__dict__.get('_acached_user')
+	return user is not None and user.is_staff
+
+
+class RequestMetricsMiddleware:
+	"""Работает и в WSGI, и в ASGI: асинхронные view не переводятся в поток ради метрик"""
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		self.is_async = iscoroutinefunction(get_response)
+		if self.is_async:
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if self.is_async:
+			return self.__acall__(request)
+		if not settings.METRICS_ENABLED:
+			return self.get_response(request)
+
+		metrics, token = self._start()
+		try:
+			response = self.get_response(request)
+		finally:
+			_current.reset(token)
+		self._finish(request, response, metrics, _loaded_user_is_staff(request))
+		return response
+
+	async def __acall__(self, request):
+		if not settings.METRICS_ENABLED:
+			return await self.get_response(request)
+
+		metrics, token = self._start()
+		try:
+			response = await self.get_response(request)
+		finally:
+			_current.reset(token)
+		self._finish(request, response, metrics, _loaded_user_is_staff(request))
+		return response
+
+	def _start(self):
+		for connection in connections.all():
+			install_sql_recorder(connection)
+		metrics = RequestMetrics()
+		return metrics, _current.set(metrics)
+
+	def _finish(self, request, response, metrics, is_staff):
+		duration = metrics.duration
+		route = _route(request)
+		registry.record(route, response.status_code, metrics, duration)
+
+		if settings.DEBUG or is_staff:
+			response['Server-Timing'] = _server_timing(metrics, duration)
+
+		if duration * 1000 >= settings.METRICS_SLOW_REQUEST_MS:
+			top = '\n'.join(
+				f'  {total * 1000:8.1f} ms ×{count:<4} {_sql_preview(sql)}'
+				for sql, (count, total) in metrics.top_queries(settings.METRICS_SLOW_QUERY_TOP)
+			)
+			logger.warning(
+				'Медленный запрос %s %s (%s): %.0f ms, SQL %d за %.0f ms, шаблоны %.0f ms, HTTP %d за %.0f ms\n%s',
+				request.method, request.get_full_path(), route, duration * 1000,
+				metrics.sql_count, metrics.sql_time * 1000, metrics.template_time * 1000,
+				metrics.http_count, metrics.http_time * 1000, top,
+			)
@@ -0,0 +1,36 @@
+"""
+Middleware, которые нужны приложению под ASGI.
+
+WhiteNoiseMiddleware умеет работать только синхронно. Один синхронный middleware
+заставляет Django гонять каждый запрос через поток sync_to_async, и асинхронные
+view теряют смысл. Поиск статического файла — это поиск в словаре, поэтому
+асинхронная ветка делает его прямо в event loop.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response=None, *args, **kwargs):
+		super().__init__(get_response, *args, **kwargs)
+		self.is_async = iscoroutinefunction(get_response)
+		if self.is_async:
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if self.is_async:
+			return self.__acall__(request)
+		return super().__call__(request)
+
+	async def __acall__(self, request):
+		if self.autorefresh:
+			# В DEBUG файлы ищутся на диске
+			static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+		else:
+			static_file = self.files.get(request.path_info)
+		if static_file is not None:
+			return self.serve(static_file, request)
+		return await self.get_response(request)
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:39
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_like_count(apps, schema_editor):
+    News_post = apps.get_model('news', 'News_post')
+    Like = apps.get_model('news', 'Like')
+    counts = Like.objects.filter(news_post=OuterRef('pk')).values('news_post').annotate(c=Count('id')).values('c')
+    News_post.objects.update(like_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_favorite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news_post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество лайков'),
+        ),
+        migrations.RunPython(fill_like_count, migrations.RunPython.noop),
+    ]
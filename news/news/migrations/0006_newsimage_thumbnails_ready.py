@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_news_post_like_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsimage',
+            name='thumbnails_ready',
+            field=models.BooleanField(default=False, verbose_name='Превью готовы'),
+        ),
+    ]
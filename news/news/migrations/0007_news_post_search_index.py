@@ -0,0 +1,51 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from news.search import FTS_TABLE, PG_TABLE, rebuild_index
+
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5(title, short_description, text, tokenize='unicode61 remove_diacritics 2')"
+            )
+        except Exception:
+            # Сборка SQLite без FTS5: поиск будет работать через icontains
+            return
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE TABLE IF NOT EXISTS {PG_TABLE} ('
+            'post_id bigint PRIMARY KEY REFERENCES news_news_post (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {PG_TABLE}_document_gin ON {PG_TABLE} USING gin (document)')
+    else:
+        return
+
+    News_post = apps.get_model('news', 'News_post')
+    rebuild_index(
+        News_post.objects.filter(is_approved=True).values_list('id', 'title', 'short_description', 'text').iterator()
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    from news.search import FTS_TABLE, PG_TABLE
+
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {PG_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_newsimage_thumbnails_ready'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
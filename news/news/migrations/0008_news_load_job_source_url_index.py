@@ -0,0 +1,45 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0007_news_post_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='news_post',
+            name='source_url',
+            field=models.URLField(blank=True, db_index=True, null=True, verbose_name='URL источника'),
+        ),
+        migrations.AlterField(
+            model_name='pendingnews',
+            name='source_url',
+            field=models.URLField(db_index=True, verbose_name='URL источника'),
+        ),
+        migrations.CreateModel(
+            name='NewsLoadJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество новостей')),
+                ('urls', models.TextField(blank=True, verbose_name='Ссылки на статьи')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('loaded', models.PositiveIntegerField(default=0, verbose_name='Загружено')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Запущено пользователем')),
+            ],
+            options={
+                'verbose_name': 'Загрузка новостей',
+                'verbose_name_plural': 'Загрузки новостей',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0008_news_load_job_source_url_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pendingnews',
+            index=models.Index(fields=['is_processed', '-created_at'], name='pendingnews_queue_idx'),
+        ),
+    ]
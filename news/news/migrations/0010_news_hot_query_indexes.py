@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0009_pendingnews_queue_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='pendingnews',
+            name='pendingnews_queue_idx',
+        ),
+        migrations.AlterField(
+            model_name='newsimage',
+            name='news_post',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='images', to='news.news_post', verbose_name='Новость'),
+        ),
+        migrations.AddIndex(
+            model_name='news_post',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['-pub_date', '-id'], name='news_post_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='newsimage',
+            index=models.Index(fields=['news_post', 'id'], name='newsimage_post_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='newsloadjob',
+            index=models.Index(fields=['-created_at'], name='newsloadjob_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pendingnews',
+            index=models.Index(condition=models.Q(('is_processed', False)), fields=['-created_at'], name='pendingnews_unprocessed_idx'),
+        ),
+    ]
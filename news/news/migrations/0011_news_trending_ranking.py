@@ -0,0 +1,85 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:05
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_ranking(apps, schema_editor):
+    from news.trending import weight
+
+    Like = apps.get_model('news', 'Like')
+    NewsRanking = apps.get_model('news', 'NewsRanking')
+    NewsRankingState = apps.get_model('news', 'NewsRankingState')
+    now = timezone.now()
+    scores = defaultdict(float)
+    for post_id, liked_at in Like.objects.values_list('news_post_id', 'created_at').iterator(chunk_size=5000):
+        scores[post_id] += weight(liked_at, now)
+    NewsRanking.objects.bulk_create(
+        [NewsRanking(news_post_id=post_id, score=score) for post_id, score in scores.items()], batch_size=1000,
+    )
+    NewsRankingState.objects.create(pk=1, epoch=now, refreshed_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0010_news_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsRanking',
+            fields=[
+                ('news_post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='news.news_post', verbose_name='Новость')),
+                ('score', models.FloatField(default=0, verbose_name='Рейтинг')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг новости',
+                'verbose_name_plural': 'Рейтинг новостей',
+            },
+        ),
+        migrations.CreateModel(
+            name='NewsRankingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('liked_at', models.DateTimeField(verbose_name='Время лайка')),
+                ('delta', models.SmallIntegerField(verbose_name='Изменение')),
+            ],
+            options={
+                'verbose_name': 'Изменение рейтинга',
+                'verbose_name_plural': 'Изменения рейтинга',
+            },
+        ),
+        migrations.CreateModel(
+            name='NewsRankingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.DateTimeField(verbose_name='Точка отсчёта весов')),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True, verbose_name='Пересчитан')),
+            ],
+            options={
+                'verbose_name': 'Состояние рейтинга',
+                'verbose_name_plural': 'Состояние рейтинга',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='news_post',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['-like_count', '-id'], name='news_post_top_liked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='newsranking',
+            index=models.Index(fields=['-score'], name='newsranking_score_idx'),
+        ),
+        migrations.AddField(
+            model_name='newsrankingevent',
+            name='news_post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='news.news_post', verbose_name='Новость'),
+        ),
+        migrations.RunPython(fill_ranking, migrations.RunPython.noop),
+    ]
@@ -10,32 +10,50 @@ class News_post(models.Model):
 	pub_date = models.DateTimeField('Дата публикации')
 	author = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Автор')
 	image = models.CharField('Изображение (URL)', max_length=500, blank=True, null=True)
-	source_url = models.URLField('URL источника', blank=True, null=True)
+	source_url = models.URLField('URL источника', blank=True, null=True, db_index=True)
 	is_approved = models.BooleanField('Одобрено', default=False)
 	is_from_internet = models.BooleanField('Загружено из интернета', default=False)
 	likes = models.ManyToManyField(User, through='Like', related_name='liked_posts', blank=True)
+	# Денормализованный счётчик, синхронизируется сигналами Like (см. signals.py)
+	like_count = models.PositiveIntegerField('Количество лайков', default=0, editable=False)
 	
 	def __str__(self):
 		return self.title
 	
 	def total_likes(self):
-		return self.likes.count()
+		return self.like_count
+	total_likes.short_description = 'Лайки'
 	
 	def is_liked_by(self, user):
-		if user.is_authenticated:
-			return self.likes.filter(id=user.id).exists()
-		return False
+		if not getattr(user, 'is_authenticated', False):
+			return False
+		from .caching import user_post_ids
+		return self.id in user_post_ids(user).liked
+
+	def is_favorited_by(self, user):
+		if not getattr(user, 'is_authenticated', False):
+			return False
+		from .caching import user_post_ids
+		return self.id in user_post_ids(user).favorited
 	
 	class Meta:
 		verbose_name = 'Новость'
 		verbose_name_plural = 'Новости'
+		indexes = [
+			# Лента: filter(is_approved=True) + keyset по (pub_date, id). Индекс частичный,
+			# потому что Django пишет условие как WHERE is_approved, и SQLite не может
+			# использовать для него индекс, начинающийся с is_approved
+			models.Index(fields=['-pub_date', '-id'], condition=models.Q(is_approved=True), name='news_post_feed_idx'),
+			# «Самые популярные» на странице трендов
+			models.Index(fields=['-like_count', '-id'], condition=models.Q(is_approved=True), name='news_post_top_liked_idx'),
+		]
 
 
 class PendingNews(models.Model):
 	title = models.CharField('Название новости', max_length=200)
 	short_description = models.CharField('Краткое описание новости', max_length=300)
 	text = models.TextField('Текст новости')
-	source_url = models.URLField('URL источника')
+	source_url = models.URLField('URL источника', db_index=True)
 	image_url = models.URLField('URL изображения', blank=True, null=True)
 	created_at = models.DateTimeField('Дата загрузки', auto_now_add=True)
 	created_by = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Загружено пользователем')
@@ -45,6 +63,10 @@ class PendingNews(models.Model):
 		verbose_name = 'Новость на модерации'
 		verbose_name_plural = 'Новости на модерации'
 		ordering = ['-created_at']
+		indexes = [
+			# Частичный индекс: SQLite не использует составной индекс для условия WHERE NOT is_processed
+			models.Index(fields=['-created_at'], condition=models.Q(is_processed=False), name='pendingnews_unprocessed_idx'),
+		]
 	
 	def __str__(self):
 		return f'{self.title} (ожидает модерации)'
@@ -65,14 +87,21 @@ class Like(models.Model):
 
 
 class NewsImage(models.Model):
-	news_post = models.ForeignKey(News_post, on_delete=models.CASCADE, related_name='images', verbose_name='Новость')
+	# Отдельный индекс по FK не нужен: его заменяет составной newsimage_post_order_idx
+	news_post = models.ForeignKey(News_post, on_delete=models.CASCADE, related_name='images', verbose_name='Новость', db_index=False)
 	image_url = models.URLField('URL изображения', max_length=500)
 	created_at = models.DateTimeField('Дата добавления', auto_now_add=True)
+	# Превью сгенерированы (см. thumbnails.py)
+	thumbnails_ready = models.BooleanField('Превью готовы', default=False)
 
 	class Meta:
 		verbose_name = 'Изображение новости'
 		verbose_name_plural = 'Изображения новости'
 		ordering = ['id']
+		indexes = [
+			# post.images.all(): WHERE news_post_id = ... ORDER BY id без сортировки
+			models.Index(fields=['news_post', 'id'], name='newsimage_post_order_idx'),
+		]
 
 	def __str__(self):
 		return f'Изображение для: {self.news_post.title}'
@@ -90,3 +119,78 @@ class Favorite(models.Model):
 
 	def __str__(self):
 		return f'{self.user.username} добавил в избранное "{self.news_post.title}"'
+
+
+class NewsLoadJob(models.Model):
+	STATUS_PENDING = 'pending'
+	STATUS_RUNNING = 'running'
+	STATUS_DONE = 'done'
+	STATUS_FAILED = 'failed'
+	STATUS_CHOICES = [
+		(STATUS_PENDING, 'В очереди'),
+		(STATUS_RUNNING, 'Выполняется'),
+		(STATUS_DONE, 'Готово'),
+		(STATUS_FAILED, 'Ошибка'),
+	]
+
+	created_by = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Запущено пользователем')
+	count = models.PositiveIntegerField('Количество новостей', default=0)
+	urls = models.TextField('Ссылки на статьи', blank=True)
+	status = models.CharField('Статус', max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+	loaded = models.PositiveIntegerField('Загружено', default=0)
+	error = models.TextField('Ошибка', blank=True)
+	created_at = models.DateTimeField('Создано', auto_now_add=True)
+	finished_at = models.DateTimeField('Завершено', blank=True, null=True)
+
+	class Meta:
+		verbose_name = 'Загрузка новостей'
+		verbose_name_plural = 'Загрузки новостей'
+		ordering = ['-created_at']
+		indexes = [
+			models.Index(fields=['-created_at'], name='newsloadjob_created_idx'),
+		]
+
+	def __str__(self):
+		return f'Загрузка #{self.id} ({self.get_status_display()})'
+
+	def url_list(self):
+		return [line.strip() for line in self.urls.splitlines() if line.strip()]
+
+
+class NewsRanking(models.Model):
+	"""
+	Материализованный рейтинг «в тренде» (см. trending.py). score — сумма весов лайков,
+	вес растёт экспоненциально со временем лайка, поэтому сортировка по score равна
+	сортировке по затухающему со временем числу лайков.
+	"""
+	news_post = models.OneToOneField(News_post, on_delete=models.CASCADE, primary_key=True, related_name='ranking', verbose_name='Новость')
+	score = models.FloatField('Рейтинг', default=0)
+	updated_at = models.DateTimeField('Обновлено', auto_now=True)
+
+	class Meta:
+		verbose_name = 'Рейтинг новости'
+		verbose_name_plural = 'Рейтинг новостей'
+		indexes = [
+			models.Index(fields=['-score'], name='newsranking_score_idx'),
+		]
+
+
+class NewsRankingEvent(models.Model):
+	"""Поставленный (+1) или снятый (-1) лайк, ещё не учтённый в NewsRanking"""
+	news_post = models.ForeignKey(News_post, on_delete=models.CASCADE, related_name='+', verbose_name='Новость')
+	liked_at = models.DateTimeField('Время лайка')
+	delta = models.SmallIntegerField('Изменение')
+
+	class Meta:
+		verbose_name = 'Изменение рейтинга'
+		verbose_name_plural = 'Изменения рейтинга'
+
+
+class NewsRankingState(models.Model):
+	"""Единственная строка: точка отсчёта весов и время последнего пересчёта рейтинга"""
+	epoch = models.DateTimeField('Точка отсчёта весов')
+	refreshed_at = models.DateTimeField('Пересчитан', blank=True, null=True)
+
+	class Meta:
+		verbose_name = 'Состояние рейтинга'
+		verbose_name_plural = 'Состояние рейтинга'
@@ -0,0 +1,62 @@
+"""
+Массовая модерация PendingNews.
+
+Одобрение N новостей — это один bulk_create для News_post, один для NewsImage
+и один UPDATE очереди внутри одной транзакции. bulk_create не шлёт сигналы,
+поэтому поисковый индекс, кэш и превью обновляются здесь явно.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import search
+from .caching import bump_feed_version
+from .models import News_post, NewsImage, PendingNews
+from .thumbnails import schedule_thumbnails
+
+BATCH_SIZE = 500
+
+
+def approve_pending_news(pending_ids, author):
+	"""Публикует выбранные необработанные новости. Возвращает список созданных News_post."""
+	with transaction.atomic():
+		pending = list(
+			PendingNews.objects.select_for_update()
+			.filter(id__in=pending_ids, is_processed=False)
+			.order_by('created_at')
+		)
+		if not pending:
+			return []
+
+		now = timezone.now()
+		posts = News_post.objects.bulk_create([
+			News_post(
+				title=item.title,
+				short_description=item.short_description,
+				text=item.text,
+				author=author,
+				pub_date=now,
+				source_url=item.source_url,
+				image=item.image_url or '',
+				is_approved=True,
+				is_from_internet=True,
+			)
+			for item in pending
+		], batch_size=BATCH_SIZE)
+
+		images = NewsImage.objects.bulk_create([
+			NewsImage(news_post=post, image_url=item.image_url)
+			for post, item in zip(posts, pending) if item.image_url
+		], batch_size=BATCH_SIZE)
+
+		PendingNews.objects.filter(id__in=[item.id for item in pending]).update(is_processed=True)
+
+		for post in posts:
+			search.index_post(post.id, post.title, post.short_description, post.text)
+		transaction.on_commit(bump_feed_version)
+		schedule_thumbnails(images)
+	return posts
+
+
+def reject_pending_news(pending_ids):
+	"""Помечает выбранные новости обработанными без публикации. Возвращает их количество."""
+	return PendingNews.objects.filter(id__in=pending_ids, is_processed=False).update(is_processed=True)
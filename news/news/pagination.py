@@ -0,0 +1,43 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+	"""Курсор пагинации повреждён или подделан"""
+
+
+def encode_cursor(post):
+	"""Кодирует позицию (pub_date, id) последней показанной новости в непрозрачную строку"""
+	raw = f'{post.pub_date.isoformat()}|{post.id}'
+	return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+	padded = cursor + '=' * (-len(cursor) % 4)
+	try:
+		raw = base64.urlsafe_b64decode(padded.encode()).decode()
+		pub_date, post_id = raw.rsplit('|', 1)
+		return datetime.fromisoformat(pub_date), int(post_id)
+	except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+		raise InvalidCursor(cursor) from e
+
+
+def keyset_page(queryset, cursor=None, page_size=20):
+	"""
+	Возвращает (список объектов, курсор следующей страницы или None).
+
+	Пагинация по ключу (pub_date, id) вместо OFFSET: стоимость страницы не зависит
+	от её номера, а новые публикации не сдвигают уже показанные карточки.
+	"""
+	queryset = queryset.order_by('-pub_date', '-id')
+	if cursor:
+		pub_date, post_id = decode_cursor(cursor)
+		queryset = queryset.filter(Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=post_id))
+	items = list(queryset[:page_size + 1])
+	if len(items) > page_size:
+		items = items[:page_size]
+		return items, encode_cursor(items[-1])
+	return items, None
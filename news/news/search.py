@@ -0,0 +1,209 @@
+"""
+Полнотекстовый поиск по одобренным новостям.
+
+SQLite: виртуальная таблица FTS5 news_post_fts (rowid = id новости), в которую
+пишется текст, уже приведённый к основам слов (стемминг на стороне Python),
+ранжирование — bm25().
+Postgres: таблица news_post_search с колонкой tsvector (конфигурация 'russian')
+и GIN-индексом, ранжирование — ts_rank(), сниппеты — ts_headline().
+
+Индекс обновляется инкрементально сигналами News_post (см. signals.py).
+Если полнотекстовый индекс недоступен, поиск откатывается на icontains.
+"""
+import html
+import re
+
+from django.db import connection, transaction, DatabaseError
+from django.db.models import Q
+from django.utils.safestring import mark_safe
+
+try:
+	import snowballstemmer
+	_stemmer = snowballstemmer.stemmer('russian')
+except ImportError:  # упрощённый стеммер ниже
+	_stemmer = None
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Окончания для упрощённого стеммера, от длинных к коротким
+_ENDINGS = sorted({
+	'иями', 'ями', 'ами', 'иях', 'ях', 'ах', 'ией', 'ием', 'ого', 'его', 'ому', 'ему',
+	'ыми', 'ими', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый', 'ий', 'ой', 'ом', 'ем', 'ам', 'ям',
+	'ию', 'ью', 'ия', 'ья', 'ов', 'ев', 'ей', 'ешь', 'ет', 'ут', 'ют', 'ит', 'ат', 'ят', 'ть',
+	'лась', 'лись', 'ись', 'ась', 'ся', 'сь', 'ла', 'ло', 'ли',
+	'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+}, key=len, reverse=True)
+
+SNIPPET_WORDS = 30
+FTS_TABLE = 'news_post_fts'
+PG_TABLE = 'news_post_search'
+
+
+def stem(word):
+	word = word.lower().replace('ё', 'е')
+	if _stemmer is not None:
+		return _stemmer.stemWord(word)
+	for ending in _ENDINGS:
+		if word.endswith(ending) and len(word) - len(ending) >= 3:
+			return word[:-len(ending)]
+	return word
+
+
+def stem_text(text):
+	return ' '.join(stem(w) for w in WORD_RE.findall(text or ''))
+
+
+def _vendor():
+	return connection.vendor
+
+
+# --- Обновление индекса -------------------------------------------------------
+
+def index_post(post_id, title, short_description, text):
+	"""Добавляет или обновляет новость в полнотекстовом индексе"""
+	try:
+		with transaction.atomic(), connection.cursor() as cursor:
+			if _vendor() == 'postgresql':
+				cursor.execute(
+					f'INSERT INTO {PG_TABLE} (post_id, document) VALUES (%s, '
+					"setweight(to_tsvector('russian', %s), 'A') || "
+					"setweight(to_tsvector('russian', %s), 'B') || "
+					"setweight(to_tsvector('russian', %s), 'C')) "
+					'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document',
+					[post_id, title, short_description, text],
+				)
+			elif _vendor() == 'sqlite':
+				cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+				cursor.execute(
+					f'INSERT INTO {FTS_TABLE} (rowid, title, short_description, text) VALUES (%s, %s, %s, %s)',
+					[post_id, stem_text(title), stem_text(short_description), stem_text(text)],
+				)
+	except DatabaseError:
+		# Индекс не создан (например, SQLite без FTS5) — поиск работает через icontains
+		pass
+
+
+def remove_post(post_id):
+	try:
+		with transaction.atomic(), connection.cursor() as cursor:
+			if _vendor() == 'postgresql':
+				cursor.execute(f'DELETE FROM {PG_TABLE} WHERE post_id = %s', [post_id])
+			elif _vendor() == 'sqlite':
+				cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+	except DatabaseError:
+		pass
+
+
+def rebuild_index(posts):
+	"""Полная переиндексация; posts — итерируемое из (id, title, short_description, text)"""
+	with connection.cursor() as cursor:
+		if _vendor() == 'postgresql':
+			cursor.execute(f'DELETE FROM {PG_TABLE}')
+		elif _vendor() == 'sqlite':
+			cursor.execute(f'DELETE FROM {FTS_TABLE}')
+	count = 0
+	for post_id, title, short_description, text in posts:
+		index_post(post_id, title, short_description, text)
+		count += 1
+	return count
+
+
+# --- Поиск ---------------------------------------------------------------------
+
+def _fts_match_expression(query):
+	"""Строит безопасное выражение MATCH: каждое слово — основа с префиксным поиском"""
+	stems = [stem(w) for w in WORD_RE.findall(query)]
+	return ' AND '.join(f'"{s}"*' for s in stems if s)
+
+
+def _ranked_ids(query, limit):
+	with transaction.atomic(), connection.cursor() as cursor:
+		if _vendor() == 'postgresql':
+			cursor.execute(
+				f'SELECT post_id FROM {PG_TABLE}, websearch_to_tsquery(%s, %s) q '
+				'WHERE document @@ q ORDER BY ts_rank(document, q) DESC LIMIT %s',
+				['russian', query, limit],
+			)
+		elif _vendor() == 'sqlite':
+			expression = _fts_match_expression(query)
+			if not expression:
+				return []
+			# Веса колонок bm25: заголовок важнее описания, описание важнее текста
+			cursor.execute(
+				f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+				f'ORDER BY bm25({FTS_TABLE}, 10.0, 4.0, 1.0) LIMIT %s',
+				[expression, limit],
+			)
+		else:
+			raise DatabaseError('full-text search is not supported for this database')
+		return [row[0] for row in cursor.fetchall()]
+
+
+def _pg_headlines(query, ids):
+	# Маркеры вместо <mark>, чтобы сначала экранировать текст новости, а потом подсветить
+	with connection.cursor() as cursor:
+		cursor.execute(
+			'SELECT id, ts_headline(%s, short_description || \' \' || text, websearch_to_tsquery(%s, %s), '
+			"'StartSel=⟦, StopSel=⟧, MaxWords=35, MinWords=15') "
+			'FROM news_news_post WHERE id = ANY(%s)',
+			['russian', 'russian', query, list(ids)],
+		)
+		return {
+			post_id: html.escape(headline).replace('⟦', '<mark>').replace('⟧', '</mark>')
+			for post_id, headline in cursor.fetchall()
+		}
+
+
+def make_snippet(text, query):
+	"""Фрагмент текста вокруг первого совпадения с подсвеченными (<mark>) словами"""
+	query_stems = {stem(w) for w in WORD_RE.findall(query)}
+	words = (text or '').split()
+	if not words:
+		return ''
+
+	def matches(word):
+		word_stems = [stem(w) for w in WORD_RE.findall(word)]
+		return any(ws.startswith(qs) for ws in word_stems for qs in query_stems)
+
+	first = next((i for i, w in enumerate(words) if matches(w)), 0)
+	start = max(0, first - SNIPPET_WORDS // 3)
+	window = words[start:start + SNIPPET_WORDS]
+	parts = [f'<mark>{html.escape(w)}</mark>' if matches(w) else html.escape(w) for w in window]
+	snippet = ' '.join(parts)
+	if start > 0:
+		snippet = '… ' + snippet
+	if start + SNIPPET_WORDS < len(words):
+		snippet += ' …'
+	return snippet
+
+
+def search_posts(queryset, query, limit=50):
+	"""
+	Возвращает список новостей из queryset, ранжированный по релевантности;
+	у каждой новости выставлен атрибут search_snippet (безопасный HTML).
+	"""
+	query = (query or '').strip()
+	if not query:
+		return []
+	try:
+		ids = _ranked_ids(query, limit)
+	except DatabaseError:
+		ids = None
+
+	if ids is None:
+		words = WORD_RE.findall(query)
+		fallback = queryset
+		for word in words:
+			fallback = fallback.filter(Q(title__icontains=word) | Q(short_description__icontains=word) | Q(text__icontains=word))
+		posts = list(fallback.order_by('-pub_date')[:limit]) if words else []
+	else:
+		by_id = queryset.in_bulk(ids)
+		posts = [by_id[i] for i in ids if i in by_id]
+
+	headlines = {}
+	if posts and ids is not None and _vendor() == 'postgresql':
+		headlines = _pg_headlines(query, [p.id for p in posts])
+	for post in posts:
+		snippet = headlines.get(post.id) or make_snippet(f'{post.short_description} {post.text}', query)
+		post.search_snippet = mark_safe(snippet)
+	return posts
@@ -1,18 +1,36 @@
+import logging
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import urljoin
 from django.contrib.auth.models import User
-from .models import PendingNews
+from .models import PendingNews, News_post
+
+logger = logging.getLogger(__name__)
 
 
 class NewsScrapingService:
     """Сервис для загрузки новостей по теме нейросети"""
+
+    # Сколько source_url проверять на дубликаты одним запросом
+    DEDUP_CHUNK = 500
     
-    def __init__(self):
+    def __init__(self, max_workers=8, timeout=10):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        self.max_workers = max_workers
+        self.timeout = timeout
+        # Одна сессия на весь пакет: соединения к одному хосту переиспользуются
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
     
     def search_neural_network_news(self, count=5):
         """Поиск новостей по теме нейросети (демо-генерация на нужное количество)"""
@@ -51,40 +69,101 @@ class NewsScrapingService:
         ]
 
         generated = []
+        # Метка партии: демо-URL разных загрузок не считаются дубликатами друг друга
+        batch = int(time.time())
         for i in range(count):
             sample = base_samples[i % len(base_samples)].copy()
             # Делаем заголовки уникальными, чтобы в админке было видно N разных элементов
             sample['title'] = f"{sample['title']} #{i + 1}"
             # Небольшая вариация source_url для уникальности
-            sample['source_url'] = f"{sample['source_url']}?n={i+1}"
+            sample['source_url'] = f"{sample['source_url']}?n={i+1}&batch={batch}"
             generated.append(sample)
 
         return generated
     
-    def save_pending_news(self, news_data, user):
-        """Сохранение новости для модерации"""
+    def fetch_article(self, url):
+        """Загрузка и разбор одной страницы-источника (Open Graph + абзацы текста)"""
         try:
-            pending_news = PendingNews.objects.create(
-                title=news_data['title'],
-                short_description=news_data['description'],
-                text=news_data['content'],
-                source_url=news_data['source_url'],
-                image_url=news_data.get('image_url', ''),
-                created_by=user
-            )
-            return pending_news
-        except Exception as e:
-            print(f"Ошибка при сохранении новости: {e}")
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning('Ошибка при загрузке %s: %s', url, e)
             return None
-    
-    def load_news_batch(self, user, count=5):
-        """Загрузка партии новостей для модерации"""
-        news_list = self.search_neural_network_news(count)
-        saved_news = []
-        
+
+        soup = BeautifulSoup(response.text, 'html.parser')
+
+        def meta(*names):
+            for name in names:
+                tag = soup.find('meta', attrs={'property': name}) or soup.find('meta', attrs={'name': name})
+                if tag and tag.get('content'):
+                    return tag['content'].strip()
+            return ''
+
+        title = meta('og:title') or (soup.title.string.strip() if soup.title and soup.title.string else '')
+        paragraphs = [p.get_text(' ', strip=True) for p in soup.find_all('p')]
+        content = '\n\n'.join(p for p in paragraphs if len(p) > 40)
+        description = meta('og:description', 'description') or content[:300]
+        if not title or not content:
+            return None
+        return {
+            'title': title[:200],
+            'description': description[:300],
+            'content': content,
+            'source_url': url,
+            'image_url': self._image_url(url, meta('og:image')),
+        }
+
+    @staticmethod
+    def _image_url(page_url, value):
+        """Абсолютный URL из og:image; слишком длинный для PendingNews.image_url отбрасывается"""
+        if not value:
+            return None
+        image_url = urljoin(page_url, value)
+        if len(image_url) > PendingNews._meta.get_field('image_url').max_length:
+            return None
+        return image_url
+
+    def fetch_articles(self, urls):
+        """Параллельная загрузка страниц ограниченным пулом потоков"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return [article for article in executor.map(self.fetch_article, urls) if article]
+
+    def filter_new(self, news_list):
+        """Отбрасывает новости, чей source_url уже есть в пакете, в PendingNews или в News_post"""
+        unique = {}
         for news_data in news_list:
-            saved_news_item = self.save_pending_news(news_data, user)
-            if saved_news_item:
-                saved_news.append(saved_news_item)
-        
-        return saved_news
+            unique.setdefault(news_data['source_url'], news_data)
+
+        urls = list(unique)
+        known = set()
+        for i in range(0, len(urls), self.DEDUP_CHUNK):
+            chunk = urls[i:i + self.DEDUP_CHUNK]
+            known.update(PendingNews.objects.filter(source_url__in=chunk).values_list('source_url', flat=True))
+            known.update(News_post.objects.filter(source_url__in=chunk).values_list('source_url', flat=True))
+        return [news_data for url, news_data in unique.items() if url not in known]
+
+    @staticmethod
+    def _pending_fields(news_data):
+        return {
+            'title': news_data['title'],
+            'short_description': news_data['description'],
+            'text': news_data['content'],
+            'source_url': news_data['source_url'],
+            'image_url': news_data.get('image_url', ''),
+        }
+    
+    def load_news_batch(self, user, count=5, urls=()):
+        """
+        Загрузка партии новостей для модерации.
+        Страницы из urls скачиваются параллельно, дубликаты по source_url отбрасываются,
+        новые записи вставляются одним bulk_create.
+        """
+        news_list = self.search_neural_network_news(count) if count else []
+        if urls:
+            news_list += self.fetch_articles(urls)
+        news_list = self.filter_new(news_list)
+
+        return PendingNews.objects.bulk_create(
+            [PendingNews(**self._pending_fields(news_data), created_by=user) for news_data in news_list],
+            batch_size=self.DEDUP_CHUNK,
+        )
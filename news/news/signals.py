@@ -0,0 +1,93 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import search, trending
+from .auth import forget_user
+from .caching import bump_feed_version, bump_post_version, forget_user_post_ids
+from .metrics import install_sql_recorder
+from .models import News_post, Like, Favorite, NewsImage
+
+
+@receiver(post_save, sender=Like)
+def increment_like_count(sender, instance, created, **kwargs):
+	if created:
+		News_post.objects.filter(pk=instance.news_post_id).update(like_count=F('like_count') + 1)
+
+
+@receiver(post_delete, sender=Like)
+def decrement_like_count(sender, instance, **kwargs):
+	News_post.objects.filter(pk=instance.news_post_id, like_count__gt=0).update(like_count=F('like_count') - 1)
+
+
+@receiver(post_save, sender=Like)
+def record_like_for_trending(sender, instance, created, **kwargs):
+	if created:
+		trending.record(instance.news_post_id, instance.created_at, 1)
+
+
+@receiver(post_delete, sender=Like)
+def record_unlike_for_trending(sender, instance, origin=None, **kwargs):
+	# Вместе с новостью каскадом удаляются и её события; новое событие нарушило бы внешний ключ
+	if isinstance(origin, News_post) or getattr(origin, 'model', None) is News_post:
+		return
+	# Лайки удаляются каскадом и вместе с пользователем, а с ним — и его новости в том же
+	# удалении, поэтому событие пишется после коммита и только для оставшейся новости
+	post_id, liked_at = instance.news_post_id, instance.created_at
+	transaction.on_commit(lambda: trending.record_unlike(post_id, liked_at))
+
+
+SEARCH_FIELDS = {'title', 'short_description', 'text', 'is_approved'}
+
+
+@receiver(post_save, sender=News_post)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+	# save(update_fields=['image']) и подобные не меняют индексируемый текст
+	if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+		return
+	if instance.is_approved:
+		search.index_post(instance.id, instance.title, instance.short_description, instance.text)
+	else:
+		search.remove_post(instance.id)
+
+
+@receiver(post_delete, sender=News_post)
+def remove_from_search_index(sender, instance, **kwargs):
+	search.remove_post(instance.id)
+
+
+@receiver([post_save, post_delete], sender=News_post)
+def invalidate_post_cache(sender, instance, **kwargs):
+	bump_post_version(instance.id)
+	bump_feed_version()
+
+
+@receiver([post_save, post_delete], sender=NewsImage)
+def invalidate_post_images_cache(sender, instance, **kwargs):
+	bump_post_version(instance.news_post_id)
+	bump_feed_version()
+
+
+@receiver([post_save, post_delete], sender=Like)
+def invalidate_post_likes_cache(sender, instance, **kwargs):
+	# Ленту не сбрасываем: при всплеске лайков её кэш жил бы секунды, счётчики догонит CACHE_FEED_TIMEOUT
+	bump_post_version(instance.news_post_id)
+
+
+@receiver([post_save, post_delete], sender=Like)
+@receiver([post_save, post_delete], sender=Favorite)
+def invalidate_user_post_ids(sender, instance, **kwargs):
+	forget_user_post_ids(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+	# Смена пароля должна разлогинить старые сессии, блокировка — закрыть доступ сразу
+	forget_user(instance.pk)
+
+
+# Учёт SQL в метриках запросов для соединений любых потоков (news.metrics)
+connection_created.connect(install_sql_recorder, dispatch_uid='news_metrics_sql')
@@ -0,0 +1,240 @@
+"""
+Экспорт одобренных новостей для партнёров: RSS 2.0, Atom и JSON Feed 1.1.
+
+Лента отдаётся потоком: новости читаются из БД через .iterator(chunk_size=...) и
+сериализуются пачками по BATCH_SIZE, поэтому память не зависит от размера архива.
+Заголовки и обрамление XML пишут генераторы django.utils.feedgenerator, записи —
+они же, но пачками (см. _StreamingFeed).
+
+Отданная целиком лента параллельно пишется на диск (FEED_EXPORT_CACHE_DIR) и до
+следующего изменения ленты (штамп feed_version) отдаётся из файла. Условный GET
+работает по ETag из того же штампа (правка или снятие с публикации старой новости
+меняет ленту, но не дату самой свежей) и по Last-Modified — дате самой свежей новости.
+"""
+import hashlib
+import io
+import json
+import os
+import uuid
+from itertools import islice
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Max
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils import feedgenerator
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from .caching import feed_version
+from .models import News_post
+
+FEED_TITLE = 'Новостной сайт'
+FEED_DESCRIPTION = 'Самые свежие новости и события'
+# Строк за один запрос к БД и новостей в одном отдаваемом куске ответа
+CHUNK_SIZE = 2000
+BATCH_SIZE = 200
+FILE_BLOCK_SIZE = 64 * 1024
+
+
+def _post_links(request):
+	"""Функция id -> абсолютный URL новости; reverse() и build_absolute_uri() выполняются один раз"""
+	placeholder = '987654321'
+	prefix, suffix = request.build_absolute_uri(reverse('news_detail', args=[placeholder])).split(placeholder)
+	return lambda post_id: f'{prefix}{post_id}{suffix}'
+
+
+class _StreamingFeed:
+	"""Генератор ленты Django, который пишет записи пачками вместо одного списка items"""
+	ITEMS_MARKER = '\x00items\x00'
+
+	def __init__(self, *args, updated=None, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.updated = updated
+
+	def latest_post_date(self):
+		return self.updated or super().latest_post_date()
+
+	def write_items(self, handler):
+		if self.items:
+			super().write_items(handler)
+		else:
+			# Место для записей в обрамлении, см. stream()
+			handler.ignorableWhitespace(self.ITEMS_MARKER)
+
+	def stream(self, posts, item):
+		envelope = io.StringIO()
+		self.write(envelope, 'utf-8')
+		head, tail = envelope.getvalue().split(self.ITEMS_MARKER)
+		yield head
+		while batch := list(islice(posts, BATCH_SIZE)):
+			self.items = []
+			for post in batch:
+				self.add_item(**item(post))
+			buffer = io.StringIO()
+			self.write_items(SimplerXMLGenerator(buffer, 'utf-8', short_empty_elements=True))
+			yield buffer.getvalue()
+		self.items = []
+		yield tail
+
+
+class RssFeed(_StreamingFeed, feedgenerator.Rss201rev2Feed):
+	pass
+
+
+class AtomFeed(_StreamingFeed, feedgenerator.Atom1Feed):
+	pass
+
+
+def _xml_feed(feed_class):
+	def render(request, posts, updated):
+		feed = feed_class(
+			title=FEED_TITLE,
+			link=request.build_absolute_uri(reverse('news_home')),
+			description=FEED_DESCRIPTION,
+			feed_url=request.build_absolute_uri(),
+			language=settings.LANGUAGE_CODE,
+			updated=updated,
+		)
+
+		post_link = _post_links(request)
+
+		def item(post):
+			link = post_link(post.id)
+			return {
+				'title': post.title,
+				'link': link,
+				'unique_id': link,
+				'description': post.short_description,
+				'author_name': post.author.username,
+				'pubdate': post.pub_date,
+			}
+		return feed.stream(posts, item)
+	return render
+
+
+def _json_feed(request, posts, updated):
+	meta = json.dumps({
+		'version': 'https://jsonfeed.org/version/1.1',
+		'title': FEED_TITLE,
+		'description': FEED_DESCRIPTION,
+		'home_page_url': request.build_absolute_uri(reverse('news_home')),
+		'feed_url': request.build_absolute_uri(),
+		'language': settings.LANGUAGE_CODE,
+	}, ensure_ascii=False)
+	yield meta[:-1] + ', "items": ['
+	post_link = _post_links(request)
+	separator = ''
+	while batch := list(islice(posts, BATCH_SIZE)):
+		items = []
+		for post in batch:
+			link = post_link(post.id)
+			items.append(json.dumps({
+				'id': link,
+				'url': link,
+				'title': post.title,
+				'summary': post.short_description,
+				'content_text': post.text,
+				'date_published': post.pub_date.isoformat(),
+				'authors': [{'name': post.author.username}],
+			}, ensure_ascii=False))
+		yield separator + ', '.join(items)
+		separator = ', '
+	yield ']}'
+
+
+# Формат -> (функция рендера, Content-Type, поля News_post, которые нужны ленте)
+FORMATS = {
+	'rss': (_xml_feed(RssFeed), 'application/rss+xml; charset=utf-8', ()),
+	'atom': (_xml_feed(AtomFeed), 'application/atom+xml; charset=utf-8', ()),
+	'json': (_json_feed, 'application/feed+json; charset=utf-8', ('text',)),
+}
+
+
+def _approved_posts(extra_fields):
+	return (
+		News_post.objects.filter(is_approved=True)
+		.select_related('author')
+		.only('id', 'title', 'short_description', 'pub_date', 'author__username', *extra_fields)
+		.order_by('-pub_date', '-id')
+		.iterator(chunk_size=CHUNK_SIZE)
+	)
+
+
+def _cache_path(request, fmt):
+	# Ссылки в ленте абсолютные, поэтому у каждого хоста свой файл
+	origin = hashlib.md5(f'{request.scheme}://{request.get_host()}'.encode()).hexdigest()[:12]
+	return Path(settings.FEED_EXPORT_CACHE_DIR) / f'{fmt}-{origin}-{feed_version()}'
+
+
+def _write_through(chunks, path):
+	"""Отдаёт куски дальше и пишет их в файл; файл появляется, только если лента отдана целиком"""
+	tmp = path.with_name(f'{path.name}.{uuid.uuid4().hex}.tmp')
+	path.parent.mkdir(parents=True, exist_ok=True)
+	done = False
+	try:
+		with open(tmp, 'w', encoding='utf-8') as f:
+			for chunk in chunks:
+				f.write(chunk)
+				yield chunk
+		os.replace(tmp, path)
+		done = True
+	finally:
+		if not done:
+			tmp.unlink(missing_ok=True)
+	# Ленты прошлых версий для этого формата и хоста больше не понадобятся
+	prefix = path.name.rsplit('-', 1)[0] + '-'
+	for old in path.parent.glob(f'{prefix}*'):
+		if old != path and not old.name.endswith('.tmp'):
+			old.unlink(missing_ok=True)
+
+
+def _read_file(path):
+	with open(path, 'rb') as f:
+		while block := f.read(FILE_BLOCK_SIZE):
+			yield block
+
+
+async def _async_chunks(chunks):
+	# Синхронный итератор Django под ASGI сначала целиком читает в память, поэтому
+	# куски забираются по одному в потоке ORM (thread_sensitive)
+	iterator = iter(chunks)
+	pull = sync_to_async(lambda: next(iterator, None))
+	while (chunk := await pull()) is not None:
+		yield chunk
+
+
+def feed_response(request, fmt):
+	render, content_type, extra_fields = FORMATS[fmt]
+	latest = News_post.objects.filter(is_approved=True).aggregate(latest=Max('pub_date'))['latest']
+	last_modified = int(latest.timestamp()) if latest else None
+	path = _cache_path(request, fmt)
+	etag = f'"{path.name}"'
+	# If-None-Match проверяется раньше If-Modified-Since
+	not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+	if not_modified is not None:
+		not_modified['ETag'] = etag
+		if last_modified is not None:
+			not_modified['Last-Modified'] = http_date(last_modified)
+		return not_modified
+
+	if path.exists():
+		chunks, size, source = _read_file(path), path.stat().st_size, 'hit'
+	else:
+		chunks = _write_through(render(request, _approved_posts(extra_fields), latest), path)
+		size, source = None, 'miss'
+	if isinstance(request, ASGIRequest):
+		chunks = _async_chunks(chunks)
+
+	response = StreamingHttpResponse(chunks, content_type=content_type)
+	if size is not None:
+		response['Content-Length'] = size
+	response['ETag'] = etag
+	if last_modified is not None:
+		response['Last-Modified'] = http_date(last_modified)
+	response['X-Feed-Cache'] = source
+	return response
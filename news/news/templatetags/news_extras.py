@@ -1,16 +1,52 @@
+from urllib.parse import urlencode
+
 from django import template
-from news.models import Favorite
+from django.conf import settings
+from django.urls import reverse
+
+from news.assets import bundle_tags
+from news.thumbnails import variant_url
 
 register = template.Library()
 
 @register.filter
 def is_liked_by(news_post, user):
-    """Проверяет, лайкнул ли пользователь новость"""
+    """Проверяет, лайкнул ли пользователь новость (по множеству id из user_post_ids)"""
     return news_post.is_liked_by(user)
 
 @register.filter
 def is_favorited_by(news_post, user):
-    """Проверяет, находится ли новость в избранном у пользователя"""
-    if not getattr(user, 'is_authenticated', False):
-        return False
-    return Favorite.objects.filter(user=user, news_post=news_post).exists()
+    """Проверяет, находится ли новость в избранном у пользователя (по множеству id из user_post_ids)"""
+    return news_post.is_favorited_by(user)
+
+@register.filter
+def proxied(url):
+    """Пропускает внешний URL изображения через кэширующий image_proxy"""
+    if not url or not url.startswith(('http://', 'https://')):
+        return url
+    return f"{reverse('image_proxy')}?{urlencode({'url': url})}"
+
+@register.inclusion_tag('includes/news_picture.html')
+def news_picture(news_image, alt='', css_class='d-block w-100', style='', lazy=False, sizes='(max-width: 992px) 100vw, 900px'):
+    """<picture> с WebP/JPEG превью и srcset; пока превью не готовы — оригинал через прокси"""
+    context = {
+        'image': news_image,
+        'alt': alt,
+        'css_class': css_class,
+        'style': style,
+        'lazy': lazy,
+        'sizes': sizes,
+    }
+    if news_image.thumbnails_ready:
+        widths = settings.THUMBNAIL_WIDTHS
+        context.update({
+            'webp_srcset': ', '.join(f'{variant_url(news_image.id, w, "webp")} {w}w' for w in widths),
+            'jpg_srcset': ', '.join(f'{variant_url(news_image.id, w, "jpg")} {w}w' for w in widths),
+            'fallback': variant_url(news_image.id, widths[len(widths) // 2], 'jpg'),
+        })
+    return context
+
+@register.simple_tag
+def asset_bundle(name):
+    """<link>/<script> собранного бандла из news.assets.BUNDLES или, пока он не собран, его исходников"""
+    return bundle_tags(name)
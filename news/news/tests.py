@@ -1,3 +1,1405 @@
-from django.test import TestCase
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import warnings
+import xml.etree.ElementTree as ET
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipIf
 
-# Create your tests here.
+import requests
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from . import assets, checks, image_cache, syndication, thumbnails, transfer, trending
+from .benchmark import SCENARIOS, load_report
+from .caching import user_post_ids
+from .jobs import INTERRUPTED_ERROR, fail_interrupted_jobs, run_load_news_job
+from .middleware import AsyncWhiteNoiseMiddleware
+from .metrics import registry as metrics_registry
+from .models import News_post, NewsImage, Like, Favorite, PendingNews, NewsLoadJob, NewsRanking, NewsRankingState
+from .pagination import encode_cursor
+from .services import NewsScrapingService
+
+# Манифест WhiteNoise появляется только после collectstatic, в тестах он не нужен
+TEST_STORAGES = {
+	'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+	'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Строка плана SQLite о просмотре таблицы: «SCAN t ...» (3.36+) или «SCAN TABLE t ...»
+SQLITE_SCAN_RE = re.compile(r'SCAN (?:TABLE )?(?P<table>\S+)(?P<rest>.*)$')
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class NewsTestCase(TestCase):
+	def setUp(self):
+		# Кэш страниц и фрагментов не откатывается вместе с транзакцией теста
+		cache.clear()
+
+
+class NewsFeedQueryCountTests(NewsTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.user = User.objects.create_user(username='reader', password='pass12345')
+		cls.author = User.objects.create_user(username='author', password='pass12345')
+
+	def create_posts(self, count):
+		for i in range(count):
+			post = News_post.objects.create(
+				title=f'Новость {i}',
+				short_description='Кратко',
+				text='Текст',
+				pub_date=timezone.now(),
+				author=self.author,
+				is_approved=True,
+			)
+			NewsImage.objects.create(news_post=post, image_url=f'https://example.com/{i}.jpg')
+			Like.objects.create(user=self.user, news_post=post)
+			Favorite.objects.create(user=self.user, news_post=post)
+
+	def count_queries(self, url):
+		with CaptureQueriesContext(connection) as ctx:
+			response = self.client.get(url)
+		self.assertEqual(response.status_code, 200)
+		return len(ctx.captured_queries)
+
+	def test_feed_query_count_does_not_depend_on_post_count(self):
+		self.client.force_login(self.user)
+		self.create_posts(2)
+		few = self.count_queries(reverse('news_home'))
+		self.create_posts(20)
+		many = self.count_queries(reverse('news_home'))
+		self.assertEqual(few, many)
+
+	def test_anonymous_feed_query_count_does_not_depend_on_post_count(self):
+		self.create_posts(2)
+		few = self.count_queries(reverse('news_home'))
+		self.create_posts(20)
+		many = self.count_queries(reverse('news_home'))
+		self.assertEqual(few, many)
+
+	def test_favorites_query_count_does_not_depend_on_post_count(self):
+		self.client.force_login(self.user)
+		self.create_posts(2)
+		few = self.count_queries(reverse('favorites_list'))
+		self.create_posts(20)
+		many = self.count_queries(reverse('favorites_list'))
+		self.assertEqual(few, many)
+
+	def test_user_state_reflects_likes_and_favorites(self):
+		self.create_posts(1)
+		post = News_post.objects.get()
+		self.assertEqual(post.total_likes(), 1)
+		self.assertTrue(post.is_liked_by(self.user))
+		self.assertTrue(post.is_favorited_by(self.user))
+		other = User.objects.create_user(username='other', password='pass12345')
+		post = News_post.objects.get()
+		self.assertFalse(post.is_liked_by(other))
+		self.assertFalse(post.is_favorited_by(other))
+
+
+class NewsFeedPaginationTests(NewsTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.author = User.objects.create_user(username='author', password='pass12345')
+		pub_date = timezone.now()
+		# Одинаковая дата у всех новостей: порядок должен держаться на id
+		News_post.objects.bulk_create([
+			News_post(
+				title=f'Новость {i}', short_description='Кратко', text='Текст',
+				pub_date=pub_date, author=cls.author, is_approved=True,
+			)
+			for i in range(25)
+		])
+
+	def test_pages_cover_feed_without_duplicates(self):
+		response = self.client.get(reverse('news_home'))
+		first_page = [post.id for post in response.context['news']]
+		self.assertEqual(len(first_page), 20)
+		self.assertIsNotNone(response.context['next_cursor'])
+
+		data = self.client.get(reverse('news_feed_json'), {'after': response.context['next_cursor']}).json()
+		self.assertIsNone(data['next'])
+		self.assertEqual(data['html'].count('class="card news-card"'), 5)
+
+		all_ids = set(News_post.objects.values_list('id', flat=True))
+		rest = all_ids - set(first_page)
+		self.assertEqual(len(rest), 5)
+		shown = {post_id for post_id in rest if reverse('news_detail', args=[post_id]) in data['html']}
+		self.assertEqual(shown, rest)
+
+	def test_invalid_cursor(self):
+		response = self.client.get(reverse('news_feed_json'), {'after': 'garbage!'})
+		self.assertEqual(response.status_code, 400)
+
+
+class LikeCounterTests(NewsTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.user = User.objects.create_user(username='reader', password='pass12345')
+		cls.post = News_post.objects.create(
+			title='Новость', short_description='Кратко', text='Текст',
+			pub_date=timezone.now(), author=cls.user, is_approved=True,
+		)
+
+	def test_toggle_like_keeps_counter_in_sync(self):
+		self.client.force_login(self.user)
+		url = reverse('toggle_like', args=[self.post.id])
+
+		data = self.client.post(url).json()
+		self.assertEqual(data, {'liked': True, 'total_likes': 1})
+		data = self.client.post(url).json()
+		self.assertEqual(data, {'liked': False, 'total_likes': 0})
+		self.post.refresh_from_db()
+		self.assertEqual(self.post.like_count, 0)
+
+	def test_rebuild_like_counts(self):
+		Like.objects.create(user=self.user, news_post=self.post)
+		News_post.objects.filter(pk=self.post.pk).update(like_count=42)
+		call_command('rebuild_like_counts', stdout=StringIO())
+		self.post.refresh_from_db()
+		self.assertEqual(self.post.like_count, 1)
+
+
+class FakeUpstreamResponse:
+	def __init__(self, body=b'', status_code=200, headers=None):
+		self.body = body
+		self.status_code = status_code
+		self.headers = {'Content-Type': 'image/png', **(headers or {})}
+
+	def iter_content(self, chunk_size):
+		for i in range(0, len(self.body), chunk_size):
+			yield self.body[i:i + chunk_size]
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		return False
+
+
+class ImageProxyCacheTests(NewsTestCase):
+	url = 'https://images.example.com/cat.png'
+
+	def setUp(self):
+		super().setUp()
+		self.cache_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(self.cache_dir.cleanup)
+		self.settings_override = override_settings(
+			IMAGE_PROXY_CACHE_DIR=self.cache_dir.name,
+			IMAGE_PROXY_MAX_BYTES=1024,
+			IMAGE_PROXY_CACHE_MAX_BYTES=10 * 1024,
+		)
+		self.settings_override.enable()
+		self.addCleanup(self.settings_override.disable)
+		# Семантика кэша общая для обеих веток; здесь источник подменяется на уровне requests
+		httpx_off = mock.patch('news.image_cache.httpx', None)
+		httpx_off.start()
+		self.addCleanup(httpx_off.stop)
+
+	def get(self, **headers):
+		return self.client.get(reverse('image_proxy'), {'url': self.url}, **headers)
+
+	def test_second_request_is_served_from_disk(self):
+		with mock.patch('news.image_cache._session.get', return_value=FakeUpstreamResponse(b'png' * 100)) as upstream:
+			first = self.get()
+			second = self.get()
+		self.assertEqual(upstream.call_count, 1)
+		self.assertEqual(b''.join(first.streaming_content), b'png' * 100)
+		self.assertEqual(b''.join(second.streaming_content), b'png' * 100)
+		self.assertIn('max-age=', second['Cache-Control'])
+
+	def test_if_none_match_returns_304(self):
+		with mock.patch('news.image_cache._session.get', return_value=FakeUpstreamResponse(b'png' * 100)):
+			etag = self.get()['ETag']
+			response = self.get(HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 304)
+		self.assertEqual(response['ETag'], etag)
+
+	def test_oversized_image_is_rejected(self):
+		with mock.patch('news.image_cache._session.get', return_value=FakeUpstreamResponse(b'x' * 2048)):
+			response = self.get()
+		self.assertEqual(response['Content-Type'], 'image/svg+xml')
+		self.assertEqual([files for _, _, files in os.walk(self.cache_dir.name) if files], [])
+
+	def test_lru_eviction_keeps_cache_within_budget(self):
+		with mock.patch('news.image_cache._session.get', side_effect=lambda *a, **kw: FakeUpstreamResponse(b'x' * 1000)):
+			for i in range(15):
+				self.client.get(reverse('image_proxy'), {'url': f'https://images.example.com/{i}.png'})
+		total = sum(
+			os.path.getsize(os.path.join(root, name))
+			for root, _, files in os.walk(self.cache_dir.name)
+			for name in files if '.' not in name
+		)
+		self.assertLessEqual(total, 10 * 1024)
+
+	def test_cache_is_not_walked_on_every_download(self):
+		with mock.patch('news.image_cache._session.get', side_effect=lambda *a, **kw: FakeUpstreamResponse(b'x' * 100)), \
+				mock.patch('news.image_cache.evict', wraps=image_cache.evict) as evict:
+			for i in range(10):
+				self.client.get(reverse('image_proxy'), {'url': f'https://images.example.com/{i}.png'})
+		# Один обход для начальной оценки размера, дальше размер ведётся в памяти
+		self.assertEqual(evict.call_count, 1)
+
+	def test_file_evicted_before_open_is_fetched_again(self):
+		evicted = []
+
+		def get_then_evict(url):
+			# Другой поток вытесняет файл сразу после поиска в кэше
+			image = image_cache.get_image(url)
+			if not evicted:
+				evicted.append(image.path)
+				os.remove(image.path)
+			return image
+
+		with mock.patch('news.image_cache._session.get', return_value=FakeUpstreamResponse(b'png' * 100)) as upstream:
+			self.get()
+			with mock.patch('news.views.get_image', side_effect=get_then_evict):
+				response = self.get()
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(b''.join(response.streaming_content), b'png' * 100)
+		self.assertEqual(upstream.call_count, 2)
+
+
+
+@skipIf(image_cache.httpx is None, 'httpx не установлен')
+class AsyncImageProxyTests(NewsTestCase):
+	def setUp(self):
+		super().setUp()
+		self.cache_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(self.cache_dir.cleanup)
+		self.settings_override = override_settings(
+			IMAGE_PROXY_CACHE_DIR=self.cache_dir.name, IMAGE_PROXY_TIMEOUT=0.3, IMAGE_PROXY_HOST_CONCURRENCY=1,
+		)
+		self.settings_override.enable()
+		self.addCleanup(self.settings_override.disable)
+		self.requested = []
+
+	def use_upstream(self, handler):
+		transport = image_cache.httpx.MockTransport(handler)
+		patcher = mock.patch(
+			'news.image_cache._new_async_client', lambda: image_cache.httpx.AsyncClient(transport=transport),
+		)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	async def upstream(self, request):
+		self.requested.append(str(request.url))
+		if request.url.host == 'slow.example.com':
+			await asyncio.sleep(0.6)
+		return image_cache.httpx.Response(200, content=b'png' * 10, headers={'Content-Type': 'image/png'})
+
+	async def test_asgi_view_downloads_once(self):
+		self.use_upstream(self.upstream)
+		for _ in range(2):
+			response = await self.async_client.get(reverse('image_proxy'), {'url': 'https://fast.example.com/a.png'})
+			self.assertEqual(b''.join(response.streaming_content), b'png' * 10)
+		self.assertEqual(self.requested, ['https://fast.example.com/a.png'])
+
+	def test_wsgi_view_uses_pooled_session(self):
+		# Под WSGI у каждого вызова свой event loop: клиент httpx создавался бы на каждый запрос
+		with mock.patch('news.image_cache._new_async_client') as new_client, \
+				mock.patch('news.image_cache._session.get', return_value=FakeUpstreamResponse(b'png' * 10)) as upstream:
+			response = self.client.get(reverse('image_proxy'), {'url': 'https://fast.example.com/a.png'})
+			self.assertEqual(b''.join(response.streaming_content), b'png' * 10)
+		upstream.assert_called_once()
+		new_client.assert_not_called()
+
+	@override_settings(DEBUG=True)
+	async def test_asgi_chain_has_no_sync_adapters(self):
+		self.use_upstream(self.upstream)
+		metrics_registry.reset()
+		# В DEBUG Django пишет в django.request о каждом middleware, переведённом в поток
+		with self.assertNoLogs('django.request', 'DEBUG'):
+			response = await self.async_client.get(reverse('image_proxy'), {'url': 'https://fast.example.com/b.png'})
+		self.assertEqual(response.status_code, 200)
+		self.assertIn('news_outbound_http_requests_total{route="image_proxy"} 1', metrics_registry.render_prometheus())
+
+	async def test_concurrent_requests_share_one_download(self):
+		self.use_upstream(self.upstream)
+		url = 'https://slow.example.com/a.png'
+		first, second = await asyncio.gather(image_cache.aget_image(url), image_cache.aget_image(url))
+		self.assertEqual(first.etag, second.etag)
+		self.assertEqual(self.requested, [url])
+
+	async def test_slow_host_does_not_block_other_hosts(self):
+		self.use_upstream(self.upstream)
+		finished = []
+
+		async def fetch(url):
+			try:
+				await image_cache.aget_image(url)
+				finished.append(url)
+			except image_cache.ImageFetchError:
+				finished.append('busy')
+
+		await asyncio.gather(
+			fetch('https://slow.example.com/1.png'),
+			fetch('https://slow.example.com/2.png'),
+			fetch('https://fast.example.com/3.png'),
+		)
+		# Быстрый хост не ждёт медленный; второй запрос к медленному хосту не ждёт дольше таймаута
+		self.assertEqual(finished, ['https://fast.example.com/3.png', 'busy', 'https://slow.example.com/1.png'])
+
+
+@skipIf(thumbnails.Image is None, 'Pillow не установлен')
+class ThumbnailTests(NewsTestCase):
+	def setUp(self):
+		super().setUp()
+		self.tmp = tempfile.TemporaryDirectory()
+		self.addCleanup(self.tmp.cleanup)
+		self.settings_override = override_settings(MEDIA_ROOT=self.tmp.name)
+		self.settings_override.enable()
+		self.addCleanup(self.settings_override.disable)
+
+		self.source = os.path.join(self.tmp.name, 'source.png')
+		thumbnails.Image.new('RGB', (1200, 600), 'red').save(self.source)
+		author = User.objects.create_user(username='author', password='pass12345')
+		post = News_post.objects.create(
+			title='Новость', short_description='Кратко', text='Текст',
+			pub_date=timezone.now(), author=author, is_approved=True,
+		)
+		self.image = NewsImage.objects.create(news_post=post, image_url='https://images.example.com/a.png')
+
+	def test_variants_are_generated_and_used_in_srcset(self):
+		with mock.patch('news.thumbnails.get_image', return_value=mock.Mock(path=self.source)):
+			call_command('generate_thumbnails', stdout=StringIO())
+		self.image.refresh_from_db()
+		self.assertTrue(self.image.thumbnails_ready)
+		for width in settings.THUMBNAIL_WIDTHS:
+			for fmt in ('webp', 'jpg'):
+				self.assertTrue(os.path.exists(os.path.join(self.tmp.name, thumbnails.variant_path(self.image.id, width, fmt))))
+
+		html = self.client.get(reverse('news_home')).content.decode()
+		self.assertIn('type="image/webp"', html)
+		self.assertIn(f'/{self.image.id}/320.webp 320w', html)
+
+		# Превью отдаются приложением: /media/ без DEBUG не обслуживается
+		url = thumbnails.variant_url(self.image.id, 640, 'webp')
+		self.assertIn(url, html)
+		response = self.client.get(url)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response['Content-Type'], 'image/webp')
+		response.close()
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+		self.assertEqual(self.client.get(thumbnails.variant_url(self.image.id, 641, 'webp')).status_code, 404)
+
+	def test_oversized_source_does_not_abort_batch(self):
+		small = os.path.join(self.tmp.name, 'small.jpg')
+		thumbnails.Image.new('RGB', (100, 50), 'blue').save(small)
+		other = NewsImage.objects.create(news_post=self.image.news_post, image_url='https://images.example.com/b.jpg')
+		sources = {self.image.image_url: self.source, other.image_url: small}
+
+		# 1200x600 больше двойного MAX_IMAGE_PIXELS — Pillow бросает DecompressionBombError
+		with mock.patch('news.thumbnails.get_image', side_effect=lambda url: mock.Mock(path=sources[url])), \
+				mock.patch.object(thumbnails.Image, 'MAX_IMAGE_PIXELS', 10_000):
+			self.assertEqual(thumbnails.generate_many([self.image, other], workers=2), 1)
+		self.assertEqual(set(NewsImage.objects.filter(thumbnails_ready=True)), {other})
+
+		with mock.patch('news.thumbnails.get_image', return_value=mock.Mock(path=self.source)), \
+				override_settings(THUMBNAIL_MAX_PIXELS=1000):
+			self.assertFalse(thumbnails.build_variants(self.image.id, self.image.image_url))
+
+	def test_large_jpeg_is_decoded_at_reduced_scale(self):
+		large = os.path.join(self.tmp.name, 'large.jpg')
+		thumbnails.Image.new('RGB', (4000, 2000), 'green').save(large)
+		# 4000x2000 пикселей больше лимита, а после draft (1/4 → 1000x500) — нет
+		with mock.patch('news.thumbnails.get_image', return_value=mock.Mock(path=large)), \
+				override_settings(THUMBNAIL_MAX_PIXELS=1_000_000):
+			self.assertTrue(thumbnails.build_variants(self.image.id, self.image.image_url))
+		with thumbnails.Image.open(os.path.join(self.tmp.name, thumbnails.variant_path(self.image.id, 960, 'jpg'))) as resized:
+			self.assertEqual(resized.size, (960, 480))
+
+
+class NewsSearchTests(NewsTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		author = User.objects.create_user(username='author', password='pass12345')
+
+		def create(title, text, is_approved=True):
+			return News_post.objects.create(
+				title=title, short_description='Кратко', text=text,
+				pub_date=timezone.now(), author=author, is_approved=is_approved,
+			)
+
+		cls.in_title = create('Нейросети научились создавать 3D-модели', 'Новая технология от Google.')
+		cls.in_text = create('Новости медицины', 'Врачи применяют нейросеть для диагностики.')
+		cls.other = create('Погода на выходные', 'Ожидается дождь.')
+		cls.hidden = create('Нейросеть на модерации', 'Текст', is_approved=False)
+
+	def search(self, q):
+		response = self.client.get(reverse('news_search'), {'q': q})
+		self.assertEqual(response.status_code, 200)
+		return response
+
+	def test_stemmed_ranked_results(self):
+		response = self.search('нейросеть')
+		self.assertEqual([p.id for p in response.context['news']], [self.in_title.id, self.in_text.id])
+		self.assertContains(response, '<mark>нейросеть</mark>')
+
+	def test_index_follows_edits_and_deletes(self):
+		self.other.text = 'Синоптики использовали нейросети для прогноза.'
+		self.other.save()
+		self.assertIn(self.other.id, [p.id for p in self.search('нейросеть').context['news']])
+		self.in_title.delete()
+		self.assertNotIn(self.in_title.id, [p.id for p in self.search('нейросеть').context['news']])
+
+	def test_query_syntax_is_escaped(self):
+		self.assertEqual(list(self.search('"AND( NEAR* -').context['news']), [])
+
+
+class NewsCachingTests(NewsTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.user = User.objects.create_user(username='reader', password='pass12345')
+		cls.post = News_post.objects.create(
+			title='Старый заголовок', short_description='Кратко', text='Текст',
+			pub_date=timezone.now(), author=cls.user, is_approved=True,
+		)
+
+	def test_anonymous_feed_is_cached_until_post_changes(self):
+		self.assertEqual(self.client.get(reverse('news_home'))['X-Page-Cache'], 'miss')
+		self.assertEqual(self.client.get(reverse('news_home'))['X-Page-Cache'], 'hit')
+
+		self.post.title = 'Новый заголовок'
+		self.post.save()
+		response = self.client.get(reverse('news_home'))
+		self.assertEqual(response['X-Page-Cache'], 'miss')
+		self.assertContains(response, 'Новый заголовок')
+
+	def test_detail_cache_is_invalidated_by_images(self):
+		url = reverse('news_detail', args=[self.post.id])
+		self.client.get(url)
+		self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+		NewsImage.objects.create(news_post=self.post, image_url='https://images.example.com/new.png')
+		self.assertEqual(self.client.get(url)['X-Page-Cache'], 'miss')
+
+	def test_logged_in_users_reuse_card_fragments(self):
+		self.client.force_login(self.user)
+		response = self.client.get(reverse('news_home'))
+		self.assertFalse(response.has_header('X-Page-Cache'))
+		self.assertContains(response, 'Старый заголовок')
+
+		# update() не шлёт сигналов — фрагмент карточки остаётся из кэша
+		News_post.objects.filter(pk=self.post.pk).update(title='Тихо изменён')
+		self.assertContains(self.client.get(reverse('news_home')), 'Старый заголовок')
+
+		self.post.refresh_from_db()
+		self.post.save()
+		self.assertContains(self.client.get(reverse('news_home')), 'Тихо изменён')
+
+
+ARTICLE_HTML = '''<html><head>
+<meta property="og:title" content="Статья {n}">
+<meta property="og:description" content="Описание {n}">
+<meta property="og:image" content="https://images.example.com/{n}.png">
+</head><body><p>Достаточно длинный абзац текста статьи номер {n}, чтобы пройти фильтр.</p></body></html>'''
+
+
+class NewsIngestionTests(NewsTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.user = User.objects.create_user(username='admin', password='pass12345', is_staff=True)
+
+	def fake_get(self, url, timeout=None):
+		response = mock.Mock(text=ARTICLE_HTML.format(n=url.rsplit('/', 1)[-1]))
+		response.raise_for_status = mock.Mock()
+		return response
+
+	def test_batch_is_deduplicated_and_bulk_inserted(self):
+		urls = [f'https://example.com/a/{i}' for i in range(5)]
+		service = NewsScrapingService(max_workers=4)
+		with mock.patch.object(service.session, 'get', side_effect=self.fake_get):
+			loaded = service.load_news_batch(self.user, 0, urls + urls[:2])
+			self.assertEqual(len(loaded), 5)
+			News_post.objects.create(
+				title='Опубликована', short_description='-', text='-', pub_date=timezone.now(),
+				author=self.user, source_url='https://example.com/a/5',
+			)
+			again = service.load_news_batch(self.user, 0, [f'https://example.com/a/{i}' for i in range(7)])
+		self.assertEqual([item.source_url for item in again], ['https://example.com/a/6'])
+		self.assertEqual(PendingNews.objects.get(source_url=urls[0]).title, 'Статья 0')
+
+	def test_og_image_is_resolved_and_length_checked(self):
+		service = NewsScrapingService()
+		pages = {
+			'https://example.com/a/relative': ARTICLE_HTML.replace('https://images.example.com/{n}.png', '/img/{n}.png'),
+			'https://example.com/a/long': ARTICLE_HTML.replace('{n}.png', 'x' * 300 + '.png'),
+		}
+
+		def fake_get(url, timeout=None):
+			response = mock.Mock(text=pages[url].format(n='1'))
+			response.raise_for_status = mock.Mock()
+			return response
+
+		with mock.patch.object(service.session, 'get', side_effect=fake_get):
+			service.load_news_batch(self.user, 0, list(pages))
+		self.assertEqual(PendingNews.objects.get(source_url='https://example.com/a/relative').image_url, 'https://example.com/img/1.png')
+		self.assertIsNone(PendingNews.objects.get(source_url='https://example.com/a/long').image_url)
+
+	def test_failed_article_is_logged(self):
+		service = NewsScrapingService()
+		with mock.patch.object(service.session, 'get', side_effect=requests.ConnectionError('refused')), \
+				self.assertLogs('news.services', 'WARNING') as logs:
+			self.assertEqual(service.fetch_articles(['https://example.com/a/down']), [])
+		self.assertIn('https://example.com/a/down', logs.output[0])
+
+	def test_admin_load_runs_as_background_job(self):
+		self.client.force_login(self.user)
+		with mock.patch('news.jobs._executor') as executor, self.captureOnCommitCallbacks(execute=True):
+			response = self.client.post(reverse('admin_load_news'), {'count': 3, 'urls': ''})
+		self.assertRedirects(response, reverse('admin_pending_news'), fetch_redirect_response=False)
+		job = NewsLoadJob.objects.get()
+		executor.submit.assert_called_once_with(run_load_news_job, job.id)
+
+		run_load_news_job(job.id)
+		job.refresh_from_db()
+		self.assertEqual(job.status, NewsLoadJob.STATUS_DONE)
+		self.assertEqual(PendingNews.objects.count(), 3)
+
+	def test_jobs_interrupted_by_restart_are_failed(self):
+		pending = NewsLoadJob.objects.create(created_by=self.user, count=3)
+		running = NewsLoadJob.objects.create(created_by=self.user, count=3, status=NewsLoadJob.STATUS_RUNNING)
+		done = NewsLoadJob.objects.create(created_by=self.user, count=3, status=NewsLoadJob.STATUS_DONE)
+		started_at = timezone.now()
+		later = NewsLoadJob.objects.create(created_by=self.user, count=3)
+
+		self.assertEqual(fail_interrupted_jobs(started_at), 2)
+		for job in (pending, running):
+			job.refresh_from_db()
+			self.assertEqual(job.status, NewsLoadJob.STATUS_FAILED)
+			self.assertEqual(job.error, INTERRUPTED_ERROR)
+			self.assertIsNotNone(job.finished_at)
+		done.refresh_from_db()
+		later.refresh_from_db()
+		self.assertEqual(done.status, NewsLoadJob.STATUS_DONE)
+		self.assertEqual(later.status, NewsLoadJob.STATUS_PENDING)
+
+
+class BulkModerationTests(NewsTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.staff = User.objects.create_user(username='moderator', password='pass12345', is_staff=True)
+		PendingNews.objects.bulk_create([
+			PendingNews(
+				title=f'Новость {i}', short_description='Кратко', text='Текст нейросети',
+				source_url=f'https://example.com/{i}', image_url=f'https://images.example.com/{i}.png' if i % 2 else None,
+				created_by=cls.staff,
+			)
+			for i in range(6)
+		])
+
+	def test_bulk_approve_and_reject(self):
+		self.client.force_login(self.staff)
+		ids = list(PendingNews.objects.order_by('id').values_list('id', flat=True))
+		with self.captureOnCommitCallbacks(execute=False):
+			self.client.post(reverse('admin_bulk_moderate'), {'action': 'approve', 'ids': ids[:4]})
+		self.client.post(reverse('admin_bulk_moderate'), {'action': 'reject', 'ids': ids[4:]})
+
+		self.assertFalse(PendingNews.objects.filter(is_processed=False).exists())
+		self.assertEqual(News_post.objects.filter(is_approved=True, is_from_internet=True).count(), 4)
+		self.assertEqual(NewsImage.objects.count(), 2)
+		# Опубликованные массово новости попадают в поисковый индекс
+		self.assertEqual(len(self.client.get(reverse('news_search'), {'q': 'нейросеть'}).context['news']), 4)
+
+	def test_repeated_approve_does_not_duplicate(self):
+		self.client.force_login(self.staff)
+		ids = list(PendingNews.objects.values_list('id', flat=True))
+		self.client.post(reverse('admin_bulk_moderate'), {'action': 'approve', 'ids': ids})
+		self.client.post(reverse('admin_bulk_moderate'), {'action': 'approve', 'ids': ids})
+		self.assertEqual(News_post.objects.count(), 6)
+
+
+class QueryPlanTests(NewsTestCase):
+	"""
+	Запросы горячих страниц не должны превращаться в полный просмотр таблиц приложения.
+	На SQLite проверяется EXPLAIN QUERY PLAN, на Postgres — EXPLAIN с выключенным
+	seqscan (на маленьких тестовых таблицах планировщик иначе всегда выбирает Seq Scan).
+	"""
+	APP_TABLES = (
+		'news_news_post', 'news_newsimage', 'news_like', 'news_favorite',
+		'news_pendingnews', 'news_newsloadjob', 'news_newsranking',
+	)
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.user = User.objects.create_user(username='reader', password='pass12345', is_staff=True)
+		for i in range(5):
+			post = News_post.objects.create(
+				title=f'Новость {i}', short_description='Кратко', text='Текст нейросети',
+				pub_date=timezone.now(), author=cls.user, is_approved=True,
+			)
+			NewsImage.objects.create(news_post=post, image_url=f'https://example.com/{i}.jpg')
+			Like.objects.create(user=cls.user, news_post=post)
+			Favorite.objects.create(user=cls.user, news_post=post)
+			PendingNews.objects.create(title=f'Черновик {i}', source_url=f'https://example.com/p/{i}', created_by=cls.user)
+		cls.post = post
+
+	def capture_selects(self, url, **params):
+		queries = []
+
+		def wrapper(execute, sql, sql_params, many, context):
+			if sql.lstrip().upper().startswith('SELECT'):
+				queries.append((sql, sql_params))
+			return execute(sql, sql_params, many, context)
+
+		with connection.execute_wrapper(wrapper):
+			response = self.client.get(url, params)
+		self.assertEqual(response.status_code, 200)
+		return queries
+
+	def explain(self, sql, params):
+		with connection.cursor() as cursor:
+			if connection.vendor == 'sqlite':
+				cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+				return [row[-1] for row in cursor.fetchall()]
+			cursor.execute('SET LOCAL enable_seqscan = off')
+			cursor.execute('EXPLAIN ' + sql, params)
+			return [row[0] for row in cursor.fetchall()]
+
+	def full_scans(self, plan):
+		scans = []
+		for line in plan:
+			if connection.vendor == 'sqlite':
+				# «SCAN t» без индекса — чтение всей таблицы; «SCAN t USING INDEX» — обход индекса.
+				# SQLite до 3.36 пишет «SCAN TABLE t»
+				match = SQLITE_SCAN_RE.match(line)
+				if match and match['table'] in self.APP_TABLES and 'INDEX' not in match['rest']:
+					scans.append(line)
+			elif 'Seq Scan' in line and any(table in line for table in self.APP_TABLES):
+				scans.append(line)
+		return scans
+
+	@skipIf(connection.vendor != 'sqlite', 'формат плана SQLite')
+	def test_full_scan_matcher_accepts_old_and_new_sqlite_formats(self):
+		table = 'news_news_post'
+		self.assertEqual(len(self.full_scans([
+			f'SCAN {table}', f'SCAN TABLE {table}', f'SCAN TABLE {table} AS T', f'SCAN {table} AS T',
+		])), 4)
+		self.assertEqual(self.full_scans([
+			f'SCAN {table} USING INDEX news_feed_idx', f'SCAN TABLE {table} USING COVERING INDEX news_feed_idx',
+			f'SEARCH {table} USING INTEGER PRIMARY KEY (rowid=?)', 'SCAN auth_user',
+		]), [])
+
+	def assertNoFullScans(self, url, **params):
+		if connection.vendor not in ('sqlite', 'postgresql'):
+			self.skipTest('EXPLAIN проверяется только на SQLite и Postgres')
+		queries = self.capture_selects(url, **params)
+		self.assertTrue(queries)
+		for sql, sql_params in queries:
+			plan = self.explain(sql, sql_params)
+			self.assertEqual(self.full_scans(plan), [], f'{sql}\n' + '\n'.join(plan))
+
+	def test_news_feed(self):
+		self.assertNoFullScans(reverse('news_home'))
+
+	def test_news_feed_authenticated(self):
+		self.client.force_login(self.user)
+		self.assertNoFullScans(reverse('news_home'))
+		self.assertNoFullScans(reverse('news_feed_json'), after=encode_cursor(self.post))
+
+	def test_news_detail(self):
+		self.client.force_login(self.user)
+		self.assertNoFullScans(reverse('news_detail', args=[self.post.id]))
+
+	def test_favorites(self):
+		self.client.force_login(self.user)
+		self.assertNoFullScans(reverse('favorites_list'))
+
+	def test_pending_news(self):
+		self.client.force_login(self.user)
+		self.assertNoFullScans(reverse('admin_pending_news'))
+
+	def test_trending(self):
+		trending.refresh()
+		self.client.force_login(self.user)
+		self.assertNoFullScans(reverse('news_trending'))
+		self.assertNoFullScans(reverse('news_trending'), sort='top')
+
+
+class BenchmarkTests(NewsTestCase):
+	def test_seed_and_benchmark(self):
+		call_command('add_sample_news', posts=30, users=4, likes_per_user=5, favorites_per_user=3, stdout=StringIO())
+		self.assertEqual(News_post.objects.count(), 30)
+		self.assertEqual(NewsImage.objects.count(), 60)
+		self.assertEqual(Like.objects.count(), 20)
+		# bulk_create обходит сигналы, но счётчики пересчитываются
+		self.assertEqual(sum(News_post.objects.values_list('like_count', flat=True)), 20)
+
+		likes_before = Like.objects.count()
+		with tempfile.TemporaryDirectory() as tmp:
+			report_path = os.path.join(tmp, 'report.json')
+			out = StringIO()
+			call_command('benchmark_news', iterations=3, warmup=1, json_path=report_path, stdout=out)
+			call_command('benchmark_news', iterations=3, warmup=1, compare=report_path, scenarios='news_home', stdout=out)
+			report = load_report(report_path)
+
+		self.assertEqual([s['name'] for s in report['scenarios']], list(SCENARIOS))
+		for scenario in report['scenarios']:
+			self.assertEqual(scenario['errors'], 0, scenario['name'])
+			self.assertLessEqual(scenario['p50_ms'], scenario['p99_ms'])
+		self.assertEqual(report['data']['posts'], 30)
+		self.assertEqual(Like.objects.count(), likes_before)
+
+
+class RequestMetricsTests(NewsTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.staff = User.objects.create_user(username='staff', password='pass12345', is_staff=True)
+		cls.post = News_post.objects.create(
+			title='Новость', short_description='Кратко', text='Текст',
+			pub_date=timezone.now(), author=cls.staff, is_approved=True,
+		)
+
+	def setUp(self):
+		super().setUp()
+		metrics_registry.reset()
+
+	def test_server_timing_for_staff_only(self):
+		self.assertNotIn('Server-Timing', self.client.get(reverse('news_home')))
+		self.client.force_login(self.staff)
+		timing = self.client.get(reverse('news_home'))['Server-Timing']
+		self.assertRegex(timing, r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, http;dur=')
+
+	def test_server_timing_does_not_load_user(self):
+		self.client.force_login(self.staff)
+		with CaptureQueriesContext(connection) as queries:
+			response = self.client.get(reverse('news_rss'))
+		self.assertNotIn('Server-Timing', response)
+		self.assertFalse([q for q in queries.captured_queries if 'django_session' in q['sql'] or 'auth_user' in q['sql']])
+
+	def test_outbound_http_is_attributed_to_route(self):
+		with tempfile.TemporaryDirectory() as cache_dir, override_settings(IMAGE_PROXY_CACHE_DIR=cache_dir):
+			with mock.patch('news.image_cache.httpx', None), \
+					mock.patch('news.image_cache._session.get', return_value=FakeUpstreamResponse(b'png' * 10)):
+				self.client.get(reverse('image_proxy'), {'url': 'https://images.example.com/a.png'})
+		self.client.get(reverse('news_detail', args=[self.post.id]))
+
+		self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+		self.client.force_login(self.staff)
+		body = self.client.get(reverse('metrics')).content.decode()
+		self.assertIn('news_outbound_http_requests_total{route="image_proxy"} 1', body)
+		self.assertIn('news_http_requests_total{route="news_detail",status="2xx"} 1', body)
+		self.assertIn('news_http_request_duration_seconds_count{route="news_detail"} 1', body)
+		self.assertRegex(body, r'news_template_render_seconds_total\{route="news_detail"\} 0\.\d*[1-9]')
+
+	@override_settings(METRICS_TOKEN='secret')
+	def test_metrics_token(self):
+		self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+		self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+	@override_settings(METRICS_SLOW_REQUEST_MS=0)
+	def test_slow_request_log_lists_queries(self):
+		with self.assertLogs('news.slow_requests', 'WARNING') as logs:
+			self.client.get(reverse('news_detail', args=[self.post.id]))
+		self.assertIn('news_detail', logs.output[0])
+		self.assertIn('FROM "news_news_post"', logs.output[0])
+
+
+class PopulateNewsImagesTests(NewsTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		author = User.objects.create_user(username='author', password='pass12345')
+		cls.posts = News_post.objects.bulk_create([
+			News_post(title=f'Новость {i}', short_description='Кратко', text='Текст', pub_date=timezone.now(), author=author)
+			for i in range(5)
+		])
+		NewsImage.objects.create(news_post=cls.posts[0], image_url='https://example.com/own.jpg')
+
+	def populate(self, **options):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.addCleanup(self.tmp.cleanup)
+		options.setdefault('checkpoint', os.path.join(self.tmp.name, 'checkpoint'))
+		call_command('populate_news_images', per_post=3, batch_size=2, skip_thumbnails=True, stdout=StringIO(), **options)
+
+	def test_tops_up_to_per_post_in_batches(self):
+		with CaptureQueriesContext(connection) as ctx:
+			self.populate()
+		self.assertEqual(NewsImage.objects.count(), 15)
+		self.assertEqual(self.posts[0].images.count(), 3)
+		# 5 новостей пачками по 2: запросов на пачку постоянное число, не на новость
+		self.assertLess(len(ctx.captured_queries), 20)
+		self.populate()
+		self.assertEqual(NewsImage.objects.count(), 15)
+
+	def test_dead_links_are_dropped(self):
+		def head(url, **kwargs):
+			dead = url.endswith('_2/800/400')
+			return FakeUpstreamResponse(status_code=404 if dead else 200, headers={'Content-Type': 'image/jpeg'})
+
+		with mock.patch('requests.Session.head', side_effect=head):
+			self.populate(check_urls=True, workers=4)
+		self.assertFalse(NewsImage.objects.filter(image_url__contains='_2/800/400').exists())
+		self.assertEqual(NewsImage.objects.count(), 1 + 1 + 4 * 2)
+
+	def test_resumes_after_checkpoint(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			checkpoint = os.path.join(tmp, 'checkpoint')
+			with open(checkpoint, 'w') as f:
+				json.dump({'per_post': 3, 'last_id': self.posts[2].id}, f)
+			self.populate(checkpoint=checkpoint)
+			self.assertFalse(os.path.exists(checkpoint))
+		self.assertEqual(NewsImage.objects.filter(news_post__in=self.posts[:3]).count(), 1)
+		self.assertEqual(NewsImage.objects.filter(news_post__in=self.posts[3:]).count(), 6)
+
+
+class TrendingTests(NewsTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.users = [User.objects.create_user(username=f'reader{i}', password='pass12345') for i in range(3)]
+		cls.old, cls.fresh = [
+			News_post.objects.create(
+				title=title, short_description='Кратко', text='Текст',
+				pub_date=timezone.now(), author=cls.users[0], is_approved=True,
+			)
+			for title in ('Вчерашняя', 'Свежая')
+		]
+
+	def like(self, user, post, days_ago=0):
+		with mock.patch('django.utils.timezone.now', return_value=timezone.now() - timezone.timedelta(days=days_ago)):
+			return Like.objects.create(user=user, news_post=post)
+
+	def ranked(self):
+		return [post.title for post in trending.trending(News_post.objects.all(), 10)]
+
+	def test_recent_likes_outrank_old_ones(self):
+		for user in self.users:
+			self.like(user, self.old, days_ago=3)
+		self.like(self.users[0], self.fresh)
+		self.assertEqual(trending.refresh(), 4)
+		# 3 лайка трёхдневной давности весят 3/8 свежего при периоде полураспада в сутки
+		self.assertEqual(self.ranked(), ['Свежая', 'Вчерашняя'])
+		self.assertEqual(self.client.get(reverse('news_trending')).context['news'][0], self.fresh)
+		self.assertEqual(self.client.get(reverse('news_trending'), {'sort': 'top'}).context['news'][0], self.old)
+
+	def test_refresh_only_processes_new_events(self):
+		self.like(self.users[0], self.old)
+		trending.refresh()
+		with CaptureQueriesContext(connection) as ctx:
+			self.assertEqual(trending.refresh(), 0)
+		self.assertLess(len(ctx.captured_queries), 6)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			Like.objects.filter(news_post=self.old).delete()
+		trending.refresh()
+		self.assertEqual(self.ranked(), [])
+
+	def test_rebuild_and_rebase_keep_scores(self):
+		self.like(self.users[0], self.old, days_ago=2)
+		self.like(self.users[1], self.fresh, days_ago=1)
+		trending.refresh()
+		incremental = dict(NewsRanking.objects.values_list('news_post_id', 'score'))
+
+		# Сдвиг точки отсчёта на 10 дней: рейтинги домножаются на 2^-10
+		NewsRankingState.objects.filter(pk=1).update(epoch=timezone.now() - timezone.timedelta(days=10))
+		self.like(self.users[2], self.fresh)
+		trending.refresh()
+		self.assertEqual(self.ranked(), ['Свежая', 'Вчерашняя'])
+
+		trending.rebuild()
+		rebuilt = dict(NewsRanking.objects.values_list('news_post_id', 'score'))
+		self.assertAlmostEqual(rebuilt[self.old.id], 0.25, places=3)
+		self.assertAlmostEqual(rebuilt[self.fresh.id], 1.5, places=3)
+		self.assertAlmostEqual(incremental[self.fresh.id] / incremental[self.old.id], 2, places=3)
+
+	def test_deleting_post_does_not_record_unlikes(self):
+		self.like(self.users[0], self.old)
+		self.like(self.users[1], self.old)
+		self.old.delete()
+		# Событие для удалённой новости нарушило бы внешний ключ при COMMIT
+		connection.check_constraints()
+		self.assertEqual(trending.refresh(), 0)
+
+	def test_deleting_author_of_liked_post(self):
+		author = User.objects.create_user(username='author', password='pass12345')
+		post = News_post.objects.create(
+			title='Авторская', short_description='Кратко', text='Текст',
+			pub_date=timezone.now(), author=author, is_approved=True,
+		)
+		self.like(self.users[0], post)
+		self.like(author, self.old)
+		trending.refresh()
+		with self.captureOnCommitCallbacks(execute=True):
+			author.delete()
+		connection.check_constraints()
+		# Снятый лайк у оставшейся новости учитывается, у удалённой — нет
+		self.assertEqual(trending.refresh(), 1)
+		self.assertEqual(self.ranked(), [])
+
+	def test_view_schedules_background_refresh_once(self):
+		with mock.patch('news.trending.submit') as submit, self.captureOnCommitCallbacks(execute=True):
+			self.client.get(reverse('news_trending'))
+			self.client.get(reverse('news_trending'))
+		submit.assert_called_once()
+
+
+class StaticBuildTests(NewsTestCase):
+	MANIFEST_STORAGES = {
+		**TEST_STORAGES,
+		'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+	}
+
+	def setUp(self):
+		super().setUp()
+		tmp = tempfile.TemporaryDirectory()
+		self.addCleanup(tmp.cleanup)
+		self.source = Path(tmp.name) / 'static'
+		self.root = Path(tmp.name) / 'staticfiles'
+		files = {
+			'css/style.css': '/* Свои стили */\nbody {\n    color: #333;\n    width: calc(100% - 2px);\n}\n',
+			'vendor/bootstrap/bootstrap.min.css': '@charset "UTF-8";/*! Bootstrap */:root{--bs-blue:#0d6efd}\n',
+			'vendor/bootstrap/bootstrap.bundle.min.js': '/*! Bootstrap */!function(){window.bs=1}();\n',
+			'vendor/bootstrap-icons/bootstrap-icons.css': '@charset "UTF-8";\n@font-face { src: url("./fonts/bootstrap-icons.woff2?24e3eb84") format("woff2"); }\n' + '.bi-x::before { content: "\\f62a"; }\n' * 200,
+			'vendor/bootstrap-icons/fonts/bootstrap-icons.woff2': 'wOF2',
+			'vendor/bootstrap-icons/fonts/bootstrap-icons.woff': 'wOFF',
+		}
+		for name, content in files.items():
+			path = self.source / name
+			path.parent.mkdir(parents=True, exist_ok=True)
+			path.write_text(content, encoding='utf-8')
+		override = override_settings(STATICFILES_DIRS=[self.source], STATIC_ROOT=self.root)
+		override.enable()
+		self.addCleanup(override.disable)
+		# URL бандлов запоминаются на процесс, а каталог статики у каждого теста свой
+		assets.bundle_urls.cache_clear()
+		self.addCleanup(assets.bundle_urls.cache_clear)
+
+	def build(self, *args):
+		out = StringIO()
+		call_command('build_static', '--offline', *args, stdout=out)
+		assets.bundle_urls.cache_clear()
+		return out.getvalue()
+
+	def test_bundle_is_minified_and_self_contained(self):
+		for name in ('vendor/bootstrap/bootstrap.min.css', 'vendor/bootstrap/bootstrap.bundle.min.js'):
+			with open(self.source / name, 'a', encoding='utf-8') as f:
+				f.write(f'/*# sourceMappingURL={Path(name).name}.map */')
+		output = self.build('--skip_collectstatic')
+		css = (self.source / 'dist/site.css').read_text(encoding='utf-8')
+		self.assertTrue(css.startswith('@charset "UTF-8";/*! Bootstrap */'))
+		self.assertEqual(css.count('@charset'), 1)
+		self.assertNotIn('sourceMappingURL', css)
+		self.assertNotIn('Свои стили', css)
+		self.assertIn('body{color:#333;width:calc(100% - 2px)}', css)
+		self.assertIn('url("../vendor/bootstrap-icons/fonts/bootstrap-icons.woff2")', css)
+		self.assertNotIn('sourceMappingURL', (self.source / 'dist/site.js').read_text(encoding='utf-8'))
+		self.assertIn('dist/site.css', output)
+
+		# Размер повторной сборки сравнивается с предыдущей
+		with open(self.source / 'css/style.css', 'a', encoding='utf-8') as f:
+			f.write(''.join(f'.rule-{i}{{margin:{i}px}}\n' for i in range(500)))
+		self.assertRegex(self.build('--skip_collectstatic'), r'dist/site\.css .*\(\+\d+\.\d\)')
+
+	@override_settings(DEBUG=True)
+	def test_templates_fall_back_to_sources_until_built(self):
+		(self.source / 'vendor/bootstrap/bootstrap.bundle.min.js').unlink()
+		self.assertEqual(assets.bundle_urls('dist/site.js'), [assets.VENDOR_FILES['vendor/bootstrap/bootstrap.bundle.min.js']])
+		self.assertEqual(assets.bundle_urls('dist/site.css'), [
+			'/static/vendor/bootstrap/bootstrap.min.css',
+			'/static/vendor/bootstrap-icons/bootstrap-icons.css',
+			'/static/css/style.css',
+		])
+
+		(self.source / 'vendor/bootstrap/bootstrap.bundle.min.js').write_text('!function(){}();', encoding='utf-8')
+		self.build('--skip_collectstatic')
+		self.assertEqual(assets.bundle_urls('dist/site.js'), ['/static/dist/site.js'])
+		response = self.client.get(reverse('news_home'))
+		self.assertContains(response, '<link href="/static/dist/site.css" rel="stylesheet">', html=True)
+		self.assertContains(response, '<script src="/static/dist/site.js"></script>', html=True)
+		self.assertNotContains(response, 'cdn.jsdelivr.net')
+
+	def test_missing_vendor_files_fail_build_and_deploy_check(self):
+		(self.source / 'vendor/bootstrap/bootstrap.bundle.min.js').unlink()
+		with self.assertRaisesMessage(CommandError, 'vendor/bootstrap/bootstrap.bundle.min.js'):
+			self.build('--skip_collectstatic')
+		errors = checks.check_bundles(None)
+		# site.css успел собраться до ошибки, site.js — нет
+		self.assertEqual([error.id for error in errors], ['news.E001'])
+		self.assertIn('dist/site.js', errors[0].msg)
+		self.assertIn('vendor/bootstrap/bootstrap.bundle.min.js', errors[0].msg)
+		# Без DEBUG подключение с CDN не молчаливое
+		with self.assertLogs('news.assets', 'ERROR'):
+			assets.bundle_urls('dist/site.js')
+
+	@override_settings(STORAGES=MANIFEST_STORAGES, DEBUG=False)
+	def test_collected_bundle_is_fingerprinted_compressed_and_immutable(self):
+		self.build()
+		hashed = [path.name for path in (self.root / 'dist').iterdir() if path.name.startswith('site.')]
+		self.assertTrue(any(name.endswith('.css.gz') for name in hashed), hashed)
+		css_url = assets.bundle_urls('dist/site.css')[0]
+		self.assertRegex(css_url, r'^/static/dist/site\.[0-9a-f]{12}\.css$')
+		# Ссылка на шрифт тоже ведёт на файл с отпечатком
+		collected = (self.root / css_url.removeprefix('/static/')).read_text(encoding='utf-8')
+		self.assertRegex(collected, r'fonts/bootstrap-icons\.[0-9a-f]{12}\.woff2')
+
+		middleware = AsyncWhiteNoiseMiddleware(lambda request: None)
+		response = middleware(RequestFactory().get(css_url, HTTP_ACCEPT_ENCODING='gzip, br'))
+		self.assertEqual(response.status_code, 200)
+		self.assertIn('immutable', response['Cache-Control'])
+		self.assertEqual(response['Content-Encoding'], 'br' if assets.brotli is not None else 'gzip')
+		response.close()
+
+	def test_fetch_vendor_downloads_only_missing_files(self):
+		(self.source / 'vendor/bootstrap-icons/fonts/bootstrap-icons.woff').unlink()
+		session = mock.MagicMock()
+		session.__enter__.return_value = session
+		session.get.return_value.content = b'wOFF'
+		with mock.patch('news.assets.requests.Session', return_value=session):
+			self.assertEqual(assets.fetch_vendor(), ['vendor/bootstrap-icons/fonts/bootstrap-icons.woff'])
+		session.get.assert_called_once_with(assets.VENDOR_FILES['vendor/bootstrap-icons/fonts/bootstrap-icons.woff'], timeout=assets.FETCH_TIMEOUT)
+
+		# Ссылки на .map вырезаются при скачивании, иначе collectstatic не найдёт файл
+		session.get.return_value.content = b'!function(){}();\n//# sourceMappingURL=bootstrap.bundle.min.js.map'
+		with mock.patch('news.assets.requests.Session', return_value=session):
+			assets.fetch_vendor(refresh=True)
+		self.assertEqual((self.source / 'vendor/bootstrap/bootstrap.bundle.min.js').read_text(encoding='utf-8'), '!function(){}();\n')
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db', USER_CACHE_TIMEOUT=300)
+class CachedAuthTests(NewsTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.user = User.objects.create_user(username='reader', password='pass12345')
+		cls.posts = [
+			News_post.objects.create(
+				title=f'Новость {i}', short_description='Кратко', text='Текст',
+				pub_date=timezone.now(), author=cls.user, is_approved=True,
+			)
+			for i in range(3)
+		]
+		Like.objects.create(user=cls.user, news_post=cls.posts[0])
+		Favorite.objects.create(user=cls.user, news_post=cls.posts[1])
+
+	def setUp(self):
+		super().setUp()
+		self.client.login(username='reader', password='pass12345')
+
+	def feed_queries(self):
+		with CaptureQueriesContext(connection) as ctx:
+			response = self.client.get(reverse('news_home'))
+		self.assertEqual(response.status_code, 200)
+		return response, [query['sql'] for query in ctx.captured_queries]
+
+	def test_warm_request_skips_session_user_and_flag_queries(self):
+		self.feed_queries()
+		response, queries = self.feed_queries()
+		tables = ('django_session', 'auth_user', 'news_like', 'news_favorite')
+		self.assertEqual([sql for sql in queries if any(f'FROM "{table}"' in sql for table in tables)], [])
+		self.assertContains(response, f'data-news-id="{self.posts[0].id}"\n                                    data-liked="True"')
+		self.assertContains(response, 'data-liked="False"', count=2)
+		self.assertContains(response, '<i class="bi bi-bookmark-fill text-warning"></i>', count=1)
+
+	def test_toggles_invalidate_cached_ids(self):
+		self.feed_queries()
+		self.client.post(reverse('toggle_like', args=[self.posts[2].id]))
+		self.client.post(reverse('toggle_favorite', args=[self.posts[1].id]))
+		response, _ = self.feed_queries()
+		self.assertContains(response, 'data-liked="True"', count=2)
+		self.assertNotContains(response, '<i class="bi bi-bookmark-fill text-warning"></i>')
+		self.assertTrue(self.client.get(reverse('news_detail', args=[self.posts[2].id])).context['is_liked'])
+
+	def test_password_change_and_deactivation_end_sessions(self):
+		self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+		self.user.set_password('new-pass12345')
+		self.user.save()
+		self.assertEqual(self.client.get(reverse('profile')).status_code, 302)
+
+		self.client.login(username='reader', password='new-pass12345')
+		self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+		user = User.objects.get(pk=self.user.pk)
+		user.is_active = False
+		user.save()
+		self.assertEqual(self.client.get(reverse('profile')).status_code, 302)
+
+	@override_settings(USER_CACHE_TIMEOUT=0)
+	def test_without_cache_ids_are_loaded_once_per_request(self):
+		_, queries = self.feed_queries()
+		self.assertEqual(len([sql for sql in queries if 'FROM "news_like"' in sql]), 1)
+
+
+class FeedExportTests(NewsTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.author = User.objects.create_user(username='author', password='pass12345')
+		start = timezone.now() - timezone.timedelta(days=1)
+		News_post.objects.bulk_create([
+			News_post(
+				title=f'Новость {i} <&>', short_description=f'Кратко {i}', text=f'Текст {i}',
+				pub_date=start + timezone.timedelta(minutes=i), author=cls.author, is_approved=True,
+			)
+			for i in range(7)
+		])
+		News_post.objects.create(
+			title='На модерации', short_description='Кратко', text='Текст',
+			pub_date=timezone.now(), author=cls.author, is_approved=False,
+		)
+
+	def setUp(self):
+		super().setUp()
+		tmp = tempfile.TemporaryDirectory()
+		self.addCleanup(tmp.cleanup)
+		override = override_settings(FEED_EXPORT_CACHE_DIR=tmp.name)
+		override.enable()
+		self.addCleanup(override.disable)
+		# Маленькие пачки, чтобы лента гарантированно отдавалась несколькими кусками
+		patcher = mock.patch.object(syndication, 'BATCH_SIZE', 3)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def fetch(self, name, **headers):
+		response = self.client.get(reverse(name), **headers)
+		chunks = list(response.streaming_content) if response.streaming else []
+		return response, chunks
+
+	def test_formats_stream_all_approved_posts_newest_first(self):
+		titles = [f'Новость {i} <&>' for i in reversed(range(7))]
+
+		response, chunks = self.fetch('news_rss')
+		self.assertEqual(response['Content-Type'], 'application/rss+xml; charset=utf-8')
+		self.assertGreater(len(chunks), 3)
+		channel = ET.fromstring(b''.join(chunks)).find('channel')
+		self.assertEqual([item.findtext('title') for item in channel.findall('item')], titles)
+		self.assertEqual(channel.find('item').findtext('link'), 'http://testserver' + reverse('news_detail', args=[News_post.objects.get(title=titles[0]).id]))
+
+		response, chunks = self.fetch('news_atom')
+		atom = '{http://www.w3.org/2005/Atom}'
+		feed = ET.fromstring(b''.join(chunks))
+		self.assertEqual([entry.findtext(f'{atom}title') for entry in feed.findall(f'{atom}entry')], titles)
+
+		response, chunks = self.fetch('news_json_feed')
+		data = json.loads(b''.join(chunks))
+		self.assertEqual(data['version'], 'https://jsonfeed.org/version/1.1')
+		self.assertEqual([item['title'] for item in data['items']], titles)
+		self.assertEqual(data['items'][-1]['content_text'], 'Текст 0')
+
+	def test_conditional_get_uses_latest_pub_date(self):
+		response, _ = self.fetch('news_rss')
+		last_modified = response['Last-Modified']
+		latest = News_post.objects.filter(is_approved=True).latest('pub_date').pub_date
+		self.assertEqual(last_modified, http_date(latest.timestamp()))
+
+		response, _ = self.fetch('news_rss', HTTP_IF_MODIFIED_SINCE=last_modified)
+		self.assertEqual(response.status_code, 304)
+
+	def test_etag_changes_when_older_post_is_edited(self):
+		response, _ = self.fetch('news_rss')
+		etag, last_modified = response['ETag'], response['Last-Modified']
+		response, _ = self.fetch('news_rss', HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=last_modified)
+		self.assertEqual(response.status_code, 304)
+		self.assertEqual(response['ETag'], etag)
+
+		oldest = News_post.objects.filter(is_approved=True).earliest('pub_date')
+		oldest.title = 'Исправленный заголовок'
+		oldest.save()
+		# Дата самой свежей новости не изменилась, но лента — да
+		response, chunks = self.fetch('news_rss', HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=last_modified)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response['Last-Modified'], last_modified)
+		self.assertNotEqual(response['ETag'], etag)
+		self.assertIn('Исправленный заголовок', b''.join(chunks).decode())
+
+	def test_rendered_feed_is_served_from_disk_until_next_change(self):
+		first, chunks = self.fetch('news_json_feed')
+		self.assertEqual(first['X-Feed-Cache'], 'miss')
+		with CaptureQueriesContext(connection) as ctx:
+			second, cached = self.fetch('news_json_feed')
+		self.assertEqual(second['X-Feed-Cache'], 'hit')
+		self.assertEqual(b''.join(cached), b''.join(chunks))
+		self.assertEqual(int(second['Content-Length']), len(b''.join(chunks)))
+		self.assertEqual(len(ctx.captured_queries), 1)
+
+		pending = News_post.objects.get(is_approved=False)
+		pending.is_approved = True
+		pending.save()
+		third, chunks = self.fetch('news_json_feed')
+		self.assertEqual(third['X-Feed-Cache'], 'miss')
+		self.assertEqual(json.loads(b''.join(chunks))['items'][0]['title'], 'На модерации')
+		self.assertEqual(len(os.listdir(settings.FEED_EXPORT_CACHE_DIR)), 1)
+
+	async def test_asgi_streams_async_iterator(self):
+		# Синхронный итератор под ASGI Django читает в память целиком и предупреждает об этом
+		with warnings.catch_warnings():
+			warnings.filterwarnings('error', message='StreamingHttpResponse must consume')
+			response = await self.async_client.get(reverse('news_rss'))
+			body = b''.join([chunk async for chunk in response.streaming_content])
+		self.assertTrue(response.is_async)
+		self.assertEqual(len(ET.fromstring(body).find('channel').findall('item')), 7)
+
+	def test_interrupted_stream_is_not_cached(self):
+		response = self.client.get(reverse('news_atom'))
+		next(iter(response.streaming_content))
+		response.close()
+		self.assertEqual(self.fetch('news_atom')[0]['X-Feed-Cache'], 'miss')
+
+
+class NewsTransferTests(NewsTestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.author = User.objects.create_user(username='author', password='pass12345', email='author@example.com')
+		cls.readers = [User.objects.create_user(username=f'reader{i}', password='pass12345') for i in range(2)]
+		cls.liked_at = timezone.now() - timezone.timedelta(days=3)
+		for i in range(5):
+			post = News_post.objects.create(
+				title=f'Новость {i}', short_description='Кратко, "с кавычками"', text=f'Текст\nв две строки {i}',
+				pub_date=timezone.now() - timezone.timedelta(hours=i), author=cls.author, is_approved=i != 4,
+				source_url=f'https://example.com/{i}' if i % 2 else None,
+			)
+			NewsImage.objects.create(news_post=post, image_url=f'https://example.com/{i}.jpg')
+			with mock.patch('django.utils.timezone.now', return_value=cls.liked_at):
+				for reader in cls.readers[:i % 3]:
+					Like.objects.create(user=reader, news_post=post)
+
+	def setUp(self):
+		super().setUp()
+		self.tmp = tempfile.TemporaryDirectory()
+		self.addCleanup(self.tmp.cleanup)
+
+	def snapshot(self):
+		return sorted(
+			(post.title, post.short_description, post.text, post.pub_date, post.author.username, post.is_approved,
+			 post.source_url, post.like_count, tuple(image.image_url for image in post.images.all()),
+			 tuple(sorted((like.user.username, like.created_at) for like in post.like_set.all())))
+			for post in News_post.objects.select_related('author').prefetch_related('images', 'like_set__user')
+		)
+
+	def roundtrip(self, name, **import_options):
+		path = os.path.join(self.tmp.name, name)
+		before = self.snapshot()
+		call_command('export_news', path, stdout=StringIO())
+		News_post.objects.all().delete()
+		User.objects.exclude(pk=self.author.pk).delete()
+		call_command('import_news', path, checkpoint=os.path.join(self.tmp.name, 'checkpoint'), stdout=StringIO(), **import_options)
+		self.assertEqual(self.snapshot(), before)
+
+	def test_jsonl_roundtrip_keeps_authors_likes_and_dates(self):
+		self.roundtrip('news.jsonl.gz', batch_size=2)
+		# Пользователи переносятся без паролей
+		self.assertFalse(User.objects.get(username='reader0').has_usable_password())
+		self.assertTrue(User.objects.get(username='author').check_password('pass12345'))
+		# Одобренные новости попадают в поисковый индекс
+		found = self.client.get(reverse('news_search'), {'q': 'строки'}).context['news']
+		self.assertEqual(len(found), 4)
+
+	@override_settings(USER_CACHE_TIMEOUT=300)
+	def test_import_resets_cached_likes_of_existing_users(self):
+		path = os.path.join(self.tmp.name, 'news.jsonl')
+		call_command('export_news', path, stdout=StringIO())
+		News_post.objects.all().delete()
+		reader = self.readers[1]
+		self.assertEqual(user_post_ids(User.objects.get(pk=reader.pk)).liked, set())
+
+		call_command('import_news', path, checkpoint=os.path.join(self.tmp.name, 'checkpoint'), stdout=StringIO())
+		liked = set(Like.objects.filter(user=reader).values_list('news_post_id', flat=True))
+		self.assertTrue(liked)
+		self.assertEqual(user_post_ids(User.objects.get(pk=reader.pk)).liked, liked)
+
+	def test_csv_roundtrip_creates_missing_users(self):
+		self.roundtrip('news.csv')
+		self.assertTrue(User.objects.filter(username='reader1').exists())
+
+	def test_interrupted_import_resumes_without_duplicates(self):
+		path = os.path.join(self.tmp.name, 'news.jsonl')
+		checkpoint = os.path.join(self.tmp.name, 'checkpoint')
+		call_command('export_news', path, stdout=StringIO())
+		News_post.objects.all().delete()
+
+		original = transfer.Importer.import_batch
+		calls = []
+
+		def fail_on_third_batch(importer, records):
+			calls.append(len(records))
+			if len(calls) == 3:
+				raise KeyboardInterrupt
+			return original(importer, records)
+
+		with mock.patch.object(transfer.Importer, 'import_batch', fail_on_third_batch), self.assertRaises(KeyboardInterrupt):
+			call_command('import_news', path, batch_size=2, checkpoint=checkpoint, stdout=StringIO())
+		# 3 пользователя и первая новость в первых двух пачках
+		self.assertEqual(News_post.objects.count(), 1)
+
+		out = StringIO()
+		call_command('import_news', path, batch_size=2, checkpoint=checkpoint, stdout=out)
+		self.assertIn('Продолжаем после записи 4', out.getvalue())
+		self.assertEqual(News_post.objects.count(), 5)
+		self.assertEqual(Like.objects.count(), 4)
+		self.assertFalse(os.path.exists(checkpoint))
+
+
+# Запросы ждут блокировку записи, в лог медленных запросов это не нужно
+@override_settings(STORAGES=TEST_STORAGES, METRICS_SLOW_REQUEST_MS=60000)
+class ConcurrentLikeTests(TransactionTestCase):
+	THREADS = 12
+	TOGGLES = 9
+
+	def setUp(self):
+		cache.clear()
+		self.users = [User.objects.create_user(username=f'reader{i}', password='pass12345') for i in range(self.THREADS)]
+		self.post = News_post.objects.create(
+			title='Горячая новость', short_description='Кратко', text='Текст',
+			pub_date=timezone.now(), author=self.users[0], is_approved=True,
+		)
+		if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+			# In-memory база тестов с общим кэшем блокирует таблицы целиком и не ждёт busy timeout,
+			# поэтому потоки работают с её копией в файле — как сайт в WAL-режиме
+			tmp = tempfile.TemporaryDirectory()
+			self.addCleanup(tmp.cleanup)
+			path = os.path.join(tmp.name, 'db.sqlite3')
+			connection.ensure_connection()
+			target = sqlite3.connect(path)
+			connection.connection.backup(target)
+			target.close()
+			patcher = mock.patch.dict(connections.settings, default={**connections.settings['default'], 'NAME': path})
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def in_thread(self, fn, *args):
+		"""fn в отдельном потоке со своим соединением с БД"""
+		def run():
+			try:
+				return fn(*args)
+			finally:
+				connections.close_all()
+		with ThreadPoolExecutor(max_workers=1) as executor:
+			return executor.submit(run).result()
+
+	def hammer(self, user):
+		client = Client()
+		client.force_login(user)
+		statuses = [
+			client.post(reverse('toggle_like', args=[self.post.id])).status_code
+			for _ in range(self.TOGGLES)
+		]
+		connections.close_all()
+		return statuses
+
+	def test_parallel_toggle_like_has_no_lock_errors(self):
+		with mock.patch('news.trending.submit'), ThreadPoolExecutor(max_workers=self.THREADS) as executor:
+			futures = [executor.submit(self.hammer, user) for user in self.users]
+			try:
+				statuses = [status for future in futures for status in future.result()]
+			except OperationalError as e:
+				self.fail(f'Ошибка блокировки при параллельных лайках: {e}')
+		self.assertEqual(set(statuses), {200})
+
+		# Каждый поставил лайк нечётное число раз; счётчик сходится с таблицей лайков
+		like_count, likes, journal_mode = self.in_thread(lambda: (
+			News_post.objects.values_list('like_count', flat=True).get(pk=self.post.pk),
+			Like.objects.filter(news_post=self.post).count(),
+			connection.cursor().execute('PRAGMA journal_mode').fetchone()[0] if connection.vendor == 'sqlite' else 'wal',
+		))
+		self.assertEqual((like_count, likes), (self.THREADS, self.THREADS))
+		self.assertEqual(journal_mode, 'wal')
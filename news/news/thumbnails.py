@@ -0,0 +1,139 @@
+"""
+Превью изображений новостей фиксированной ширины (WebP и JPEG) для srcset.
+
+Файлы лежат в MEDIA_ROOT/thumbs/<id NewsImage>/<ширина>.<webp|jpg>; после генерации
+у NewsImage выставляется thumbnails_ready. Исходник берётся через дисковый кэш
+image_proxy, поэтому повторная генерация не ходит к источнику.
+"""
+import functools
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.urls import reverse
+
+from .caching import bump_post_version
+from .image_cache import get_image, ImageFetchError
+
+try:
+	from PIL import Image
+except ImportError:  # Pillow не установлен — показываем оригиналы через прокси
+	Image = None
+
+# Ошибки одного исходника: остальные изображения пакета обрабатываются дальше
+BUILD_ERRORS = (ImageFetchError, OSError, ValueError)
+if Image is not None:
+	BUILD_ERRORS += (Image.DecompressionBombError,)
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+	'webp': ('WEBP', {'quality': 80, 'method': 4}),
+	'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+
+
+def variant_path(image_id, width, fmt):
+	return f'thumbs/{image_id}/{width}.{fmt}'
+
+
+@functools.lru_cache(maxsize=None)
+def _variant_url_prefix():
+	# Превью отдаёт представление news_thumbnail: /media/ обслуживается только при DEBUG
+	return reverse('news_thumbnail', args=[1, 320, 'jpg']).removesuffix('1/320.jpg')
+
+
+def variant_url(image_id, width, fmt):
+	return f'{_variant_url_prefix()}{image_id}/{width}.{fmt}'
+
+
+def build_variants(image_id, image_url):
+	"""Строит и сохраняет все превью одного изображения. Базу не трогает. Возвращает True при успехе."""
+	if Image is None:
+		return False
+	try:
+		source = get_image(image_url)
+		with Image.open(source.path) as original:
+			# JPEG декодируется сразу в уменьшенном масштабе, не крупнее самого большого превью
+			max_width = min(max(settings.THUMBNAIL_WIDTHS), original.width)
+			original.draft('RGB', (max_width, max(1, round(original.height * max_width / original.width))))
+			if original.width * original.height > settings.THUMBNAIL_MAX_PIXELS:
+				raise ValueError(f'image too large: {original.width}x{original.height}')
+			original.load()
+			if original.mode not in ('RGB', 'L'):
+				original = original.convert('RGB')
+			for width in settings.THUMBNAIL_WIDTHS:
+				# Не увеличиваем маленькие исходники: отдаём их в исходном размере
+				target_width = min(width, original.width)
+				height = max(1, round(original.height * target_width / original.width))
+				resized = original.resize((target_width, height), Image.LANCZOS)
+				for fmt, (pil_format, options) in FORMATS.items():
+					buffer = io.BytesIO()
+					resized.save(buffer, pil_format, **options)
+					path = variant_path(image_id, width, fmt)
+					if default_storage.exists(path):
+						default_storage.delete(path)
+					default_storage.save(path, ContentFile(buffer.getvalue()))
+	except BUILD_ERRORS as e:
+		logger.warning('Не удалось построить превью для %s: %s', image_url, e)
+		return False
+	return True
+
+
+def _generate_in_worker(news_image):
+	try:
+		if build_variants(news_image.id, news_image.image_url):
+			type(news_image).objects.filter(pk=news_image.pk).update(thumbnails_ready=True)
+			bump_post_version(news_image.news_post_id)
+	finally:
+		close_old_connections()
+
+
+def _get_executor():
+	global _executor
+	if _executor is None:
+		_executor = ThreadPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails')
+	return _executor
+
+
+def schedule_thumbnails(images):
+	"""Ставит генерацию превью в фоновый пул после коммита текущей транзакции"""
+	if Image is None:
+		return
+	images = list(images)
+
+	def submit():
+		executor = _get_executor()
+		for news_image in images:
+			executor.submit(_generate_in_worker, news_image)
+
+	transaction.on_commit(submit)
+
+
+def generate_many(images, workers=None, force=False):
+	"""
+	Синхронно генерирует превью для набора NewsImage пулом потоков.
+	Потоки только обрабатывают файлы, флаги thumbnails_ready выставляются одним UPDATE.
+	Возвращает число успешно обработанных изображений.
+	"""
+	if Image is None:
+		return 0
+	images = [img for img in images if force or not img.thumbnails_ready]
+	if not images:
+		return 0
+	workers = workers or settings.THUMBNAIL_WORKERS
+	with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnails') as executor:
+		results = executor.map(lambda img: build_variants(img.id, img.image_url), images)
+		ready_ids = [img.id for img, ok in zip(images, results) if ok]
+	if ready_ids:
+		type(images[0]).objects.filter(pk__in=ready_ids).update(thumbnails_ready=True)
+		ready = set(ready_ids)
+		for post_id in {img.news_post_id for img in images if img.id in ready}:
+			bump_post_version(post_id)
+	return len(ready_ids)
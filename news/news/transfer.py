@@ -0,0 +1,261 @@
+"""
+Перенос новостей между окружениями (команды export_news и import_news).
+
+Формат — JSON Lines или CSV, в том числе сжатые (.gz). Одна запись — новость вместе
+с URL её изображений и лайками; автор и лайкнувшие указываются по username. В JSON Lines
+перед новостями идут записи пользователей (без паролей и прав доступа), в CSV
+недостающие пользователи создаются по username.
+
+Экспорт читает БД через iterator(chunk_size) с prefetch по пачкам, импорт пишет пачками
+в отдельных транзакциях, поэтому память ограничена размером пачки, а не объёмом данных.
+"""
+import csv
+import datetime
+import gzip
+import json
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.db.models.constants import OnConflict
+from django.utils.dateparse import parse_datetime
+
+from . import search
+from .caching import forget_user_post_ids
+from .models import News_post, NewsImage, Like
+
+FORMATS = ('jsonl', 'csv')
+CHUNK_SIZE = 2000
+# SQLite ограничивает число параметров в одном запросе
+LOOKUP_BATCH = 900
+POST_FIELDS = ('title', 'short_description', 'text', 'pub_date', 'image', 'source_url', 'is_approved', 'is_from_internet')
+BOOLEAN_FIELDS = ('is_approved', 'is_from_internet')
+USER_FIELDS = ('username', 'email', 'first_name', 'last_name', 'date_joined')
+CSV_COLUMNS = ('author', *POST_FIELDS, 'images', 'likes')
+
+
+class TransferError(Exception):
+	pass
+
+
+class _Encoder(DjangoJSONEncoder):
+	# DjangoJSONEncoder обрезает время до миллисекунд, а даты лайков нужны точные
+	def default(self, o):
+		if isinstance(o, datetime.datetime):
+			return o.isoformat()
+		return super().default(o)
+
+
+def detect_format(path):
+	return 'csv' if path.removesuffix('.gz').endswith('.csv') else 'jsonl'
+
+
+def open_file(path, mode):
+	"""Текстовый файл в UTF-8; .gz сжимается и распаковывается на лету"""
+	if path.endswith('.gz'):
+		return gzip.open(path, f'{mode}t', encoding='utf-8', newline='')
+	return open(path, mode, encoding='utf-8', newline='')
+
+
+# --- Экспорт -------------------------------------------------------------------
+
+def user_records():
+	for user in User.objects.order_by('id').values(*USER_FIELDS).iterator(chunk_size=CHUNK_SIZE):
+		yield {'type': 'user', **user}
+
+
+def post_records(approved_only=False):
+	posts = News_post.objects.select_related('author').only(*POST_FIELDS, 'author__username').order_by('id')
+	if approved_only:
+		posts = posts.filter(is_approved=True)
+	posts = posts.prefetch_related(
+		Prefetch('images', queryset=NewsImage.objects.only('news_post', 'image_url')),
+		Prefetch('like_set', queryset=Like.objects.select_related('user').only('news_post', 'created_at', 'user__username').order_by('id')),
+	)
+	# iterator(chunk_size) выполняет prefetch для каждой пачки отдельно
+	for post in posts.iterator(chunk_size=CHUNK_SIZE):
+		yield {
+			'type': 'post',
+			'author': post.author.username,
+			**{field: getattr(post, field) for field in POST_FIELDS},
+			'images': [image.image_url for image in post.images.all()],
+			'likes': [[like.user.username, like.created_at] for like in post.like_set.all()],
+		}
+
+
+def write_records(f, fmt, records):
+	"""Пишет записи в файл; в CSV попадают только новости. Возвращает число записанных новостей."""
+	count = 0
+	if fmt == 'csv':
+		writer = csv.DictWriter(f, CSV_COLUMNS, extrasaction='ignore')
+		writer.writeheader()
+	for record in records:
+		if fmt == 'jsonl':
+			f.write(json.dumps(record, ensure_ascii=False, cls=_Encoder) + '\n')
+		elif record['type'] == 'post':
+			writer.writerow({
+				**record,
+				'pub_date': record['pub_date'].isoformat(),
+				'images': json.dumps(record['images']),
+				'likes': json.dumps(record['likes'], cls=_Encoder, ensure_ascii=False),
+			})
+		count += record['type'] == 'post'
+	return count
+
+
+# --- Импорт ----------------------------------------------------------------------
+
+def read_records(f, fmt):
+	"""Записи файла по одной, в том же виде, что отдаёт экспорт (даты — строками ISO)"""
+	if fmt == 'jsonl':
+		for line_no, line in enumerate(f, 1):
+			if not line.strip():
+				continue
+			try:
+				yield json.loads(line)
+			except ValueError as e:
+				raise TransferError(f'Строка {line_no}: некорректный JSON ({e})')
+		return
+	# Текст новости может быть длиннее стандартного предела поля CSV (128 КБ)
+	csv.field_size_limit(2 ** 31 - 1)
+	for row in csv.DictReader(f):
+		yield {
+			**row,
+			'type': 'post',
+			'image': row['image'] or None,
+			'source_url': row['source_url'] or None,
+			**{field: row[field] in ('True', 'true', '1') for field in BOOLEAN_FIELDS},
+			'images': json.loads(row['images'] or '[]'),
+			'likes': json.loads(row['likes'] or '[]'),
+		}
+
+
+def batches(records, size):
+	while batch := list(islice(records, size)):
+		yield batch
+
+
+class Importer:
+	"""Импортирует пачки записей; каждая пачка — одна транзакция"""
+
+	def __init__(self, index_search=True):
+		self.index_search = index_search
+		self.posts = self.images = self.likes = self.users = 0
+
+	def import_batch(self, records):
+		users = [record for record in records if record['type'] == 'user']
+		posts = [record for record in records if record['type'] == 'post']
+		with transaction.atomic():
+			if users:
+				self._create_users(users)
+			if posts:
+				self._import_posts(posts)
+
+	def _create_users(self, records):
+		existing = self._user_ids(record['username'] for record in records)
+		new = []
+		for record in records:
+			if record['username'] in existing:
+				continue
+			user = User(**{field: record[field] for field in USER_FIELDS if record.get(field) is not None})
+			if isinstance(user.date_joined, str):
+				user.date_joined = _datetime(user.date_joined)
+			user.set_unusable_password()
+			new.append(user)
+		User.objects.bulk_create(new, batch_size=LOOKUP_BATCH)
+		self.users += len(new)
+
+	@staticmethod
+	def _user_ids(usernames):
+		usernames = list(set(usernames))
+		ids = {}
+		for start in range(0, len(usernames), LOOKUP_BATCH):
+			ids.update(User.objects.filter(username__in=usernames[start:start + LOOKUP_BATCH]).values_list('username', 'id'))
+		return ids
+
+	def _resolve_users(self, usernames):
+		"""id пользователей по username; отсутствующие создаются без пароля"""
+		ids = self._user_ids(usernames)
+		missing = set(usernames) - set(ids)
+		if missing:
+			self._create_users([{'username': username} for username in missing])
+			ids.update(self._user_ids(missing))
+		return ids
+
+	def _import_posts(self, records):
+		user_ids = self._resolve_users(
+			{record['author'] for record in records}
+			| {username for record in records for username, _ in record['likes']}
+		)
+		posts = News_post.objects.bulk_create([
+			News_post(
+				author_id=user_ids[record['author']],
+				like_count=len({username for username, _ in record['likes']}),
+				**_post_fields(record),
+			)
+			for record in records
+		], batch_size=LOOKUP_BATCH)
+		if posts and posts[0].pk is None:
+			raise TransferError('СУБД не возвращает id из bulk_create (нужны SQLite 3.35+ или PostgreSQL)')
+
+		images = NewsImage.objects.bulk_create([
+			NewsImage(news_post=post, image_url=url)
+			for post, record in zip(posts, records)
+			for url in record['images']
+		], batch_size=LOOKUP_BATCH)
+		likes = [
+			(user_ids[username], post.pk, _datetime(liked_at))
+			for post, record in zip(posts, records)
+			for username, liked_at in record['likes']
+		]
+		self._insert_likes(likes)
+
+		if self.index_search:
+			for post in posts:
+				if post.is_approved:
+					search.index_post(post.pk, post.title, post.short_description, post.text)
+		self.posts += len(posts)
+		self.images += len(images)
+		self.likes += len(likes)
+
+	@staticmethod
+	def _insert_likes(rows):
+		"""
+		Лайки вставляются через executemany, а не bulk_create: auto_now_add
+		у created_at затёр бы исходные даты, а по ним считается рейтинг «в тренде».
+		Сигналы Like при этом не срабатывают, поэтому кэш лайков пользователей сбрасывается здесь.
+		"""
+		if not rows:
+			return
+		forget_user_post_ids(*{user_id for user_id, _, _ in rows})
+		meta = Like._meta
+		qn = connection.ops.quote_name
+		columns = ', '.join(qn(meta.get_field(name).column) for name in ('user', 'news_post', 'created_at'))
+		field = meta.get_field('created_at')
+		insert = connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)
+		suffix = connection.ops.on_conflict_suffix_sql([], OnConflict.IGNORE, [], [])
+		with connection.cursor() as cursor:
+			cursor.executemany(
+				f'{insert} {qn(meta.db_table)} ({columns}) VALUES (%s, %s, %s) {suffix}',
+				[(user_id, post_id, field.get_db_prep_save(liked_at, connection)) for user_id, post_id, liked_at in rows],
+			)
+
+
+def _post_fields(record):
+	try:
+		fields = {field: record[field] for field in POST_FIELDS}
+	except KeyError as e:
+		raise TransferError(f'В записи новости нет поля {e}')
+	fields['pub_date'] = _datetime(fields['pub_date'])
+	return fields
+
+
+def _datetime(value):
+	if isinstance(value, str):
+		parsed = parse_datetime(value)
+		if parsed is None:
+			raise TransferError(f'Некорректная дата: {value!r}')
+		return parsed
+	return value
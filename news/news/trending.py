@@ -0,0 +1,149 @@
+"""
+Рейтинг «в тренде»: число лайков с экспоненциальным затуханием (период полураспада
+TRENDING_HALF_LIFE_HOURS).
+
+Затухание не пересчитывается для всех новостей: вес лайка — exp(λ·(t - epoch)),
+то есть более свежие лайки весят экспоненциально больше. Все рейтинги «стареют»
+с одной скоростью, поэтому порядок по сумме весов совпадает с порядком по затухающему
+числу лайков в любой момент времени.
+
+Сигналы Like пишут события в NewsRankingEvent, refresh() переносит их в NewsRanking —
+стоимость пропорциональна числу новых лайков. Чтобы веса не переполнили float,
+точка отсчёта раз в TRENDING_REBASE_DAYS сдвигается, а рейтинги домножаются на
+общий множитель (один UPDATE по таблице рейтинга).
+"""
+import logging
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .jobs import submit
+from .models import Like, News_post, NewsRanking, NewsRankingEvent, NewsRankingState
+
+logger = logging.getLogger(__name__)
+
+REFRESH_LOCK_KEY = 'news:trending:refresh'
+EVENTS_BATCH = 5000
+# Рейтинги ниже порога удаляются: это новости без лайков за последние ~40 периодов полураспада
+MIN_SCORE = 1e-12
+
+
+def decay_rate():
+	return math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+
+
+def weight(liked_at, epoch):
+	return math.exp((liked_at - epoch).total_seconds() * decay_rate())
+
+
+def record(news_post_id, liked_at, delta):
+	"""Записывает поставленный (delta=1) или снятый (delta=-1) лайк для следующего refresh()"""
+	NewsRankingEvent.objects.create(news_post_id=news_post_id, liked_at=liked_at, delta=delta)
+
+
+def record_unlike(news_post_id, liked_at):
+	"""Снятый лайк; вызывается после коммита, новость к этому времени могла быть удалена"""
+	if News_post.objects.filter(pk=news_post_id).exists():
+		record(news_post_id, liked_at, -1)
+
+
+def _state():
+	state = NewsRankingState.objects.select_for_update().filter(pk=1).first()
+	if state is None:
+		state = NewsRankingState.objects.create(pk=1, epoch=timezone.now())
+	return state
+
+
+def _rebase(state, now):
+	factor = math.exp(-(now - state.epoch).total_seconds() * decay_rate())
+	NewsRanking.objects.update(score=F('score') * factor)
+	NewsRanking.objects.filter(score__lt=MIN_SCORE).delete()
+	state.epoch = now
+
+
+def _apply(scores):
+	rankings = NewsRanking.objects.in_bulk(list(scores))
+	new = []
+	for post_id, score in scores.items():
+		ranking = rankings.get(post_id)
+		if ranking is None:
+			new.append(NewsRanking(news_post_id=post_id, score=max(score, 0.0)))
+		else:
+			ranking.score = max(ranking.score + score, 0.0)
+	NewsRanking.objects.bulk_update(list(rankings.values()), ['score'])
+	NewsRanking.objects.bulk_create(new)
+	NewsRanking.objects.filter(news_post_id__in=list(scores), score__lt=MIN_SCORE).delete()
+
+
+def refresh():
+	"""Переносит накопленные события лайков в рейтинг. Возвращает число обработанных событий."""
+	now = timezone.now()
+	processed = 0
+	with transaction.atomic():
+		state = _state()
+		if now - state.epoch > timedelta(days=settings.TRENDING_REBASE_DAYS):
+			_rebase(state, now)
+		while True:
+			events = list(
+				NewsRankingEvent.objects.order_by('id').values_list('id', 'news_post_id', 'liked_at', 'delta')[:EVENTS_BATCH]
+			)
+			if not events:
+				break
+			scores = defaultdict(float)
+			for _, post_id, liked_at, delta in events:
+				scores[post_id] += delta * weight(liked_at, state.epoch)
+			_apply(scores)
+			# Только прочитанные: на PostgreSQL параллельная транзакция может закоммитить меньший id позже
+			NewsRankingEvent.objects.filter(id__in=[event[0] for event in events]).delete()
+			processed += len(events)
+		state.refreshed_at = now
+		state.save()
+	return processed
+
+
+def rebuild():
+	"""Полный пересчёт по таблице Like — после массового импорта в обход сигналов"""
+	now = timezone.now()
+	# Лайки старше порога дали бы рейтинг меньше MIN_SCORE
+	since = now - timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS * math.log2(1 / MIN_SCORE))
+	with transaction.atomic():
+		state = _state()
+		state.epoch = now
+		NewsRanking.objects.all().delete()
+		NewsRankingEvent.objects.all().delete()
+		scores = defaultdict(float)
+		for post_id, liked_at in Like.objects.filter(created_at__gte=since).values_list('news_post_id', 'created_at').iterator(chunk_size=EVENTS_BATCH):
+			scores[post_id] += weight(liked_at, now)
+		NewsRanking.objects.bulk_create(
+			[NewsRanking(news_post_id=post_id, score=score) for post_id, score in scores.items()],
+			batch_size=EVENTS_BATCH,
+		)
+		state.refreshed_at = now
+		state.save()
+	return len(scores)
+
+
+def _refresh_in_background():
+	try:
+		refresh()
+	except Exception:
+		logger.exception('Не удалось пересчитать рейтинг новостей')
+	finally:
+		close_old_connections()
+
+
+def schedule_refresh():
+	"""Запускает refresh() в фоне не чаще раза в TRENDING_REFRESH_INTERVAL секунд"""
+	if cache.add(REFRESH_LOCK_KEY, 1, settings.TRENDING_REFRESH_INTERVAL):
+		transaction.on_commit(lambda: submit(_refresh_in_background))
+
+
+def trending(queryset, limit):
+	"""Новости из queryset в порядке рейтинга; один запрос по индексу newsranking_score_idx"""
+	return list(queryset.filter(ranking__score__gt=0).order_by('-ranking__score')[:limit])
@@ -7,6 +7,13 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('page2/', views.page2, name='page2'),
     path('news/', views.news_home, name='news_home'),
+    path('news/page.json', views.news_feed_json, name='news_feed_json'),
+    # Ленты для партнёров (news.syndication)
+    path('news/rss.xml', views.news_rss, name='news_rss'),
+    path('news/atom.xml', views.news_atom, name='news_atom'),
+    path('news/feed.json', views.news_json_feed, name='news_json_feed'),
+    path('news/search/', views.news_search, name='news_search'),
+    path('news/trending/', views.news_trending, name='news_trending'),
     path('news/<int:news_id>/', views.news_detail, name='news_detail'),
     
     # Лайки
@@ -14,10 +21,13 @@ urlpatterns = [
     path('news/<int:news_id>/favorite/', views.toggle_favorite, name='toggle_favorite'),
     # Прокси изображений
     path('image-proxy/', views.image_proxy, name='image_proxy'),
+    path('thumbs/<int:image_id>/<int:width>.<str:fmt>', views.news_thumbnail, name='news_thumbnail'),
+    path('metrics/', views.metrics, name='metrics'),
     
     # Админ-функции для загрузки новостей
     path('admin-panel/load-news/', views.admin_load_news, name='admin_load_news'),
     path('admin-panel/pending-news/', views.admin_pending_news, name='admin_pending_news'),
+    path('admin-panel/pending-news/bulk/', views.admin_bulk_moderate, name='admin_bulk_moderate'),
     path('admin-panel/approve-news/<int:news_id>/', views.admin_approve_news, name='admin_approve_news'),
     
     # Аутентификация
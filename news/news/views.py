@@ -3,40 +3,117 @@ from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest
+from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest, FileResponse, Http404
 from django.views.decorators.http import require_POST
-from django.views.decorators.csrf import ensure_csrf_cookie
+from django.middleware.csrf import get_token
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.template.loader import render_to_string
+from django.core.paginator import Paginator
+from django.utils.cache import get_conditional_response
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from datetime import datetime
-import requests
-from .models import News_post, Like, PendingNews, Favorite
+import hmac
+from urllib.parse import urlparse
+from .models import News_post, Like, PendingNews, Favorite, NewsImage, NewsLoadJob
 from .forms import CustomUserCreationForm, NewsApprovalForm, LoadNewsForm
-from .services import NewsScrapingService
+from .jobs import enqueue_load_news
+from .moderation import approve_pending_news, reject_pending_news
+from .pagination import keyset_page, InvalidCursor
+from .image_cache import aget_image, get_image, ImageFetchError
+from .thumbnails import schedule_thumbnails, variant_path, FORMATS as THUMBNAIL_FORMATS
+from .search import search_posts
+from . import syndication, trending
+from .caching import cache_anonymous_page, attach_cache_versions, feed_version, post_version
+from .metrics import registry as metrics_registry
 
 # Create your views here.
 
-@ensure_csrf_cookie
+NEWS_PAGE_SIZE = 20
+TRENDING_PAGE_SIZE = 30
+PENDING_PAGE_SIZE = 50
+
+def _news_feed_queryset():
+	# Лайки и избранное пользователя проверяются по user_post_ids, а не подзапросами
+	return (
+		News_post.objects.filter(is_approved=True)
+		.select_related('author')
+		.prefetch_related('images')
+	)
+
+@cache_anonymous_page(settings.CACHE_FEED_TIMEOUT, version=lambda request: feed_version())
 def news_home(request):
-	news = News_post.objects.filter(is_approved=True).prefetch_related('images').order_by('-pub_date')
-	return render(request, 'news_home.html', {'news': news})
+	if request.user.is_authenticated:
+		# CSRF cookie нужен только для AJAX лайков/избранного; анонимная страница кэшируется без него
+		get_token(request)
+	try:
+		news, next_cursor = keyset_page(_news_feed_queryset(), request.GET.get('after'), NEWS_PAGE_SIZE)
+	except InvalidCursor:
+		return HttpResponseBadRequest('Invalid cursor')
+	attach_cache_versions(news)
+	return render(request, 'news_home.html', {'news': news, 'next_cursor': next_cursor})
 
-def news_detail(request, news_id):
-	post = get_object_or_404(News_post.objects.prefetch_related('images'), id=news_id, is_approved=True)
-	is_liked = False
-	is_favorited = False
+def news_trending(request):
+	"""В тренде (затухающий со временем рейтинг лайков) и самые популярные за всё время"""
 	if request.user.is_authenticated:
-		is_liked = Like.objects.filter(user=request.user, news_post=post).exists()
-		is_favorited = Favorite.objects.filter(user=request.user, news_post=post).exists()
+		get_token(request)
+	trending.schedule_refresh()
+	tab = 'top' if request.GET.get('sort') == 'top' else 'trending'
+	posts = _news_feed_queryset()
+	if tab == 'top':
+		news = list(posts.order_by('-like_count', '-id')[:TRENDING_PAGE_SIZE])
+	else:
+		news = trending.trending(posts, TRENDING_PAGE_SIZE)
+	attach_cache_versions(news)
+	return render(request, 'news_trending.html', {'news': news, 'tab': tab})
+
+def news_feed_json(request):
+	"""Следующая страница ленты для бесконечной прокрутки: HTML карточек и курсор"""
+	try:
+		news, next_cursor = keyset_page(_news_feed_queryset(), request.GET.get('after'), NEWS_PAGE_SIZE)
+	except InvalidCursor:
+		return HttpResponseBadRequest('Invalid cursor')
+	attach_cache_versions(news)
+	html = render_to_string('includes/news_cards.html', {'news': news}, request=request)
+	return JsonResponse({'html': html, 'next': next_cursor})
+
+def news_rss(request):
+	return syndication.feed_response(request, 'rss')
+
+def news_atom(request):
+	return syndication.feed_response(request, 'atom')
+
+def news_json_feed(request):
+	"""Лента в формате JSON Feed 1.1 (не путать с news_feed_json для бесконечной прокрутки)"""
+	return syndication.feed_response(request, 'json')
+
+@cache_anonymous_page(settings.CACHE_PAGE_TIMEOUT, version=lambda request, news_id: post_version(news_id))
+def news_detail(request, news_id):
+	post = get_object_or_404(
+		News_post.objects.select_related('author').prefetch_related('images'),
+		id=news_id, is_approved=True
+	)
 	context = {
 		'post': post,
-		'is_liked': is_liked,
-		'is_favorited': is_favorited,
+		'is_liked': post.is_liked_by(request.user),
+		'is_favorited': post.is_favorited_by(request.user),
 	}
 	return render(request, 'news_detail.html', context)
 
+def news_search(request):
+	"""Полнотекстовый поиск по одобренным новостям"""
+	query = request.GET.get('q', '').strip()
+	posts = search_posts(News_post.objects.filter(is_approved=True).select_related('author'), query)
+	return render(request, 'search.html', {'query': query, 'news': posts})
+
+@cache_anonymous_page(settings.CACHE_PAGE_TIMEOUT)
 def home(request):
 	return render(request, 'home.html')
 
+@cache_anonymous_page(settings.CACHE_PAGE_TIMEOUT)
 def page2(request):
 	return render(request, 'page2.html')
 
@@ -59,24 +136,23 @@ def profile(request):
 @login_required
 @require_POST
 def toggle_like(request, news_id):
-	news_post = get_object_or_404(News_post, id=news_id)
-	
-	# Проверяем, лайкнул ли пользователь уже эту новость
-	like, created = Like.objects.get_or_create(
-		user=request.user,
-		news_post=news_post
-	)
+	news_post = get_object_or_404(News_post.objects.only('id'), id=news_id)
 	
-	if not created:
-		# Если лайк уже был, удаляем его (убираем лайк)
-		like.delete()
-		
-	# Пересчитываем факт лайка для надежности
-	liked = Like.objects.filter(user=request.user, news_post=news_post).exists()
+	# Если лайк уже был, удаляем его (убираем лайк), иначе ставим.
+	# Счётчик like_count обновляется атомарно сигналами Like через F()
+	with transaction.atomic():
+		deleted, _ = Like.objects.filter(user=request.user, news_post=news_post).delete()
+		liked = not deleted
+		if liked:
+			try:
+				with transaction.atomic():
+					Like.objects.create(user=request.user, news_post=news_post)
+			except IntegrityError:
+				# Параллельный запрос уже поставил лайк
+				pass
 	
 	# Возвращаем JSON ответ для AJAX
-	from .models import Like as LikeModel
-	total = LikeModel.objects.filter(news_post=news_post).count()
+	total = News_post.objects.filter(pk=news_post.pk).values_list('like_count', flat=True).get()
 	return JsonResponse({
 		'liked': liked,
 		'total_likes': total
@@ -96,33 +172,99 @@ def toggle_favorite(request, news_id):
 
 @login_required
 def favorites_list(request):
-	posts = News_post.objects.filter(favorited_by__user=request.user, is_approved=True).prefetch_related('images').order_by('-pub_date')
-	return render(request, 'favorites.html', {'news': posts})
+	posts = (
+		News_post.objects.filter(favorited_by__user=request.user, is_approved=True)
+		.prefetch_related('images')
+	)
+	try:
+		posts, next_cursor = keyset_page(posts, request.GET.get('after'), NEWS_PAGE_SIZE)
+	except InvalidCursor:
+		return HttpResponseBadRequest('Invalid cursor')
+	return render(request, 'favorites.html', {'news': posts, 'next_cursor': next_cursor})
+
+async def _fetch_image(request, url):
+	if isinstance(request, ASGIRequest):
+		return await aget_image(url)
+	# Под WSGI у каждого вызова свой event loop — пул соединений httpx не переживал бы запрос
+	return await sync_to_async(get_image, thread_sensitive=False)(url)
 
-def image_proxy(request):
-	"""Прокси для безопасной загрузки внешних изображений по URL."""
+async def image_proxy(request):
+	"""
+	Прокси для безопасной загрузки внешних изображений по URL (с дисковым кэшем).
+	Асинхронный: под ASGI ожидание медленного источника не занимает поток воркера.
+	"""
 	url = request.GET.get('url')
 	if not url:
 		return HttpResponseBadRequest('Missing url')
+	if urlparse(url).scheme not in ('http', 'https'):
+		return HttpResponseBadRequest('Unsupported url')
 	try:
-		headers = {
-			'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0 Safari/537.36',
-			'Accept': 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8',
-			'Referer': 'https://example.com/'
-		}
-		resp = requests.get(url, headers=headers, timeout=10)
-		if resp.status_code != 200 or not resp.content:
-			raise ValueError('bad status')
-		content_type = resp.headers.get('Content-Type', 'image/jpeg')
-		return HttpResponse(resp.content, content_type=content_type)
-	except Exception:
+		image = await _fetch_image(request, url)
+		cache_control = f'public, max-age={settings.IMAGE_PROXY_TTL}'
+		not_modified = get_conditional_response(request, etag=image.etag)
+		if not_modified is not None:
+			not_modified['ETag'] = image.etag
+			not_modified['Cache-Control'] = cache_control
+			return not_modified
+		try:
+			body = open(image.path, 'rb')
+		except FileNotFoundError:
+			# Файл вытеснен из кэша (evict) между поиском и открытием — загружаем заново
+			image = await _fetch_image(request, url)
+			body = open(image.path, 'rb')
+	except (ImageFetchError, FileNotFoundError):
 		placeholder_svg = (
 			"<svg xmlns='http://www.w3.org/2000/svg' width='600' height='250'>"
 			"<rect fill='#e9ecef' width='100%' height='100%'/>"
 			"<text x='50%' y='50%' dominant-baseline='middle' text-anchor='middle' fill='#6c757d' font-size='24'>Нет изображения</text>"
 			"</svg>"
 		)
-		return HttpResponse(placeholder_svg, content_type='image/svg+xml')
+		response = HttpResponse(placeholder_svg, content_type='image/svg+xml')
+		# Недолго: источник может ожить
+		response['Cache-Control'] = 'public, max-age=300'
+		return response
+
+	response = FileResponse(body, content_type=image.content_type)
+	response['Content-Length'] = image.size
+	response['ETag'] = image.etag
+	response['Cache-Control'] = cache_control
+	return response
+
+def news_thumbnail(request, image_id, width, fmt):
+	"""Превью изображения из MEDIA_ROOT (см. news.thumbnails); не зависит от раздачи /media/"""
+	if fmt not in THUMBNAIL_FORMATS or width not in settings.THUMBNAIL_WIDTHS:
+		raise Http404
+	path = variant_path(image_id, width, fmt)
+	try:
+		size = default_storage.size(path)
+		modified = default_storage.get_modified_time(path)
+	except (FileNotFoundError, NotImplementedError):
+		raise Http404
+	etag = f'"{size:x}-{int(modified.timestamp()):x}"'
+	# Превью перестраиваются только generate_thumbnails --force, поэтому кэшируются надолго
+	cache_control = f'public, max-age={settings.IMAGE_PROXY_TTL}'
+	not_modified = get_conditional_response(request, etag=etag)
+	if not_modified is not None:
+		not_modified['ETag'] = etag
+		not_modified['Cache-Control'] = cache_control
+		return not_modified
+
+	response = FileResponse(default_storage.open(path, 'rb'), content_type='image/webp' if fmt == 'webp' else 'image/jpeg')
+	response['Content-Length'] = size
+	response['ETag'] = etag
+	response['Cache-Control'] = cache_control
+	return response
+
+def metrics(request):
+	"""Метрики запросов в текстовом формате Prometheus (по токену METRICS_TOKEN или для staff)"""
+	token = settings.METRICS_TOKEN
+	bearer = request.headers.get('Authorization', '').removeprefix('Bearer ')
+	authorized = settings.DEBUG or request.user.is_staff or bool(token) and hmac.compare_digest(bearer, token)
+	if not authorized:
+		return HttpResponse('Forbidden', status=403, content_type='text/plain')
+	response = HttpResponse(metrics_registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+	response['Cache-Control'] = 'no-store'
+	return response
 
 @staff_member_required
 def admin_load_news(request):
@@ -130,18 +272,17 @@ def admin_load_news(request):
 	if request.method == 'POST':
 		form = LoadNewsForm(request.POST)
 		if form.is_valid():
-			count = form.cleaned_data['count']
-			scraping_service = NewsScrapingService()
-			
-			try:
-				loaded_news = scraping_service.load_news_batch(request.user, count)
-				messages.success(
-					request, 
-					f'Успешно загружено {len(loaded_news)} новостей для модерации!'
-				)
-			except Exception as e:
-				messages.error(request, f'Ошибка при загрузке новостей: {e}')
-			
+			# Загрузка идёт в фоне, чтобы сотни новостей не упирались в таймаут запроса
+			job = NewsLoadJob.objects.create(
+				created_by=request.user,
+				count=form.cleaned_data['count'],
+				urls=form.cleaned_data['urls'],
+			)
+			enqueue_load_news(job)
+			messages.success(
+				request,
+				f'Загрузка #{job.id} запущена. Новости появятся в списке модерации по мере обработки.'
+			)
 			return redirect('admin_pending_news')
 	else:
 		form = LoadNewsForm()
@@ -151,8 +292,32 @@ def admin_load_news(request):
 @staff_member_required 
 def admin_pending_news(request):
 	"""Список новостей на модерации"""
-	pending_news = PendingNews.objects.filter(is_processed=False).order_by('-created_at')
-	return render(request, 'admin/pending_news.html', {'pending_news': pending_news})
+	pending_news = PendingNews.objects.filter(is_processed=False).select_related('created_by').order_by('-created_at')
+	page = Paginator(pending_news, PENDING_PAGE_SIZE).get_page(request.GET.get('page'))
+	load_jobs = NewsLoadJob.objects.select_related('created_by')[:5]
+	return render(request, 'admin/pending_news.html', {
+		'pending_news': page.object_list,
+		'page_obj': page,
+		'load_jobs': load_jobs,
+	})
+
+@staff_member_required
+@require_POST
+def admin_bulk_moderate(request):
+	"""Массовое одобрение/отклонение выбранных новостей на модерации"""
+	ids = [int(i) for i in request.POST.getlist('ids') if i.isdigit()]
+	action = request.POST.get('action')
+	if not ids:
+		messages.warning(request, 'Не выбрано ни одной новости.')
+	elif action == 'approve':
+		posts = approve_pending_news(ids, request.user)
+		messages.success(request, f'Опубликовано новостей: {len(posts)}')
+	elif action == 'reject':
+		rejected = reject_pending_news(ids)
+		messages.info(request, f'Отклонено новостей: {rejected}')
+	else:
+		return HttpResponseBadRequest('Unknown action')
+	return redirect('admin_pending_news')
 
 @staff_member_required
 def admin_approve_news(request, news_id):
@@ -178,6 +343,9 @@ def admin_approve_news(request, news_id):
 				# Сохраняем URL изображения (если отсутствует — подставим плейсхолдер)
 				news_post.image = pending_news.image_url or ''
 				news_post.save(update_fields=['image'])
+				if pending_news.image_url:
+					news_image = NewsImage.objects.create(news_post=news_post, image_url=pending_news.image_url)
+					schedule_thumbnails([news_image])
 				
 				messages.success(request, f'Новость "{news_post.title}" успешно опубликована!')
 			else:
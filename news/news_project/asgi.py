@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'news_project.settings')
 
 application = get_asgi_application()
+
+# Фоновые задачи живут в памяти процесса: прерванные прошлым запуском помечаются ошибкой
+from news.jobs import on_server_start  # noqa: E402
+
+on_server_start()
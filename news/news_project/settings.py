@@ -44,7 +44,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise с асинхронной веткой: под ASGI запросы не уходят в поток sync_to_async
+    'news.middleware.AsyncWhiteNoiseMiddleware',
+    # После WhiteNoise, чтобы статика не попадала в метрики
+    'news.metrics.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -57,7 +60,8 @@ ROOT_URLCONF = 'news_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Бэкенд DjangoTemplates с замером времени рендера (news.metrics)
+        'BACKEND': 'news.metrics.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -76,22 +80,107 @@ WSGI_APPLICATION = 'news_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite: WAL (чтение не ждёт записи), synchronous=NORMAL (fsync только при checkpoint WAL),
+# ожидание занятой записи до DB_BUSY_TIMEOUT секунд вместо «database is locked» и BEGIN IMMEDIATE
+# (см. news.backends.sqlite3).
+DB_BUSY_TIMEOUT = float(os.getenv('DB_BUSY_TIMEOUT', 20))
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'news.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': DB_BUSY_TIMEOUT,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA temp_store=MEMORY;'
+                'PRAGMA cache_size=-20000;'
+            ),
+        },
     }
 }
 
-# Optional: override database from DATABASE_URL (e.g., Postgres)
+# Postgres и другие СУБД из DATABASE_URL (нужен пакет dj-database-url).
+# Соединения живут DB_CONN_MAX_AGE секунд и проверяются перед повторным использованием
+# (CONN_HEALTH_CHECKS), поэтому после рестарта СУБД запросы не падают на мёртвом соединении.
+# В Django 5.1+ с psycopg 3 вместо постоянных соединений включается пул psycopg_pool
+# (DB_POOL_MIN_SIZE/DB_POOL_MAX_SIZE на процесс). Под ASGI или с несколькими сотнями
+# воркеров держите DB_CONN_MAX_AGE=0 и ставьте перед Postgres PgBouncer.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 600))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 30000))
 _db_url = os.getenv('DATABASE_URL')
 if _db_url:
     try:
         import dj_database_url  # type: ignore
-        DATABASES['default'] = dj_database_url.parse(_db_url, conn_max_age=600)
+        DATABASES['default'] = dj_database_url.parse(_db_url, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=True)
     except Exception:
         # Fallback: keep sqlite if parser not available
         pass
+    else:
+        if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+            _pg_options = DATABASES['default'].setdefault('OPTIONS', {})
+            _pg_options.setdefault('connect_timeout', 5)
+            # Зависший запрос не держит соединение воркера дольше лимита
+            _pg_options.setdefault('options', f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}')
+            import django
+            if django.VERSION >= (5, 1) and os.getenv('DB_POOL', 'True').lower() == 'true':
+                _pg_options['pool'] = {
+                    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                    # Сколько ждать свободного соединения, секунды
+                    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+                }
+                # С пулом соединения возвращаются в пул после запроса, CONN_MAX_AGE должен быть 0
+                DATABASES['default']['CONN_MAX_AGE'] = 0
+
+
+# Cache
+# CACHE_BACKEND: locmem (по умолчанию, кэш на процесс), file или redis (Redis и совместимые серверы).
+# При нескольких воркерах нужен общий бэкенд, иначе инвалидация видна только своему процессу.
+_cache_backend = os.getenv('CACHE_BACKEND', 'locmem')
+if _cache_backend == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        }
+    }
+elif _cache_backend == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', BASE_DIR / 'cache'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'news',
+        }
+    }
+
+# Время жизни кэша страниц для анонимных посетителей (news.caching), секунды.
+# Лента короче: в ней счётчики лайков, которые не сбрасывают её кэш.
+CACHE_PAGE_TIMEOUT = int(os.getenv('CACHE_PAGE_TIMEOUT', 300))
+CACHE_FEED_TIMEOUT = int(os.getenv('CACHE_FEED_TIMEOUT', 60))
+
+# Сессии и пользователь из кэша (news.auth, news.caching.user_post_ids).
+# cached_db читает сессию из кэша, а пишет и в кэш, и в БД, поэтому при потере кэша
+# сессии не пропадают. С locmem у каждого воркера свой кэш: выход или смена пароля
+# на одном воркере не были бы видны другим, поэтому там по умолчанию всё читается из БД.
+SESSION_ENGINE = os.getenv(
+    'SESSION_ENGINE',
+    'django.contrib.sessions.backends.db' if _cache_backend == 'locmem' else 'django.contrib.sessions.backends.cached_db',
+)
+# Сколько хранить в кэше пользователя и id его лайков/избранного, секунды; 0 — не кэшировать
+USER_CACHE_TIMEOUT = int(os.getenv('USER_CACHE_TIMEOUT', 0 if _cache_backend == 'locmem' else 300))
+AUTHENTICATION_BACKENDS = [
+    'news.auth.CachedModelBackend',
+    # Для сессий, созданных до перехода на CachedModelBackend
+    'django.contrib.auth.backends.ModelBackend',
+]
 
 
 # Password validation
@@ -133,12 +222,49 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Отпечатки в именах файлов и варианты .gz/.br (Brotli — если установлен пакет brotli).
+# Бандлы CSS/JS собирает manage.py build_static (news.assets).
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
 
 # Media files (uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Прокси внешних изображений (news.image_cache)
+IMAGE_PROXY_CACHE_DIR = Path(os.getenv('IMAGE_PROXY_CACHE_DIR', BASE_DIR / 'media' / 'image_cache'))
+IMAGE_PROXY_TTL = int(os.getenv('IMAGE_PROXY_TTL', 7 * 24 * 3600))  # секунды
+IMAGE_PROXY_MAX_BYTES = int(os.getenv('IMAGE_PROXY_MAX_BYTES', 5 * 1024 * 1024))  # на одно изображение
+IMAGE_PROXY_CACHE_MAX_BYTES = int(os.getenv('IMAGE_PROXY_CACHE_MAX_BYTES', 1024 * 1024 * 1024))  # на весь кэш
+IMAGE_PROXY_TIMEOUT = float(os.getenv('IMAGE_PROXY_TIMEOUT', 10))
+# Асинхронная загрузка (ASGI): общий пул соединений и одновременных загрузок с одного хоста
+IMAGE_PROXY_MAX_CONNECTIONS = int(os.getenv('IMAGE_PROXY_MAX_CONNECTIONS', 100))
+IMAGE_PROXY_HOST_CONCURRENCY = int(os.getenv('IMAGE_PROXY_HOST_CONCURRENCY', 6))
+
+# Готовые ленты RSS/Atom/JSON Feed (news.syndication) до следующего изменения новостей
+FEED_EXPORT_CACHE_DIR = Path(os.getenv('FEED_EXPORT_CACHE_DIR', BASE_DIR / 'media' / 'feed_cache'))
+
+# Превью изображений новостей (news.thumbnails)
+THUMBNAIL_WIDTHS = (320, 640, 960)
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 4))
+# Исходники больше этого числа пикселей не декодируются (после уменьшения draft для JPEG)
+THUMBNAIL_MAX_PIXELS = int(os.getenv('THUMBNAIL_MAX_PIXELS', 40_000_000))
+
+# Рейтинг «в тренде» (news.trending): период полураспада веса лайка, как часто
+# пересчитывать рейтинг из новых лайков и как часто сдвигать точку отсчёта весов
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 24))
+TRENDING_REFRESH_INTERVAL = int(os.getenv('TRENDING_REFRESH_INTERVAL', 60))
+TRENDING_REBASE_DAYS = int(os.getenv('TRENDING_REBASE_DAYS', 7))
+
+# Метрики запросов (news.metrics): Server-Timing, /metrics/ и лог медленных запросов.
+# Без METRICS_TOKEN эндпоинт /metrics/ доступен только staff (и всем в DEBUG).
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_SLOW_REQUEST_MS = int(os.getenv('METRICS_SLOW_REQUEST_MS', 500))
+METRICS_SLOW_QUERY_TOP = int(os.getenv('METRICS_SLOW_QUERY_TOP', 5))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Микробенчмарк format_text: прежняя подстановка через re.findall/str.replace
+против скомпилированных шаблонов (CompiledTemplate).
+
+По умолчанию генерирует 50 000 офферов в том виде, в каком их отдает разбор фида;
+с --feed берет офферы из файла YML. Перед замером проверяет, что оба способа
+дают одинаковый текст для каждого оффера.
+
+    python benchmark_format_text.py
+    python benchmark_format_text.py --offers 100000 --repeat 5
+    python benchmark_format_text.py --feed feed.yml
+"""
+
+import argparse
+import random
+import re
+import time
+from typing import Callable, Dict, List
+
+from telegram_story_bot import compile_template, parse_feed_offers
+
+TEMPLATES = {
+    # Шаблоны из config.ini
+    'title': '"category" "модель", "год выпуска"',
+    'text': '"category" "модель", "год выпуска" год. Цена "price" "currencyId"',
+    # Поля в другом регистре и отсутствующее поле — медленный путь прежней реализации
+    'mixed_case': '"Name", "пробег" км, "VIN" "Price" "CURRENCYID"',
+}
+
+
+def legacy_format_text(template: str, data: Dict) -> str:
+    """Прежняя реализация TelegramStoryBot.format_text (без обработки исключений)"""
+    formatted_text = template
+    matches = re.findall(r'"([^"]+)"', template)
+    for field in matches:
+        value = data.get(field, '')
+        if value == '':
+            lower_field = field.lower()
+            for key, val in data.items():
+                if isinstance(key, str) and key.lower() == lower_field:
+                    value = val
+                    break
+        formatted_text = formatted_text.replace(f'"{field}"', str(value))
+    formatted_text = re.sub(r'\s+', ' ', formatted_text)
+    formatted_text = re.sub(r',\s*,', ',', formatted_text)
+    return formatted_text.strip()
+
+
+def compiled_format_text(template: str, data: Dict) -> str:
+    return compile_template(template).render(data)
+
+
+def synthetic_offers(count: int, seed: int = 1) -> List[Dict]:
+    """Офферы с набором ключей, как у разобранного фида дилера"""
+    rnd = random.Random(seed)
+    offers = []
+    for i in range(count):
+        pictures = [f'https://cdn.example.com/img/{i}/{k}.jpg' for k in range(rnd.randint(1, 8))]
+        offer = {
+            'id': str(i),
+            'available': 'true',
+            'url': f'https://example.com/car/{i}',
+            'price': str(rnd.randint(1_000_000, 9_000_000)),
+            'currencyId': 'RUR',
+            'categoryId': str(rnd.randint(1, 59)),
+            'picture': pictures[0],
+            'name': f'Автомобиль {i}',
+            'description': 'Отличное состояние, один владелец. ' * rnd.randint(1, 5),
+            'модель': f'Q{i % 9}',
+            # У части офферов год не заполнен: пустое значение дает ", ," в шаблоне
+            'год выпуска': '' if i % 17 == 0 else str(2015 + i % 10),
+            'Пробег': str(i * 13 % 200000),
+            'category': f'Марка {i % 59}',
+            '_pictures': pictures,
+        }
+        offers.append(offer)
+    return offers
+
+
+def measure(format_text: Callable[[str, Dict], str], template: str, offers: List[Dict], repeat: int) -> float:
+    """Лучшее время из repeat проходов по всем офферам, секунды"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for offer in offers:
+            format_text(template, offer)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Микробенчмарк format_text')
+    parser.add_argument('--offers', type=int, default=50000, help='Число синтетических офферов')
+    parser.add_argument('--feed', help='Взять офферы из файла YML вместо синтетических')
+    parser.add_argument('--repeat', type=int, default=3, help='Проходов на замер (берется лучший)')
+    args = parser.parse_args()
+
+    offers = list(parse_feed_offers(args.feed)) if args.feed else synthetic_offers(args.offers)
+    print(f"Офферов: {len(offers)}, проходов: {args.repeat}")
+    print(f"{'шаблон':<12}{'прежний, оф/с':>16}{'новый, оф/с':>16}{'ускорение':>12}")
+
+    for name, template in TEMPLATES.items():
+        for offer in offers:
+            expected = legacy_format_text(template, offer)
+            actual = compiled_format_text(template, offer)
+            if actual != expected:
+                raise SystemExit(f"Расхождение для оффера {offer.get('id')}: {expected!r} != {actual!r}")
+
+        legacy = measure(legacy_format_text, template, offers, args.repeat)
+        compiled = measure(compiled_format_text, template, offers, args.repeat)
+        print(
+            f"{name:<12}{len(offers) / legacy:>16,.0f}{len(offers) / compiled:>16,.0f}"
+            f"{legacy / compiled:>11.1f}x"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальный кэш изображений офферов и фоновая предзагрузка.
+
+ImageCache хранит файлы по хэшу содержимого (objects/ab/<sha256>), а URL ссылаются
+на них (refs/<sha256 от URL>): одна и та же картинка под разными URL хранится один раз.
+Файлы пишутся через временный файл и os.replace, поэтому кэш можно делить между
+ботом, ботом управления и веб-интерфейсом. При превышении лимита размера удаляются
+давно не использованные файлы (время использования — mtime, обновляется при чтении).
+
+ImagePrefetcher качает картинки в ограниченном пуле потоков через общую сессию
+requests (переиспользует соединения с CDN) и при неудаче первой картинки оффера
+берет следующую: несколько кандидатов качаются параллельно, поэтому запасная
+к этому моменту обычно уже скачана.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# После очистки кэш занимает не больше этой доли лимита, чтобы не чистить его на каждой записи
+EVICT_TO_RATIO = 0.9
+
+
+class ImageCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Размер кэша считается по диску при первой записи и дальше ведется в памяти
+        self._total_bytes: Optional[int] = None
+
+    def _ref_path(self, url: str) -> str:
+        name = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, 'refs', name[:2], name)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, url: str) -> Optional[bytes]:
+        """Изображение по URL или None, если его нет в кэше"""
+        try:
+            with open(self._ref_path(url), 'r', encoding='ascii') as f:
+                digest = f.read().strip()
+            path = self._object_path(digest)
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Отметка использования для LRU
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, url: str, data: bytes):
+        """Сохранение изображения; при превышении лимита удаляются самые старые файлы"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan()[1]
+            if os.path.exists(path):
+                os.utime(path)
+            else:
+                self._write_atomic(path, data)
+                self._total_bytes += len(data)
+            self._write_atomic(self._ref_path(url), digest.encode('ascii'))
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self) -> Tuple[List[Tuple[float, int, str]], int]:
+        """Файлы кэша (mtime, размер, путь) и их общий размер"""
+        files = []
+        objects_dir = os.path.join(self.directory, 'objects')
+        for root, _, names in os.walk(objects_dir):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files, sum(size for _, size, _ in files)
+
+    def _evict(self):
+        # Диск пересканируется: в тот же кэш могут писать другие процессы
+        files, total = self._scan()
+        removed = set()
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes * EVICT_TO_RATIO:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed.add(os.path.basename(path))
+        self._total_bytes = total
+
+        # Ссылки на удаленные файлы больше не нужны
+        refs_dir = os.path.join(self.directory, 'refs')
+        for root, _, names in os.walk(refs_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    with open(path, 'r', encoding='ascii') as f:
+                        if f.read().strip() in removed:
+                            os.remove(path)
+                except OSError:
+                    continue
+        logger.info(f"Кэш изображений очищен: удалено {len(removed)} файлов, занято {total >> 20} МБ")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan()[1]
+            total = self._total_bytes
+        return {
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+class ImagePrefetcher:
+    def __init__(self, cache: ImageCache, workers: int = 4, parallel_candidates: int = 3,
+                 timeout: float = 30, max_image_bytes: int = 20 * 1024 * 1024):
+        self.cache = cache
+        self.parallel_candidates = parallel_candidates
+        self.timeout = timeout
+        self.max_image_bytes = max_image_bytes
+
+        # Общая сессия: соединения с CDN переиспользуются между загрузками
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._downloads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-download')
+        # Предзагрузка ждет загрузок в отдельном пуле, иначе при заполненном пуле загрузок
+        # ожидающие задачи заняли бы все потоки
+        self._jobs = ThreadPoolExecutor(max_workers=2, thread_name_prefix='image-prefetch')
+        # Загрузки в процессе: один URL не качается дважды, если его одновременно
+        # запросили предзагрузка и создание сторис
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    def _download(self, url: str) -> bytes:
+        with self.session.get(url, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+            if content_type.startswith('text/'):
+                # Страница ошибки CDN с кодом 200
+                raise ValueError(f"ожидалось изображение, получено {content_type}")
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > self.max_image_bytes:
+                    raise ValueError(f"изображение больше {self.max_image_bytes >> 20} МБ")
+                chunks.append(chunk)
+        data = b''.join(chunks)
+        self.cache.put(url, data)
+        return data
+
+    def _submit_download(self, url: str) -> Future:
+        with self._inflight_lock:
+            future = self._inflight.get(url)
+            if future is None:
+                future = self._downloads.submit(self._download, url)
+                self._inflight[url] = future
+                future.add_done_callback(lambda _, url=url: self._forget(url))
+            return future
+
+    def _forget(self, url: str):
+        with self._inflight_lock:
+            self._inflight.pop(url, None)
+
+    def fetch(self, candidates: List[str]) -> Optional[Tuple[str, bytes]]:
+        """
+        Первое доступное изображение из candidates (в порядке предпочтения): (URL, данные).
+        Сначала ищется в кэше, иначе кандидаты качаются параллельно по parallel_candidates.
+        """
+        candidates = list(dict.fromkeys(url for url in candidates if url))
+        for url in candidates:
+            data = self.cache.get(url)
+            if data is not None:
+                return url, data
+
+        for start in range(0, len(candidates), self.parallel_candidates):
+            batch = candidates[start:start + self.parallel_candidates]
+            futures = [self._submit_download(url) for url in batch]
+            for url, future in zip(batch, futures):
+                try:
+                    return url, future.result()
+                except Exception as e:
+                    logger.warning(f"Не удалось скачать изображение {url}: {e}")
+        return None
+
+    def prefetch(self, candidates: List[str]):
+        """Прогрев кэша в фоне, без ожидания"""
+        self._jobs.submit(self._prefetch, list(candidates))
+
+    def _prefetch(self, candidates: List[str]):
+        try:
+            if self.fetch(candidates) is None:
+                logger.warning(f"Не удалось заранее загрузить ни одно изображение из {len(candidates)}")
+        except Exception as e:
+            logger.error(f"Ошибка предзагрузки изображения: {e}")
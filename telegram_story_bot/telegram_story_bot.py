@@ -6,14 +6,22 @@ import sys
 import json
 import logging
 import configparser
+import functools
+import hashlib
+import pickle
+import random
+import threading
 import requests
 import schedule
 import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import BinaryIO, Deque, Dict, Iterator, List, Optional, Tuple, Union
 import xml.etree.ElementTree as ET
 import re
 
+from image_cache import ImageCache, ImagePrefetcher
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -25,6 +33,191 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Версия формата снимка фида на диске; снимок другой версии игнорируется
+FEED_SNAPSHOT_VERSION = 1
+# Как часто проверять, изменился ли фид
+FEED_REFRESH_INTERVAL = timedelta(hours=1)
+
+def iter_offer_elements(source: Union[str, BinaryIO]) -> Iterator[Tuple[ET.Element, Dict[str, str]]]:
+    """
+    Потоковый разбор YML-фида: элементы <offer> по одному вместе со словарём категорий.
+    Когда потребитель берёт следующий оффер, предыдущий удаляется из дерева, поэтому
+    память не зависит от размера фида. По формату YML <categories> идут перед <offers>,
+    так что к первому офферу словарь категорий уже собран.
+    """
+    categories_map: Dict[str, str] = {}
+    # Открытые элементы от корня до текущего: нужен родитель, чтобы удалить из него оффер
+    parents: List[ET.Element] = []
+
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            parents.append(elem)
+            continue
+
+        parents.pop()
+        if elem.tag == 'offer':
+            yield elem, categories_map
+        elif elem.tag == 'category' and parents and parents[-1].tag == 'categories':
+            cat_id = elem.attrib.get('id')
+            if cat_id:
+                categories_map[cat_id] = (elem.text or '').strip()
+        else:
+            continue
+
+        if parents:
+            parents[-1].remove(elem)
+
+
+def parse_feed_offers(source: Union[str, BinaryIO]) -> Iterator[Dict]:
+    """Офферы фида словарями, по одному (см. iter_offer_elements)"""
+    for offer, categories_map in iter_offer_elements(source):
+        yield offer_to_dict(offer, categories_map)
+
+
+def offer_signature(offer: ET.Element, categories_map: Dict[str, str]) -> str:
+    """
+    Отпечаток оффера для сравнения версий фида: атрибуты, дочерние теги и название
+    категории. Не зависит от запуска (в отличие от hash()), его можно хранить на диске.
+    """
+    parts = [f'{key}={value}' for key, value in offer.attrib.items()]
+    for child in offer:
+        parts.append(child.tag)
+        parts.append(child.text or '')
+        parts.extend(f'{key}={value}' for key, value in child.attrib.items())
+        if child.tag == 'categoryId':
+            parts.append(categories_map.get((child.text or '').strip(), ''))
+    return hashlib.blake2b('\x1f'.join(parts).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def offer_to_dict(offer: ET.Element, categories_map: Dict[str, str]) -> Dict:
+    """Оффер фида в словарь: атрибуты, дочерние теги, <param>, категория и все картинки"""
+    offer_data: Dict[str, object] = {}
+
+    # Атрибуты оффера
+    for key, value in offer.attrib.items():
+        offer_data[key] = value
+
+    pictures: List[str] = []
+
+    # Дочерние элементы
+    for child in offer:
+        tag = child.tag
+        text = (child.text or '').strip()
+
+        if tag == 'param':
+            # Поддержка <param name="..."></param> (например "модель", "год выпуска").
+            # Имена повторяются в каждом оффере — одна строка на все офферы
+            param_name = child.attrib.get('name')
+            if param_name:
+                offer_data[sys.intern(param_name)] = text
+            continue
+
+        if tag == 'picture':
+            if text:
+                pictures.append(text)
+            # Сохраняем первый picture также под ключом 'picture' для совместимости
+            if 'picture' not in offer_data and text:
+                offer_data['picture'] = text
+            continue
+
+        # Обычные теги (берем последнее значение)
+        offer_data[tag] = text
+
+        # Сохраняем атрибуты дочерних тегов (например, <price currencyId="RUR">)
+        if child.attrib:
+            for attr_key, attr_val in child.attrib.items():
+                # Пишем атрибут как отдельное поле, например 'currencyId'
+                # Если такое поле уже есть, перезапишем последним значением
+                offer_data[attr_key] = attr_val
+
+    # Категория из categoryId
+    category_id = str(offer_data.get('categoryId', '')).strip()
+    if category_id and categories_map:
+        offer_data['category'] = categories_map.get(category_id, '')
+
+    # Список всех картинок
+    if pictures:
+        offer_data['_pictures'] = pictures
+
+    return offer_data
+
+
+def image_candidates(item: Dict) -> List[str]:
+    """URL изображений товара в порядке предпочтения (пробуем несколько возможных полей)"""
+    candidates: List[str] = []
+    if isinstance(item.get('_pictures'), list):
+        candidates.extend([str(u) for u in item.get('_pictures', []) if u])
+    for key in ['picture', 'image', 'image_url', 'photo', 'url']:
+        val = item.get(key)
+        if isinstance(val, str) and val:
+            candidates.append(val)
+    return candidates
+
+
+# Поле шаблона в кавычках: "модель", "год выпуска"
+TEMPLATE_FIELD_RE = re.compile(r'"([^"]+)"')
+EMPTY_ITEM_RE = re.compile(r',\s*,')
+
+# Набор ключей оффера -> {ключ в нижнем регистре: первый такой ключ}. Офферы одного фида
+# почти всегда имеют одинаковые наборы ключей, поэтому индекс строится один раз на набор
+_key_indexes: Dict[Tuple, Dict[str, str]] = {}
+KEY_INDEXES_LIMIT = 4096
+
+
+def offer_key_index(data: Dict) -> Dict[str, str]:
+    """Поиск ключей оффера без учета регистра"""
+    shape = tuple(data)
+    index = _key_indexes.get(shape)
+    if index is None:
+        index = {}
+        for key in shape:
+            if isinstance(key, str):
+                index.setdefault(key.lower(), key)
+        if len(_key_indexes) >= KEY_INDEXES_LIMIT:
+            _key_indexes.clear()
+        _key_indexes[shape] = index
+    return index
+
+
+class CompiledTemplate:
+    """
+    Шаблон текста, разобранный один раз: части через одну — текст и имена полей.
+    Каждое поле подставляется ровно на своё место, значения повторно не разбираются.
+    """
+
+    def __init__(self, template: str):
+        # re.split с группой: [текст, поле, текст, поле, ..., текст]
+        self.parts = TEMPLATE_FIELD_RE.split(template)
+        self.fields = [(i, self.parts[i], self.parts[i].lower()) for i in range(1, len(self.parts), 2)]
+
+    def render(self, data: Dict) -> str:
+        parts = self.parts.copy()
+        index = None
+        for i, field, lower_field in self.fields:
+            # Пробуем точное имя поля, затем без учета регистра
+            value = data.get(field, '')
+            if value == '':
+                if index is None:
+                    index = offer_key_index(data)
+                key = index.get(lower_field)
+                if key is not None:
+                    value = data[key]
+            parts[i] = str(value)
+
+        # Убираем лишние пробелы и запятые (на стыках текста и значений, поэтому после склейки).
+        # split() делит по тем же пробельным символам, что и \s, и заодно обрезает края;
+        # после этого между запятыми может быть только один пробел
+        text = ' '.join(''.join(parts).split())
+        if ',,' in text or ', ,' in text:
+            text = EMPTY_ITEM_RE.sub(',', text)
+        return text
+
+
+@functools.lru_cache(maxsize=64)
+def compile_template(template: str) -> CompiledTemplate:
+    return CompiledTemplate(template)
+
+
 class TelegramStoryBot:
     def __init__(self, config_path: str = 'config.ini'):
         """Инициализация бота"""
@@ -47,6 +240,37 @@ class TelegramStoryBot:
         # Кэш для хранения данных фида
         self.feed_cache = []
         self.last_feed_update = None
+
+        # Условные запросы фида и отличия от прошлой версии (см. refresh_feed)
+        self.feed_etag: Optional[str] = None
+        self.feed_last_modified: Optional[str] = None
+        self.feed_signatures: Dict[str, str] = {}
+        self.feed_diff: Dict = {}
+        # Фид обновляют планировщик, бот управления и веб-интерфейс из разных потоков
+        self._feed_lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+        # Снимок фида на диске: после перезапуска сторис берутся из него, не дожидаясь сети
+        self.feed_snapshot_path = os.path.join(
+            os.path.dirname(os.path.abspath(config_path)),
+            self.config['CONTENT'].get('feed_cache', 'cache/feed_cache.pickle')
+        )
+        self._snapshot_checked = False
+
+        # Локальный кэш изображений и их фоновая загрузка (см. image_cache.py)
+        self.image_cache = ImageCache(
+            os.path.join(
+                os.path.dirname(os.path.abspath(config_path)),
+                self.config['CONTENT'].get('image_cache', 'cache/images')
+            ),
+            self.config['CONTENT'].getint('image_cache_mb', 200) * 1024 * 1024
+        )
+        self.image_prefetcher = ImagePrefetcher(self.image_cache)
+        # Товары следующих сторис выбираются заранее (на день вперёд), чтобы их
+        # изображения успели скачаться до публикации
+        self.upcoming_items: Deque[Dict] = deque()
+        self.upcoming_count = max(len(self.story_times), 1)
+        self._upcoming_lock = threading.Lock()
         
         logger.info("Бот инициализирован")
     
@@ -63,130 +287,196 @@ class TelegramStoryBot:
         """Проверка, является ли пользователь администратором"""
         return user_id in self.admin_ids
     
-    def get_feed_data(self) -> List[Dict]:
-        """Получение данных из фида (учет категорий, параметров и нескольких картинок)"""
-        try:
-            response = requests.get(self.feed_url, timeout=30)
-            response.raise_for_status()
-
-            root = ET.fromstring(response.content)
-
-            # Построение словаря категорий id -> название
-            categories_map: Dict[str, str] = {}
-            categories_root = root.find('.//categories')
-            if categories_root is not None:
-                for cat in categories_root.findall('category'):
-                    cat_id = cat.attrib.get('id')
-                    if cat_id:
-                        categories_map[cat_id] = (cat.text or '').strip()
-
-            offers: List[Dict] = []
-            for offer in root.findall('.//offer'):
-                offer_data: Dict[str, object] = {}
-
-                # Атрибуты оффера
-                for key, value in offer.attrib.items():
-                    offer_data[key] = value
-
-                pictures: List[str] = []
-
-                # Дочерние элементы
-                for child in offer:
-                    tag = child.tag
-                    text = (child.text or '').strip()
-
-                    if tag == 'param':
-                        # Поддержка <param name="..."></param> (например "модель", "год выпуска")
-                        param_name = child.attrib.get('name')
-                        if param_name:
-                            offer_data[param_name] = text
-                        continue
-
-                    if tag == 'picture':
-                        if text:
-                            pictures.append(text)
-                        # Сохраняем первый picture также под ключом 'picture' для совместимости
-                        if 'picture' not in offer_data and text:
-                            offer_data['picture'] = text
-                        continue
-
-                    # Обычные теги (берем последнее значение)
-                    offer_data[tag] = text
-
-                    # Сохраняем атрибуты дочерних тегов (например, <price currencyId="RUR">)
-                    if child.attrib:
-                        for attr_key, attr_val in child.attrib.items():
-                            # Пишем атрибут как отдельное поле, например 'currencyId'
-                            # Если такое поле уже есть, перезапишем последним значением
-                            offer_data[attr_key] = attr_val
-
-                # Категория из categoryId
-                category_id = str(offer_data.get('categoryId', '')).strip()
-                if category_id and categories_map:
-                    offer_data['category'] = categories_map.get(category_id, '')
-
-                # Список всех картинок
-                if pictures:
-                    offer_data['_pictures'] = pictures
-
-                offers.append(offer_data)  # type: ignore[arg-type]
-
-            logger.info(f"Получено {len(offers)} товаров из фида")
-            return offers  # type: ignore[return-value]
+    def refresh_feed(self) -> bool:
+        """
+        Обновление feed_cache условным запросом (If-None-Match / If-Modified-Since):
+        на 304 фид не скачивается и не разбирается. Если фид изменился, офферы сравниваются
+        с прошлой версией по id и отпечатку, и в словари превращаются только новые
+        и изменённые — остальные берутся из кэша. Возвращает False при ошибке.
+        """
+        with self._feed_lock:
+            headers = {}
+            if self.feed_cache:
+                if self.feed_etag:
+                    headers['If-None-Match'] = self.feed_etag
+                if self.feed_last_modified:
+                    headers['If-Modified-Since'] = self.feed_last_modified
+
+            try:
+                with requests.get(self.feed_url, headers=headers, timeout=30, stream=True) as response:
+                    if response.status_code == 304:
+                        self.last_feed_update = datetime.now()
+                        self.feed_diff = {**self.feed_diff, 'not_modified': True,
+                                          'checked_at': self.last_feed_update.isoformat()}
+                        logger.info("Фид не изменился (304), используем кэш")
+                        return True
+
+                    response.raise_for_status()
+                    # Распаковка gzip/deflate на лету, если сервер сжимает ответ
+                    response.raw.decode_content = True
+                    offers, signatures, changed_ids = self._merge_feed(response.raw)
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+            except Exception as e:
+                logger.error(f"Ошибка при получении данных фида: {e}")
+                return False
+
+            added = sum(1 for offer_id in changed_ids if offer_id not in self.feed_signatures)
+            self.feed_diff = {
+                'added': added,
+                'changed': len(changed_ids) - added,
+                'removed': len(self.feed_signatures.keys() - signatures.keys()),
+                'unchanged': len(offers) - len(changed_ids),
+                'not_modified': False,
+                'checked_at': datetime.now().isoformat(),
+            }
+            self.feed_cache = offers
+            self.feed_signatures = signatures
+            self.feed_etag = etag
+            self.feed_last_modified = last_modified
+            self.last_feed_update = datetime.now()
+
+            # Неизменившиеся товары остаются теми же объектами; выбранные заранее
+            # удалённые и изменённые товары заменяются новыми
+            current = {id(offer) for offer in offers}
+            with self._upcoming_lock:
+                self.upcoming_items = deque(item for item in self.upcoming_items if id(item) in current)
+            self.plan_upcoming_items()
+
+            logger.info(
+                f"Получено {len(offers)} товаров из фида: новых {self.feed_diff['added']}, "
+                f"изменённых {self.feed_diff['changed']}, удалённых {self.feed_diff['removed']}"
+            )
+            self.save_feed_snapshot()
+            return True
+
+    def _merge_feed(self, source: BinaryIO) -> Tuple[List[Dict], Dict[str, str], List[Optional[str]]]:
+        """Разбор новой версии фида с переиспользованием неизменившихся офферов"""
+        previous = {offer.get('id'): offer for offer in self.feed_cache if offer.get('id') is not None}
+        offers: List[Dict] = []
+        signatures: Dict[str, str] = {}
+        changed_ids: List[Optional[str]] = []
 
+        for elem, categories_map in iter_offer_elements(source):
+            offer_id = elem.attrib.get('id')
+            signature = offer_signature(elem, categories_map)
+            old = previous.get(offer_id) if offer_id is not None else None
+            if old is not None and self.feed_signatures.get(offer_id) == signature:
+                offers.append(old)
+            else:
+                # Офферы без id сравнить не с чем — они всегда считаются новыми
+                offers.append(offer_to_dict(elem, categories_map))
+                changed_ids.append(offer_id)
+            if offer_id is not None:
+                signatures[offer_id] = signature
+
+        return offers, signatures, changed_ids
+
+    def save_feed_snapshot(self):
+        """Запись офферов и состояния условных запросов на диск (вызывается под _feed_lock)"""
+        snapshot = {
+            'version': FEED_SNAPSHOT_VERSION,
+            'feed_url': self.feed_url,
+            'offers': self.feed_cache,
+            'signatures': self.feed_signatures,
+            'etag': self.feed_etag,
+            'last_modified': self.feed_last_modified,
+            'last_feed_update': self.last_feed_update,
+            'feed_diff': self.feed_diff,
+        }
+        tmp_path = f'{self.feed_snapshot_path}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.feed_snapshot_path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # Через временный файл: при сбое во время записи остаётся прошлый снимок
+            os.replace(tmp_path, self.feed_snapshot_path)
         except Exception as e:
-            logger.error(f"Ошибка при получении данных фида: {e}")
-            return []
+            logger.warning(f"Не удалось сохранить снимок фида {self.feed_snapshot_path}: {e}")
+
+    def load_feed_snapshot(self) -> bool:
+        """Загрузка офферов из снимка на диске; читается один раз, при первом обращении к фиду"""
+        with self._feed_lock:
+            if self._snapshot_checked or self.feed_cache:
+                return bool(self.feed_cache)
+            self._snapshot_checked = True
+
+            try:
+                with open(self.feed_snapshot_path, 'rb') as f:
+                    snapshot = pickle.load(f)
+            except FileNotFoundError:
+                return False
+            except Exception as e:
+                logger.warning(f"Не удалось прочитать снимок фида {self.feed_snapshot_path}: {e}")
+                return False
+
+            if snapshot.get('version') != FEED_SNAPSHOT_VERSION or snapshot.get('feed_url') != self.feed_url:
+                logger.info("Снимок фида от другой версии бота или другого URL, загружаем фид заново")
+                return False
+
+            self.feed_cache = snapshot['offers']
+            self.feed_signatures = snapshot['signatures']
+            self.feed_etag = snapshot['etag']
+            self.feed_last_modified = snapshot['last_modified']
+            self.last_feed_update = snapshot['last_feed_update']
+            self.feed_diff = snapshot['feed_diff']
+            logger.info(f"Загружено {len(self.feed_cache)} товаров из снимка фида от {self.last_feed_update}")
+            return True
+
+    def refresh_feed_in_background(self):
+        """Обновление фида в отдельном потоке; если обновление уже идёт, второе не запускается"""
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        self._refresh_thread = threading.Thread(target=self.refresh_feed, name='feed-refresh', daemon=True)
+        self._refresh_thread.start()
+
+    def ensure_feed(self):
+        """
+        Подготовка feed_cache. Если есть снимок на диске, сеть не ждём: устаревший кэш
+        обновляется в фоне. Синхронно фид загружается, только когда кэша нет совсем.
+        """
+        if not self.feed_cache:
+            self.load_feed_snapshot()
+
+        if not self.feed_cache:
+            self.refresh_feed()
+        elif self.last_feed_update is None or datetime.now() - self.last_feed_update > FEED_REFRESH_INTERVAL:
+            self.refresh_feed_in_background()
+
+    def get_feed_data(self) -> List[Dict]:
+        """Товары фида (учет категорий, параметров и нескольких картинок)"""
+        self.ensure_feed()
+        return self.feed_cache
     
     def format_text(self, template: str, data: Dict) -> str:
-        """Форматирование текста по шаблону"""
+        """Форматирование текста по шаблону (поля в кавычках заменяются значениями из данных)"""
         try:
-            # Заменяем поля в кавычках на значения из данных
-            formatted_text = template
-            
-            # Находим все поля в кавычках
-            pattern = r'"([^"]+)"'
-            matches = re.findall(pattern, template)
-            
-            for field in matches:
-                # Пробуем точное имя поля
-                value = data.get(field, '')
-                if value == '':
-                    # Пробуем найти ключ без учета регистра
-                    lower_field = field.lower()
-                    for key, val in data.items():
-                        if isinstance(key, str) and key.lower() == lower_field:
-                            value = val
-                            break
-                formatted_text = formatted_text.replace(f'"{field}"', str(value))
-            
-            # Убираем лишние пробелы и запятые
-            formatted_text = re.sub(r'\s+', ' ', formatted_text)
-            formatted_text = re.sub(r',\s*,', ',', formatted_text)
-            formatted_text = formatted_text.strip()
-            
-            return formatted_text
+            return compile_template(template).render(data)
             
         except Exception as e:
             logger.error(f"Ошибка при форматировании текста: {e}")
             return "Ошибка форматирования"
     
+    def plan_upcoming_items(self):
+        """Выбор случайных товаров для следующих сторис и фоновая загрузка их изображений"""
+        with self._upcoming_lock:
+            while self.feed_cache and len(self.upcoming_items) < self.upcoming_count:
+                item = random.choice(self.feed_cache)
+                self.upcoming_items.append(item)
+                self.image_prefetcher.prefetch(image_candidates(item))
+
     def get_random_item(self) -> Optional[Dict]:
-        """Получение случайного товара из фида"""
-        if not self.feed_cache:
-            self.feed_cache = self.get_feed_data()
-            self.last_feed_update = datetime.now()
-        
-        # Обновляем кэш каждый час
-        if self.last_feed_update and datetime.now() - self.last_feed_update > timedelta(hours=1):
-            self.feed_cache = self.get_feed_data()
-            self.last_feed_update = datetime.now()
+        """Получение случайного товара из фида (выбранного заранее, см. plan_upcoming_items)"""
+        # Кэш проверяется раз в FEED_REFRESH_INTERVAL; неизменившийся фид сервер не отдаёт повторно (304)
+        self.ensure_feed()
         
         if not self.feed_cache:
             return None
         
-        import random
-        return random.choice(self.feed_cache)
+        with self._upcoming_lock:
+            item = self.upcoming_items.popleft() if self.upcoming_items else random.choice(self.feed_cache)
+        self.plan_upcoming_items()
+        return item
     
     def create_story(self) -> Optional[Dict]:
         """Создание сторис"""
@@ -201,27 +491,23 @@ class TelegramStoryBot:
             text = self.format_text(self.text_template, item)
             
             # Получаем изображение (пробуем несколько возможных полей)
-            image_url_candidates: List[str] = []
-            if isinstance(item.get('_pictures'), list):
-                image_url_candidates.extend([str(u) for u in item.get('_pictures', []) if u])
-            for key in ['picture', 'image', 'image_url', 'photo', 'url']:
-                val = item.get(key)
-                if isinstance(val, str) and val:
-                    image_url_candidates.append(val)
-
-            image_url = next((u for u in image_url_candidates if u), '')
-            if not image_url:
+            image_url_candidates = image_candidates(item)
+            if not image_url_candidates:
                 logger.warning("URL изображения не найден")
                 return None
             
-            # Скачиваем изображение
-            response = requests.get(image_url, timeout=30)
-            response.raise_for_status()
+            # Обычно изображение уже в кэше: товар выбран заранее и картинка скачана в фоне.
+            # Иначе кандидаты скачиваются параллельно, берётся первый доступный по порядку
+            image = self.image_prefetcher.fetch(image_url_candidates)
+            if image is None:
+                logger.warning("Не удалось скачать изображение товара")
+                return None
+            image_url, image_data = image
             
             story_data = {
                 'title': title,
                 'text': text,
-                'image_data': response.content,
+                'image_data': image_data,
                 'image_url': image_url
             }
             
@@ -283,6 +569,11 @@ class TelegramStoryBot:
         
         self.is_running = True
         self.schedule_stories()
+
+        # Фид готовим заранее, чтобы первая сторис не ждала сеть
+        self.load_feed_snapshot()
+        self.plan_upcoming_items()
+        self.refresh_feed_in_background()
         
         logger.info("Бот запущен")
         logger.info(f"Время размещения сторис: {', '.join(self.story_times)}")
@@ -308,7 +599,9 @@ class TelegramStoryBot:
             'admin_ids': self.admin_ids,
             'account_ids': self.account_ids,
             'last_feed_update': self.last_feed_update.isoformat() if self.last_feed_update else None,
-            'feed_items_count': len(self.feed_cache)
+            'feed_items_count': len(self.feed_cache),
+            'feed_diff': self.feed_diff,
+            'image_cache': self.image_cache.get_stats()
         }
 
 def main():
@@ -334,6 +627,9 @@ def main():
                 print(f"Статус: {'Запущен' if status['is_running'] else 'Остановлен'}")
                 print(f"Время размещения: {', '.join(status['story_times'])}")
                 print(f"Товаров в кэше: {status['feed_items_count']}")
+                diff = status['feed_diff']
+                if diff:
+                    print(f"Изменения фида: +{diff.get('added', 0)} ~{diff.get('changed', 0)} -{diff.get('removed', 0)}")
             elif command == 'exit':
                 bot.stop_bot()
                 print("Выход...")